@@ -24,6 +24,7 @@ from app.models.model_supplier import Supplier
 from app.models.model_purchase import Purchase
 from app.models.model_part import Part
 from app.models.model_warranty import Warranty
+from app.models.model_rollup import PurchaseRollup, RollupState, SupplierRollup, WarrantyClaimRollup, WarrantySketchRollup
 
 from app.configs.database import Base
 # target_metadata = mymodel.Base.metadata
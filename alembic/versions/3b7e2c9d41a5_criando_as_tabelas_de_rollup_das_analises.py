@@ -0,0 +1,75 @@
+"""Criando as tabelas de rollup das análises
+
+Revision ID: 3b7e2c9d41a5
+Revises: 6dca9c023fe4
+Create Date: 2026-10-17 11:45:25.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b7e2c9d41a5'
+down_revision: Union[str, None] = '6dca9c023fe4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('rollup_warranty_claims',
+        sa.Column('rollup_id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('part_id', sa.Integer(), nullable=True),
+        sa.Column('model', sa.String(), nullable=True),
+        sa.Column('propulsion', sa.String(), nullable=True),
+        sa.Column('month', sa.String(length=7), nullable=True),
+        sa.Column('claims', sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint('rollup_id')
+    )
+    op.create_index('ix_rollup_warranty_claims_part_month', 'rollup_warranty_claims', ['part_id', 'month'], unique=False)
+    op.create_index('ix_rollup_warranty_claims_model', 'rollup_warranty_claims', ['model'], unique=False)
+    op.create_index('ix_rollup_warranty_claims_propulsion', 'rollup_warranty_claims', ['propulsion'], unique=False)
+    op.create_table('rollup_purchases',
+        sa.Column('rollup_id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('part_id', sa.Integer(), nullable=True),
+        sa.Column('purchase_type', sa.String(length=50), nullable=True),
+        sa.Column('month', sa.String(length=7), nullable=True),
+        sa.Column('purchases', sa.Integer(), nullable=True),
+        sa.Column('first_purchase_date', sa.DateTime(), nullable=True),
+        sa.Column('last_purchase_date', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('rollup_id')
+    )
+    op.create_index('ix_rollup_purchases_part_month', 'rollup_purchases', ['part_id', 'month'], unique=False)
+    op.create_index('ix_rollup_purchases_type', 'rollup_purchases', ['purchase_type'], unique=False)
+    op.create_table('rollup_suppliers',
+        sa.Column('supplier_id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('location_id', sa.Integer(), nullable=True),
+        sa.Column('total_parts', sa.Integer(), nullable=True),
+        sa.Column('total_purchases', sa.Integer(), nullable=True),
+        sa.Column('bulk_purchases', sa.Integer(), nullable=True),
+        sa.Column('warranty_purchases', sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint('supplier_id')
+    )
+    op.create_index(op.f('ix_rollup_suppliers_location_id'), 'rollup_suppliers', ['location_id'], unique=False)
+    op.create_table('rollup_state',
+        sa.Column('rollup_name', sa.String(length=50), nullable=False),
+        sa.Column('built_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('rollup_name')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('rollup_state')
+    op.drop_index(op.f('ix_rollup_suppliers_location_id'), table_name='rollup_suppliers')
+    op.drop_table('rollup_suppliers')
+    op.drop_index('ix_rollup_purchases_type', table_name='rollup_purchases')
+    op.drop_index('ix_rollup_purchases_part_month', table_name='rollup_purchases')
+    op.drop_table('rollup_purchases')
+    op.drop_index('ix_rollup_warranty_claims_propulsion', table_name='rollup_warranty_claims')
+    op.drop_index('ix_rollup_warranty_claims_model', table_name='rollup_warranty_claims')
+    op.drop_index('ix_rollup_warranty_claims_part_month', table_name='rollup_warranty_claims')
+    op.drop_table('rollup_warranty_claims')
@@ -0,0 +1,34 @@
+"""Criando os índices de data de compras e garantias
+
+Revision ID: 8f14a6c0e2d7
+Revises: 3b7e2c9d41a5
+Create Date: 2026-10-17 12:10:02.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8f14a6c0e2d7'
+down_revision: Union[str, None] = '3b7e2c9d41a5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_purchases_type_date', 'purchases', ['purchase_type', 'purchase_date'], unique=False)
+    op.create_index('ix_purchases_part_date', 'purchases', ['part_id', 'purchase_date'], unique=False)
+    op.create_index('ix_fact_warranties_repair_date', 'fact_warranties', ['repair_date'], unique=False)
+    op.create_index('ix_fact_warranties_part_repair_date', 'fact_warranties', ['part_id', 'repair_date'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_fact_warranties_part_repair_date', table_name='fact_warranties')
+    op.drop_index('ix_fact_warranties_repair_date', table_name='fact_warranties')
+    op.drop_index('ix_purchases_part_date', table_name='purchases')
+    op.drop_index('ix_purchases_type_date', table_name='purchases')
@@ -0,0 +1,44 @@
+"""Criando a tabela de sketches das garantias
+
+Revision ID: c52d9e7b3f80
+Revises: 8f14a6c0e2d7
+Create Date: 2026-10-17 12:14:36.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c52d9e7b3f80'
+down_revision: Union[str, None] = '8f14a6c0e2d7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('rollup_warranty_sketches',
+        sa.Column('rollup_id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('part_id', sa.Integer(), nullable=True),
+        sa.Column('model', sa.String(), nullable=True),
+        sa.Column('propulsion', sa.String(), nullable=True),
+        sa.Column('month', sa.String(length=7), nullable=True),
+        sa.Column('claims', sa.Integer(), nullable=True),
+        sa.Column('vehicles_sketch', sa.LargeBinary(), nullable=True),
+        sa.Column('days_sketch', sa.LargeBinary(), nullable=True),
+        sa.PrimaryKeyConstraint('rollup_id')
+    )
+    op.create_index('ix_rollup_warranty_sketches_part_month', 'rollup_warranty_sketches', ['part_id', 'month'], unique=False)
+    op.create_index('ix_rollup_warranty_sketches_model', 'rollup_warranty_sketches', ['model'], unique=False)
+    op.create_index('ix_rollup_warranty_sketches_propulsion', 'rollup_warranty_sketches', ['propulsion'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_rollup_warranty_sketches_propulsion', table_name='rollup_warranty_sketches')
+    op.drop_index('ix_rollup_warranty_sketches_model', table_name='rollup_warranty_sketches')
+    op.drop_index('ix_rollup_warranty_sketches_part_month', table_name='rollup_warranty_sketches')
+    op.drop_table('rollup_warranty_sketches')
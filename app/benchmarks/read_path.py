@@ -0,0 +1,105 @@
+"""
+Compara a vazão (linhas/s) da listagem paginada de compras nos dois caminhos de leitura:
+
+- ORM: objetos do ORM, `PurchaseResponse.model_validate(obj.__dict__)` por linha, `Page[...]`
+  validada de novo como a anotação de retorno da rota e serializada com o módulo json;
+- Core: tuplas do Core serializadas direto em bytes pelo orjson (`select_page_rows` + `page_response`).
+
+Uso: python -m app.benchmarks.read_path [--rows 100000] [--limit 1000] [--repeat 3]
+Grava as compras de teste no banco de BENCHMARK_DATABASE_URL (por padrão, um SQLite temporário),
+nunca no banco da aplicação; recusa rodar se a tabela de compras desse banco já tiver linhas.
+"""
+from datetime import datetime, timedelta
+import argparse
+import os
+import tempfile
+import time
+
+BENCHMARK_DATABASE_URL = os.getenv("BENCHMARK_DATABASE_URL") or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'benchmark.db')}"
+APP_DATABASE_URL = os.getenv("DATABASE_URL")
+# app.configs.database cria o engine da aplicação ao ser importado; o benchmark não o usa
+os.environ.setdefault("DATABASE_URL", BENCHMARK_DATABASE_URL)
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import sessionmaker
+
+from app.configs.cache import serialize_json
+from app.configs.database import Base
+from app.configs.pagination import encode_cursor, page_response, select_page_rows
+from app.models import model_location, model_part, model_supplier  # noqa: F401 (registra as tabelas referenciadas)
+from app.models.model_purchase import Purchase
+from app.schemas.pagination import Page
+from app.schemas.purchase import PurchaseResponse
+
+engine = create_engine(BENCHMARK_DATABASE_URL)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def seed(rows: int):
+    if APP_DATABASE_URL and make_url(BENCHMARK_DATABASE_URL) == make_url(APP_DATABASE_URL):
+        raise SystemExit("BENCHMARK_DATABASE_URL aponta para o banco da aplicação (DATABASE_URL)")
+    Base.metadata.create_all(engine)
+    with SessionLocal() as db:
+        if db.query(Purchase.purchase_id).first() is not None:
+            raise SystemExit(f"A tabela {Purchase.__tablename__} de {make_url(BENCHMARK_DATABASE_URL)!r} já tem linhas; use um banco vazio")
+        start = datetime(2023, 1, 1)
+        db.execute(insert(Purchase), [
+            {"purchase_type": "bulk", "purchase_date": start + timedelta(minutes=index), "part_id": 1 + index % 50}
+            for index in range(rows)
+        ])
+        db.commit()
+
+def read_orm(limit: int) -> int:
+    # Caminho anterior das rotas de listagem
+    size, after = 0, None
+    with SessionLocal() as db:
+        while True:
+            query = db.query(Purchase)
+            if after is not None:
+                query = query.filter(Purchase.purchase_id > after)
+            purchases = query.order_by(Purchase.purchase_id).limit(limit + 1).all()
+            has_more = len(purchases) > limit
+            items = [PurchaseResponse.model_validate(purchase.__dict__) for purchase in purchases[:limit]]
+            page = Page[PurchaseResponse](
+                items=items,
+                next_cursor=encode_cursor(Purchase.__tablename__, items[-1].purchase_id) if has_more else None,
+                limit=limit,
+            )
+            size += len(serialize_json(Page[PurchaseResponse].model_validate(page.model_dump())))
+            if not has_more:
+                return size
+            after = items[-1].purchase_id
+            db.expunge_all()
+
+def read_core(limit: int) -> int:
+    columns = list(PurchaseResponse.model_fields)
+    size, after = 0, None
+    with SessionLocal() as db:
+        while True:
+            rows = select_page_rows(Purchase, columns, after, limit, db=db)
+            size += len(page_response(Purchase, columns, rows, limit).body)
+            if len(rows) <= limit:
+                return size
+            after = rows[limit - 1][0]
+
+def measure(read, rows: int, limit: int, repeat: int) -> float:
+    best = min(_timed(read, limit) for _ in range(repeat))
+    return rows / best
+
+def _timed(read, limit: int) -> float:
+    started = time.perf_counter()
+    read(limit)
+    return time.perf_counter() - started
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vazão da listagem de compras: ORM + Pydantic x Core + orjson")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--limit", type=int, default=1000, help="linhas por página")
+    parser.add_argument("--repeat", type=int, default=3, help="execuções por caminho (vale a melhor)")
+    args = parser.parse_args()
+
+    seed(args.rows)
+    orm = measure(read_orm, args.rows, args.limit, args.repeat)
+    core = measure(read_core, args.rows, args.limit, args.repeat)
+    print(f"ORM + Pydantic + json: {orm:,.0f} linhas/s")
+    print(f"Core + orjson:         {core:,.0f} linhas/s ({core / orm:.1f}x)")
@@ -2,14 +2,14 @@ from datetime import datetime, timedelta
 from typing import Annotated
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import JWTError, jwt
 import os
 
-from app.configs.database import get_db
+from app.configs.database import get_async_db
 from app.schemas.auth import TokenDataModel
 from app.schemas.user import IsActiveEnum, UserInDBModel, UserModel
-from app.utils.auth import get_user_by_id_util, get_user_by_user_name, verify_password
+from app.utils.auth import get_cached_user_by_id_async_util, get_user_by_user_name, verify_password
 from app.errors import DecodeTokenException, EncodingTokenException, InsufficientPermission, InvalidCredentials, InvalidTokenException, TokenExpiredException
 from app.models.model_user import User
 
@@ -67,7 +67,7 @@ def create_token(user_data: dict, refresh: bool = False) -> str:
     except Exception as e:
         raise EncodingTokenException(e)
     
-async def get_current_user(token: Annotated[str, Depends(oauth2_bearer)], db: Session = Depends(get_db)) -> User:
+async def get_current_user(token: Annotated[str, Depends(oauth2_bearer)], db: AsyncSession = Depends(get_async_db)) -> User:
     try:
         payload = jwt.decode(
             token, 
@@ -80,7 +80,7 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_bearer)], db: Se
         if not user_id:
             raise InvalidCredentials
 
-        user = get_user_by_id_util(user_id, db)
+        user = await get_cached_user_by_id_async_util(user_id, db)
 
         if user is None:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Usuário inválido.")
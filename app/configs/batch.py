@@ -0,0 +1,39 @@
+import os
+
+from fastapi import Query
+
+from app.configs.fields import project
+from app.errors import InvalidBatchIds
+from app.schemas.batch import BatchResponse
+
+# Máximo de ids por consulta em lote (um único WHERE id IN (...))
+BATCH_MAX_IDS = int(os.getenv("BATCH_MAX_IDS", "1000"))
+
+def parse_batch_ids(ids: list) -> list:
+    """
+    Ids sem repetição, na ordem em que aparecem pela primeira vez.
+    """
+    try:
+        ids = list(dict.fromkeys(int(value) for value in ids))
+    except (TypeError, ValueError):
+        raise InvalidBatchIds("os ids devem ser inteiros")
+    if not ids:
+        raise InvalidBatchIds("informe ao menos um id")
+    if len(ids) > BATCH_MAX_IDS:
+        raise InvalidBatchIds(f"máximo de {BATCH_MAX_IDS} ids por consulta; use páginas ou divida a lista")
+    return ids
+
+def get_batch_ids(ids: list[str] = Query(default=[])) -> list:
+    """
+    Ids da consulta em lote pela query string: `?ids=1,2,3` ou `?ids=1&ids=2`.
+    """
+    return parse_batch_ids([value for values in ids for value in values.split(",") if value.strip()])
+
+def build_batch(found: dict, fields: list, response_model) -> BatchResponse:
+    """
+    Resposta da consulta em lote a partir de `load_many`: itens na ordem pedida, só com `fields`, e ids inexistentes em `missing`.
+    """
+    return BatchResponse(
+        items=[project(obj, fields, response_model) for obj in found.values() if obj is not None],
+        missing=[key for key, obj in found.items() if obj is None],
+    )
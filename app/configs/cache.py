@@ -0,0 +1,233 @@
+from logging import getLogger
+from threading import Lock
+import asyncio
+import json
+import os
+import time
+
+from fastapi import BackgroundTasks
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.configs.cache_backend import CACHE_SERIALIZER, Codec, create_cache_backend
+from app.configs.versions import table_versions
+
+logger = getLogger(__name__)
+
+ANALYTICS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYTICS_CACHE_MAX_ENTRIES", "1024"))
+ANALYTICS_CACHE_TTL_SECONDS = float(os.getenv("ANALYTICS_CACHE_TTL_SECONDS", "60"))
+ANALYTICS_CACHE_STALE_SECONDS = float(os.getenv("ANALYTICS_CACHE_STALE_SECONDS", "300"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "300"))
+DIMENSION_CACHE_MAX_ENTRIES = int(os.getenv("DIMENSION_CACHE_MAX_ENTRIES", "4096"))
+DIMENSION_CACHE_TTL_SECONDS = float(os.getenv("DIMENSION_CACHE_TTL_SECONDS", "600"))
+REVALIDATION_LOCK_SECONDS = 60
+
+class VersionedCache:
+    """
+    Cache de valores versionados sobre um backend (memória, Redis ou L1/L2) com TTL.
+
+    Uma entrada é invalidada assim que a versão de alguma das tabelas de que depende muda.
+    Depois do TTL, e enquanto as versões não mudarem, a entrada ainda pode ser servida
+    por mais `stale_seconds` enquanto é recalculada em segundo plano (stale-while-revalidate).
+    Falhas do backend nunca derrubam a requisição: a leitura vira falta e a escrita é ignorada.
+    """
+    def __init__(self, backend, namespace: str, ttl_seconds: float, stale_seconds: float = 0, serializer: str = CACHE_SERIALIZER):
+        self.backend = backend
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.codec = Codec(serializer)
+        self._lock = Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    def _key(self, key) -> str:
+        parts = key if isinstance(key, tuple) else (key,)
+        return ":".join([self.namespace, *(str(part) for part in parts)])
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get(self, key, versions: tuple):
+        """
+        Retorna (valor, "fresh" | "stale") ou (None, None) quando não há entrada utilizável.
+        """
+        if versions is None:
+            self._count("misses")
+            return None, None
+        try:
+            data = self.backend.get(self._key(key))
+            if data is None:
+                self._count("misses")
+                return None, None
+            # Envelope: cabeçalho JSON com versões e horário de criação, depois o valor codificado
+            header, _, payload = data.partition(b"\n")
+            header = json.loads(header)
+            if header["versions"] != list(versions):
+                self.backend.delete(self._key(key))
+                self._count("invalidations")
+                self._count("misses")
+                return None, None
+            value = self.codec.decode(payload)
+        except Exception as e:
+            logger.error(f"Erro ao ler {key} do cache '{self.namespace}': {str(e)}")
+            self._count("errors")
+            self._count("misses")
+            return None, None
+
+        if time.time() - header["created_at"] > self.ttl_seconds:
+            self._count("stale_hits")
+            return value, "stale"
+        self._count("hits")
+        return value, "fresh"
+
+    def set(self, key, value, versions: tuple):
+        if versions is None:
+            return
+        header = json.dumps({"versions": list(versions), "created_at": time.time()}).encode("utf-8")
+        try:
+            self.backend.set(self._key(key), header + b"\n" + self.codec.encode(value), self.ttl_seconds + self.stale_seconds)
+        except Exception as e:
+            logger.error(f"Erro ao gravar {key} no cache '{self.namespace}': {str(e)}")
+            self._count("errors")
+
+    def start_revalidation(self, key) -> bool:
+        # Garante uma única revalidação em andamento por chave, inclusive entre workers com o Redis
+        try:
+            return self.backend.add(f"lock:{self._key(key)}", b"1", REVALIDATION_LOCK_SECONDS)
+        except Exception as e:
+            logger.error(f"Erro ao travar a revalidação de {key}: {str(e)}")
+            return False
+
+    def finish_revalidation(self, key):
+        try:
+            self.backend.delete(f"lock:{self._key(key)}")
+        except Exception as e:
+            logger.error(f"Erro ao liberar a revalidação de {key}: {str(e)}")
+
+    def clear(self):
+        self.backend.clear(f"{self.namespace}:")
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {
+                "namespace": self.namespace,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "errors": self.errors,
+            }
+        stats.update(self.backend.stats())
+        return stats
+
+# Respostas de analytics já serializadas em JSON
+analytics_cache = VersionedCache(
+    create_cache_backend(ANALYTICS_CACHE_MAX_ENTRIES),
+    namespace="analytics",
+    ttl_seconds=ANALYTICS_CACHE_TTL_SECONDS,
+    stale_seconds=ANALYTICS_CACHE_STALE_SECONDS,
+    serializer="raw",
+)
+
+# Usuários das sessões autenticadas, consultados a cada requisição
+user_cache = VersionedCache(
+    create_cache_backend(),
+    namespace="users",
+    ttl_seconds=USER_CACHE_TTL_SECONDS,
+)
+
+# Consultas por id das dimensões (localizações, fornecedores, peças e veículos)
+dimension_cache = VersionedCache(
+    create_cache_backend(DIMENSION_CACHE_MAX_ENTRIES),
+    namespace="dimensions",
+    ttl_seconds=DIMENSION_CACHE_TTL_SECONDS,
+    serializer="raw",
+)
+
+def serialize_json(payload) -> bytes:
+    # Mesmo formato gerado pelo JSONResponse do FastAPI
+    return json.dumps(
+        jsonable_encoder(payload), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+def _revalidate(cache: VersionedCache, key, tables: tuple, compute, bind):
+    db = Session(bind=bind)
+    try:
+        versions = table_versions.get(*tables)
+        cache.set(key, serialize_json(compute(db)), versions)
+    except Exception as e:
+        logger.error(f"Erro ao revalidar o cache para {key}: {str(e)}")
+    finally:
+        db.close()
+        cache.finish_revalidation(key)
+
+def cached_json_response(cache: VersionedCache, key, tables: tuple, compute, db: Session, background_tasks: BackgroundTasks) -> Response:
+    """
+    Responde a partir do cache ou executa `compute(db)` e guarda o JSON serializado.
+    `tables` são as tabelas lidas por `compute`, cujas versões invalidam a entrada.
+    """
+    # As versões são lidas antes do cálculo: um commit concorrente invalida o resultado em vez de ser perdido
+    versions = table_versions.get(*tables)
+    body, state = cache.get(key, versions)
+
+    if body is not None:
+        if state == "stale" and cache.start_revalidation(key):
+            background_tasks.add_task(_revalidate, cache, key, tables, compute, db.get_bind())
+        return Response(content=body, media_type="application/json", headers={"X-Cache": state.upper()})
+
+    body = serialize_json(compute(db))
+    cache.set(key, body, versions)
+    return Response(content=body, media_type="application/json", headers={"X-Cache": "MISS"})
+
+async def call_cache_backend(backends: tuple, function, *args):
+    """
+    Executa `function(*args)`, que usa os `backends` de cache, a partir do event loop.
+    As chamadas ao Redis são síncronas e vão para uma thread, para não parar as outras requisições
+    enquanto esperam a rede; com todos os backends só em memória, a chamada é feita direto.
+    """
+    if all(backend.name == "memory" for backend in backends):
+        return function(*args)
+    return await asyncio.to_thread(function, *args)
+
+def _read_cached_json(cache: VersionedCache, key, tables: tuple) -> tuple:
+    # Versões, entrada e trava de revalidação em uma única ida à thread
+    versions = table_versions.get(*tables)
+    body, state = cache.get(key, versions)
+    return versions, body, state, state == "stale" and cache.start_revalidation(key)
+
+async def _revalidate_async(cache: VersionedCache, key, tables: tuple, compute, bind):
+    backends = (table_versions.backend, cache.backend)
+    try:
+        async with AsyncSession(bind=bind) as db:
+            versions = await call_cache_backend(backends, table_versions.get, *tables)
+            await call_cache_backend(backends, cache.set, key, serialize_json(await compute(db)), versions)
+    except Exception as e:
+        logger.error(f"Erro ao revalidar o cache para {key}: {str(e)}")
+    finally:
+        await call_cache_backend(backends, cache.finish_revalidation, key)
+
+async def cached_json_response_async(cache: VersionedCache, key, tables: tuple, compute, db: AsyncSession, background_tasks: BackgroundTasks) -> Response:
+    """
+    Versão de `cached_json_response` para sessões assíncronas.
+    `compute(db)` é uma corrotina que recebe a AsyncSession; as consultas síncronas de app.utils
+    rodam dentro dela via `run_sync` ou `run_concurrently`, e as leituras e gravações no cache
+    via `call_cache_backend`, então o worker atende outras requisições enquanto espera o banco e o Redis.
+    """
+    backends = (table_versions.backend, cache.backend)
+    versions, body, state, revalidate = await call_cache_backend(backends, _read_cached_json, cache, key, tables)
+
+    if body is not None:
+        if revalidate:
+            background_tasks.add_task(_revalidate_async, cache, key, tables, compute, db.bind)
+        return Response(content=body, media_type="application/json", headers={"X-Cache": state.upper()})
+
+    body = serialize_json(await compute(db))
+    await call_cache_backend(backends, cache.set, key, body, versions)
+    return Response(content=body, media_type="application/json", headers={"X-Cache": "MISS"})
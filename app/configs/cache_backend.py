@@ -0,0 +1,285 @@
+from collections import OrderedDict
+from logging import getLogger
+from threading import Lock
+import json
+import os
+import pickle
+import time
+import zlib
+
+logger = getLogger(__name__)
+
+# memory: só no processo | redis: compartilhado entre workers | tiered: L1 em memória + L2 no Redis
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+CACHE_KEY_PREFIX = os.getenv("CACHE_KEY_PREFIX", "ford:")
+CACHE_SERIALIZER = os.getenv("CACHE_SERIALIZER", "json")
+CACHE_COMPRESS_MIN_BYTES = int(os.getenv("CACHE_COMPRESS_MIN_BYTES", "1024"))
+CACHE_L1_MAX_ENTRIES = int(os.getenv("CACHE_L1_MAX_ENTRIES", "1024"))
+CACHE_L1_TTL_SECONDS = float(os.getenv("CACHE_L1_TTL_SECONDS", "5"))
+
+class MemoryBackend:
+    """
+    Backend LRU na memória do processo, com expiração por chave.
+    Os contadores (incr) ficam fora do LRU e nunca são despejados.
+    """
+    name = "memory"
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._counters = {}
+        self._lock = Lock()
+        self.evictions = 0
+
+    def _live_value(self, key: str, now: float):
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and expires_at <= now:
+            del self._entries[key]
+            return None
+        return value
+
+    def _store(self, key: str, value: bytes, ttl: float = None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key: str):
+        with self._lock:
+            value = self._live_value(key, time.monotonic())
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: float = None):
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def add(self, key: str, value: bytes, ttl: float = None) -> bool:
+        # Grava apenas se a chave não existir (equivalente ao SET NX)
+        with self._lock:
+            if self._live_value(key, time.monotonic()) is not None:
+                return False
+            self._store(key, value, ttl)
+            return True
+
+    def delete(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def incr(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._counters[key] = self._counters.get(key, 0) + 1
+
+    def get_counters(self, keys: list) -> list:
+        with self._lock:
+            return [self._counters.get(key, 0) for key in keys]
+
+    def set_counters(self, values: dict):
+        with self._lock:
+            self._counters.update(values)
+
+    def clear(self, prefix: str = ""):
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": self.name,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "evictions": self.evictions,
+            }
+
+class RedisBackend:
+    """
+    Backend sobre qualquer servidor que fale o protocolo do Redis.
+    Recebe um cliente compatível com o redis-py (em testes, um fakeredis.FakeRedis).
+    """
+    name = "redis"
+
+    def __init__(self, client, prefix: str = CACHE_KEY_PREFIX):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str = REDIS_URL, prefix: str = CACHE_KEY_PREFIX):
+        import redis
+
+        return cls(redis.Redis.from_url(url), prefix=prefix)
+
+    def get(self, key: str):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key: str, value: bytes, ttl: float = None):
+        self.client.set(self.prefix + key, value, px=int(ttl * 1000) if ttl else None)
+
+    def add(self, key: str, value: bytes, ttl: float = None) -> bool:
+        return bool(self.client.set(self.prefix + key, value, nx=True, px=int(ttl * 1000) if ttl else None))
+
+    def delete(self, *keys: str):
+        if keys:
+            self.client.delete(*(self.prefix + key for key in keys))
+
+    def incr(self, *keys: str):
+        pipeline = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipeline.incr(self.prefix + key)
+        pipeline.execute()
+
+    def get_counters(self, keys: list) -> list:
+        values = self.client.mget([self.prefix + key for key in keys])
+        return [int(value) if value is not None else 0 for value in values]
+
+    def set_counters(self, values: dict):
+        if values:
+            self.client.mset({self.prefix + key: value for key, value in values.items()})
+
+    def clear(self, prefix: str = ""):
+        keys = list(self.client.scan_iter(match=f"{self.prefix}{prefix}*"))
+        if keys:
+            self.client.delete(*keys)
+
+    def stats(self) -> dict:
+        return {"backend": self.name}
+
+class TieredBackend:
+    """
+    Leitura em dois níveis: L1 local (rápido, por processo) e L2 compartilhado.
+    Um acerto no L2 é copiado para o L1 por no máximo `l1_ttl` segundos.
+    Contadores e travas usam sempre o L2, que é a fonte compartilhada.
+    """
+    name = "tiered"
+
+    def __init__(self, l1: MemoryBackend, l2: RedisBackend, l1_ttl: float = CACHE_L1_TTL_SECONDS):
+        self.l1 = l1
+        self.l2 = l2
+        self.l1_ttl = l1_ttl
+        self.l1_hits = 0
+        self.l2_hits = 0
+
+    def get(self, key: str):
+        value = self.l1.get(key)
+        if value is not None:
+            self.l1_hits += 1
+            return value
+        value = self.l2.get(key)
+        if value is not None:
+            self.l2_hits += 1
+            self.l1.set(key, value, self.l1_ttl)
+        return value
+
+    def set(self, key: str, value: bytes, ttl: float = None):
+        self.l2.set(key, value, ttl)
+        self.l1.set(key, value, min(ttl, self.l1_ttl) if ttl else self.l1_ttl)
+
+    def add(self, key: str, value: bytes, ttl: float = None) -> bool:
+        return self.l2.add(key, value, ttl)
+
+    def delete(self, *keys: str):
+        self.l1.delete(*keys)
+        self.l2.delete(*keys)
+
+    def incr(self, *keys: str):
+        self.l2.incr(*keys)
+
+    def get_counters(self, keys: list) -> list:
+        return self.l2.get_counters(keys)
+
+    def set_counters(self, values: dict):
+        self.l2.set_counters(values)
+
+    def clear(self, prefix: str = ""):
+        self.l1.clear(prefix)
+        self.l2.clear(prefix)
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.name,
+            "l1": self.l1.stats(),
+            "l2": self.l2.stats(),
+            "l1_hits": self.l1_hits,
+            "l2_hits": self.l2_hits,
+        }
+
+class JsonSerializer:
+    def dumps(self, value) -> bytes:
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def loads(self, data: bytes):
+        return json.loads(data)
+
+class PickleSerializer:
+    # Apenas para dados gerados pela própria aplicação: nunca desserializar conteúdo externo
+    def dumps(self, value) -> bytes:
+        return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def loads(self, data: bytes):
+        return pickle.loads(data)
+
+class RawSerializer:
+    # Valores que já são bytes, como respostas JSON prontas
+    def dumps(self, value: bytes) -> bytes:
+        return value
+
+    def loads(self, data: bytes) -> bytes:
+        return data
+
+SERIALIZERS = {
+    "json": JsonSerializer,
+    "pickle": PickleSerializer,
+    "raw": RawSerializer,
+}
+
+class Codec:
+    """
+    Serializa valores e comprime com zlib os que passam de `compress_min_bytes`.
+    O primeiro byte indica se o conteúdo foi comprimido.
+    """
+    def __init__(self, serializer: str = CACHE_SERIALIZER, compress_min_bytes: int = CACHE_COMPRESS_MIN_BYTES):
+        if serializer not in SERIALIZERS:
+            raise ValueError(f"Serializador de cache inválido: '{serializer}'")
+        self.serializer = SERIALIZERS[serializer]()
+        self.compress_min_bytes = compress_min_bytes
+
+    def encode(self, value) -> bytes:
+        data = self.serializer.dumps(value)
+        if self.compress_min_bytes and len(data) >= self.compress_min_bytes:
+            return b"z" + zlib.compress(data)
+        return b"r" + data
+
+    def decode(self, data: bytes):
+        if data[:1] == b"z":
+            return self.serializer.loads(zlib.decompress(data[1:]))
+        return self.serializer.loads(data[1:])
+
+_redis_backend = None
+
+def _shared_redis_backend() -> RedisBackend:
+    # Uma única conexão (pool) por processo, compartilhada por todos os caches
+    global _redis_backend
+    if _redis_backend is None:
+        _redis_backend = RedisBackend.from_url(REDIS_URL)
+    return _redis_backend
+
+def create_cache_backend(max_entries: int = CACHE_L1_MAX_ENTRIES, backend: str = CACHE_BACKEND):
+    """
+    Cria o backend configurado em CACHE_BACKEND. `max_entries` limita a parte em memória.
+    """
+    if backend == "memory":
+        return MemoryBackend(max_entries)
+    if backend == "redis":
+        return _shared_redis_backend()
+    if backend == "tiered":
+        return TieredBackend(MemoryBackend(min(max_entries, CACHE_L1_MAX_ENTRIES)), _shared_redis_backend())
+    raise ValueError(f"Backend de cache inválido: '{backend}'")
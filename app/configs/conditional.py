@@ -0,0 +1,95 @@
+from email.utils import formatdate, parsedate_to_datetime
+import hashlib
+import os
+import time
+
+from fastapi import Depends, Request
+from starlette.datastructures import MutableHeaders
+
+from app.configs.versions import table_versions
+from app.errors import NotModified
+
+# s-maxage das respostas sem autenticação: por quantos segundos um proxy reverso pode servi-las sem revalidar
+CONDITIONAL_SHARED_MAX_AGE_SECONDS = int(os.getenv("CONDITIONAL_SHARED_MAX_AGE_SECONDS", "0"))
+
+# Onde a dependência deixa os headers para o middleware aplicar na resposta 200
+STATE_KEY = "conditional_headers"
+
+def _cache_control(authenticated: bool) -> str:
+    # Com autenticação, o proxy pode guardar a resposta, mas revalida sempre: a origem confere o token antes do 304
+    if authenticated or CONDITIONAL_SHARED_MAX_AGE_SECONDS <= 0:
+        return "public, no-cache"
+    return f"public, max-age=0, s-maxage={CONDITIONAL_SHARED_MAX_AGE_SECONDS}"
+
+def _etag(request: Request, versions: tuple, extra) -> str:
+    # Mesma URL, mesmo formato pedido e mesmas versões das tabelas: mesmos bytes
+    key = repr((request.url.path, sorted(request.query_params.multi_items()), request.headers.get("accept"), versions, extra))
+    return '"' + hashlib.blake2b(key.encode(), digest_size=16).hexdigest() + '"'
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    # Comparação fraca, como pede o If-None-Match
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in (candidate.removeprefix("W/") for candidate in candidates)
+
+def _not_modified_since(if_modified_since: str, modified: int) -> bool:
+    try:
+        return modified <= parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+def conditional_get(*tables: str, authenticated: bool = False, extra=None):
+    """
+    Dependência das rotas GET com ETag e Last-Modified derivados das versões das tabelas lidas por elas.
+
+    Roda antes de qualquer consulta: se o `If-None-Match` (ou, sem ele, o `If-Modified-Since`) ainda
+    corresponde às versões atuais, responde 304 sem executar a rota. Caso contrário, os validadores e o
+    Cache-Control são aplicados à resposta 200 pelo `ConditionalHeadersMiddleware`.
+    `extra()` entra no ETag quando a resposta também depende de estado fora das tabelas; nesse caso o horário
+    do último commit não basta para validar a resposta, e só o ETag é usado (sem Last-Modified nem If-Modified-Since).
+    """
+    # Função síncrona: o FastAPI a executa no threadpool, então a leitura das versões no Redis não para o event loop
+    def dependency(request: Request):
+        validators = table_versions.validators(*tables)
+        if validators is None:
+            # Backend das versões indisponível: sem validadores, a rota responde normalmente
+            return
+        versions, modified = validators
+        headers = {
+            "ETag": _etag(request, versions, extra() if extra is not None else None),
+            "Cache-Control": _cache_control(authenticated),
+            "Vary": "Accept",
+        }
+        # Um commit ainda neste segundo não mudaria o Last-Modified: só o ETag é confiável até o segundo acabar
+        if extra is None and 0 < modified < int(time.time()):
+            headers["Last-Modified"] = formatdate(modified, usegmt=True)
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            if _matches(if_none_match, headers["ETag"]):
+                raise NotModified(headers)
+        elif "Last-Modified" in headers and _not_modified_since(request.headers.get("if-modified-since"), modified):
+            raise NotModified(headers)
+        setattr(request.state, STATE_KEY, headers)
+    return Depends(dependency)
+
+class ConditionalHeadersMiddleware:
+    """
+    Aplica às respostas 200 os validadores calculados por `conditional_get`, inclusive nas rotas
+    que devolvem um Response pronto (páginas em orjson, cache de analytics, exportações).
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_validators(message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                headers = scope.get("state", {}).get(STATE_KEY)
+                if headers:
+                    MutableHeaders(scope=message).update(headers)
+            await send(message)
+
+        await self.app(scope, receive, send_with_validators)
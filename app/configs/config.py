@@ -1,5 +1,6 @@
 from sqlalchemy import create_engine
 from app.configs.database import Base
+from app.configs.versions import table_versions
 import os
 
 DATABASE_URL = os.getenv("DATABASE_URL")
@@ -15,4 +16,6 @@ def configurar_banco(database_url = DATABASE_URL, force_drop=False):
         Base.metadata.drop_all(engine)
 
     Base.metadata.create_all(engine) 
+    # O schema pode ter sido recriado: nenhum resultado em cache continua válido
+    table_versions.bump_all()
     print("Banco de dados configurado!")
\ No newline at end of file
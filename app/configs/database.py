@@ -1,13 +1,43 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import NullPool
 import os
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Drivers assíncronos equivalentes aos drivers síncronos usados em DATABASE_URL
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def async_database_url(database_url: str) -> str:
+    url = make_url(database_url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername)).render_as_string(hide_password=False)
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or async_database_url(DATABASE_URL)
+# Pool compartilhado pelas sessões assíncronas; também limita quantas consultas rodam ao mesmo tempo no processo
+ASYNC_DB_POOL_SIZE = int(os.getenv("ASYNC_DB_POOL_SIZE", "10"))
+ASYNC_DB_MAX_OVERFLOW = int(os.getenv("ASYNC_DB_MAX_OVERFLOW", "10"))
+
 engine = create_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Engine assíncrono usado pelas rotas de analytics. No SQLite as conexões não são reaproveitadas:
+# são baratas e o aiosqlite as prende ao event loop em que foram abertas
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    **(
+        {"poolclass": NullPool}
+        if make_url(ASYNC_DATABASE_URL).get_backend_name() == "sqlite"
+        else {"pool_size": ASYNC_DB_POOL_SIZE, "max_overflow": ASYNC_DB_MAX_OVERFLOW}
+    ),
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 # Dependência para obter sessão do banco
 def get_db():
     db = SessionLocal()
@@ -15,3 +45,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Dependência para obter sessão assíncrona do banco
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,215 @@
+from datetime import date, datetime
+from enum import Enum
+import csv
+import io
+import json
+import os
+
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+from fastapi.routing import APIRoute
+from sqlalchemy import select
+import orjson
+
+from app.configs.database import SessionLocal
+
+# Linhas lidas do cursor do banco e escritas na resposta por vez (também o tamanho dos record batches do Arrow)
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+CSV_MEDIA_TYPE = "text/csv"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+# Nomes alternativos aceitos no Accept
+MEDIA_TYPE_ALIASES = {"application/x-msgpack": MSGPACK_MEDIA_TYPE}
+EXPORT_MEDIA_TYPES = (NDJSON_MEDIA_TYPE, CSV_MEDIA_TYPE, ARROW_MEDIA_TYPE, MSGPACK_MEDIA_TYPE)
+BINARY_MEDIA_TYPES = (ARROW_MEDIA_TYPE, MSGPACK_MEDIA_TYPE)
+
+def _accepted_media_type(request: Request, media_types: tuple):
+    for media_range in request.headers.get("accept", "").split(","):
+        media_type = media_range.split(";")[0].strip().lower()
+        media_type = MEDIA_TYPE_ALIASES.get(media_type, media_type)
+        if media_type in media_types:
+            return media_type
+    return None
+
+def export_media_type(request: Request):
+    """
+    Formato de exportação pedido no header Accept (o primeiro suportado, na ordem do header), ou None.
+    """
+    return _accepted_media_type(request, EXPORT_MEDIA_TYPES)
+
+def _export_value(value):
+    # Mesma representação das respostas JSON das rotas
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+class _NdjsonEncoder:
+    def __init__(self, columns: list):
+        self.columns = columns
+
+    def header(self) -> bytes:
+        return b""
+
+    def chunk(self, rows) -> bytes:
+        return "".join(
+            json.dumps(dict(zip(self.columns, map(_export_value, row))), ensure_ascii=False) + "\n"
+            for row in rows
+        ).encode("utf-8")
+
+    def footer(self) -> bytes:
+        return b""
+
+class _CsvEncoder(_NdjsonEncoder):
+    def _write(self, rows) -> bytes:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows([_export_value(value) for value in row] for row in rows)
+        return buffer.getvalue().encode("utf-8")
+
+    def header(self) -> bytes:
+        return self._write([self.columns])
+
+    def chunk(self, rows) -> bytes:
+        return self._write(rows)
+
+class _MsgpackEncoder(_NdjsonEncoder):
+    # Sequência de mapas, um por linha (como no NDJSON), lida com msgpack.Unpacker
+    def chunk(self, rows) -> bytes:
+        import msgpack
+
+        packer = msgpack.Packer()
+        return b"".join(packer.pack(dict(zip(self.columns, map(_export_value, row)))) for row in rows)
+
+def _arrow_type(column):
+    import pyarrow as pa
+
+    python_type = column.type.python_type
+    if issubclass(python_type, bool):
+        return pa.bool_()
+    if issubclass(python_type, int):
+        return pa.int64()
+    if issubclass(python_type, float):
+        return pa.float64()
+    if issubclass(python_type, datetime):
+        return pa.timestamp("us")
+    if issubclass(python_type, date):
+        return pa.date32()
+    return pa.string()
+
+class _ArrowEncoder:
+    """
+    Stream IPC do Arrow: o schema vem dos tipos das colunas e cada lote de linhas do cursor vira um record batch.
+    """
+    def __init__(self, model, columns: list):
+        import pyarrow as pa
+
+        self.schema = pa.schema([(column, _arrow_type(getattr(model, column))) for column in columns])
+        self.buffer = io.BytesIO()
+        self.writer = None
+
+    def _drain(self) -> bytes:
+        data = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return data
+
+    def header(self) -> bytes:
+        import pyarrow as pa
+
+        self.writer = pa.ipc.new_stream(self.buffer, self.schema)
+        return self._drain()
+
+    def chunk(self, rows) -> bytes:
+        import pyarrow as pa
+
+        columns = list(zip(*rows))
+        self.writer.write_batch(pa.record_batch(
+            [pa.array(values, type=field.type) for values, field in zip(columns, self.schema)],
+            schema=self.schema,
+        ))
+        return self._drain()
+
+    def footer(self) -> bytes:
+        self.writer.close()
+        return self._drain()
+
+def _encoder(model, columns: list, media_type: str):
+    if media_type == ARROW_MEDIA_TYPE:
+        return _ArrowEncoder(model, columns)
+    if media_type == CSV_MEDIA_TYPE:
+        return _CsvEncoder(columns)
+    if media_type == MSGPACK_MEDIA_TYPE:
+        return _MsgpackEncoder(columns)
+    return _NdjsonEncoder(columns)
+
+def stream_table_response(model, columns: list, media_type: str) -> StreamingResponse:
+    """
+    Exporta a tabela inteira de `model`, ordenada pela chave primária, em NDJSON, CSV, MessagePack ou Arrow IPC.
+
+    As linhas são lidas com `yield_per` (cursor no servidor, no PostgreSQL) e escritas na resposta
+    a cada lote de EXPORT_BATCH_SIZE, sem montar objetos do ORM nem modelos Pydantic, então a memória
+    não cresce com o tamanho da tabela. A sessão é aberta pelo próprio gerador, porque a da dependência
+    é fechada antes de o corpo da resposta ser enviado.
+    """
+    statement = (
+        select(*(getattr(model, column) for column in columns))
+        .order_by(*model.__table__.primary_key.columns)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+
+    def generate():
+        encoder = _encoder(model, columns, media_type)
+        yield encoder.header()
+        with SessionLocal() as db:
+            for rows in db.execute(statement).partitions():
+                yield encoder.chunk(rows)
+        yield encoder.footer()
+
+    headers = {}
+    if media_type == CSV_MEDIA_TYPE:
+        headers["Content-Disposition"] = f'attachment; filename="{model.__tablename__}.csv"'
+    return StreamingResponse(generate(), media_type=media_type, headers=headers)
+
+def encode_payload(payload, media_type: str) -> bytes:
+    """
+    Resposta JSON já calculada em MessagePack ou Arrow IPC.
+    No Arrow, uma lista `rows` de registros (como no cubo) vira a tabela e o restante vai nos metadados do schema;
+    os demais documentos viram uma tabela de uma linha, com os campos aninhados como structs e listas.
+    """
+    if media_type == MSGPACK_MEDIA_TYPE:
+        import msgpack
+
+        return msgpack.packb(payload)
+
+    import pyarrow as pa
+
+    if isinstance(payload, dict) and isinstance(payload.get("rows"), list):
+        metadata = {"payload": orjson.dumps({key: value for key, value in payload.items() if key != "rows"})}
+        table = pa.Table.from_pylist(payload["rows"]).replace_schema_metadata(metadata)
+    else:
+        table = pa.Table.from_pylist([payload])
+    buffer = io.BytesIO()
+    with pa.ipc.new_stream(buffer, table.schema) as writer:
+        writer.write_table(table)
+    return buffer.getvalue()
+
+class BinaryNegotiationRoute(APIRoute):
+    """
+    Rotas cujas respostas JSON também podem ser pedidas em MessagePack ou Arrow IPC pelo header Accept.
+    A resposta é calculada (ou lida do cache) como JSON e só então convertida, então o cache guarda um único formato.
+    """
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def negotiated_handler(request: Request) -> Response:
+            response = await handler(request)
+            media_type = _accepted_media_type(request, BINARY_MEDIA_TYPES)
+            if media_type is None or response.status_code != 200 or response.media_type != "application/json":
+                return response
+            headers = {key: value for key, value in response.headers.items() if key not in ("content-length", "content-type")}
+            return Response(content=encode_payload(orjson.loads(response.body), media_type), media_type=media_type, headers=headers)
+
+        return negotiated_handler
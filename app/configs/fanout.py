@@ -0,0 +1,28 @@
+import asyncio
+import os
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Máximo de subconsultas simultâneas de uma mesma requisição. O limite global é o pool de conexões do engine
+ANALYTICS_MAX_PARALLEL_QUERIES = int(os.getenv("ANALYTICS_MAX_PARALLEL_QUERIES", "4"))
+
+async def run_concurrently(db: AsyncSession, max_parallel: int = None, **queries) -> dict:
+    """
+    Executa consultas independentes ao mesmo tempo, cada uma em uma sessão curta própria
+    criada sobre o mesmo engine (e pool) de `db`, e devolve os resultados pelo nome.
+
+    Cada consulta é uma função síncrona que recebe uma Session, como as funções de app.utils.
+    Como cada uma usa a sua transação, escritas concorrentes podem ser vistas por umas e não
+    por outras; por isso só devem ser agrupadas consultas cujos resultados não precisam bater entre si.
+    Sem `max_parallel`, vale ANALYTICS_MAX_PARALLEL_QUERIES.
+    """
+    # Criado por chamada: o limite é por requisição e o semáforo fica preso ao event loop atual
+    semaphore = asyncio.Semaphore(max(1, max_parallel or ANALYTICS_MAX_PARALLEL_QUERIES))
+
+    async def run(query):
+        async with semaphore:
+            async with AsyncSession(bind=db.bind, autoflush=False) as session:
+                return await session.run_sync(query)
+
+    results = await asyncio.gather(*(run(query) for query in queries.values()))
+    return dict(zip(queries, results))
@@ -0,0 +1,56 @@
+from fastapi import Query
+from sqlalchemy import inspect
+from sqlalchemy.orm import load_only
+
+from app.errors import UnknownFields
+
+# Em `fields`, inclui todos os campos, inclusive as colunas adiadas
+ALL_FIELDS = "*"
+
+def get_fields(fields: str = Query(default=None, description="Campos da resposta, separados por vírgula; '*' inclui as colunas adiadas")):
+    """
+    Campos pedidos em `?fields=a,b`, ou None para os campos padrão da rota.
+    """
+    if fields is None:
+        return None
+    return [field.strip() for field in fields.split(",") if field.strip()]
+
+def deferred_fields(model) -> set:
+    # Colunas marcadas com deferred() no modelo, fora da resposta padrão
+    return {attr.key for attr in inspect(model).column_attrs if attr.deferred}
+
+def select_fields(model, response_model, fields: list = None) -> list:
+    """
+    Campos da resposta, na ordem do schema: os pedidos em `fields` e sempre a chave primária.
+    Sem `fields`, todos menos as colunas adiadas do modelo; com `*`, todos.
+    """
+    available = list(response_model.model_fields)
+    if fields is None:
+        hidden = deferred_fields(model)
+        return [field for field in available if field not in hidden]
+    if ALL_FIELDS in fields:
+        return available
+    unknown = [field for field in fields if field not in available]
+    if unknown:
+        raise UnknownFields(unknown)
+    primary_key = inspect(model).primary_key[0].key
+    return [field for field in available if field == primary_key or field in fields]
+
+def query_fields(model, response_model, fields: list):
+    """
+    Campos a repassar às utils de leitura por id: None quando `fields` são os campos padrão, e a util
+    usa o carregador da sessão (`app.configs.loader`); senão os próprios `fields`, para o `load_fields`.
+    """
+    return None if fields == select_fields(model, response_model) else fields
+
+def load_fields(model, fields: list):
+    """
+    Opção da consulta que restringe o SELECT aos campos pedidos (carregando as colunas adiadas pedidas).
+    """
+    return load_only(*(getattr(model, field) for field in fields))
+
+def project(obj, fields: list, response_model):
+    """
+    Resposta só com `fields`; lidos com getattr para carregar uma coluna adiada que não veio na consulta.
+    """
+    return response_model.model_validate({field: getattr(obj, field) for field in fields})
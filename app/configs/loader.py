@@ -0,0 +1,90 @@
+from collections import defaultdict
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+class BatchLoader:
+    """
+    Carregador por sessão (uma por requisição) das entidades por chave primária.
+
+    As chaves ainda não carregadas de cada leitura são resolvidas com um único `WHERE id IN (...)`.
+    Os resultados, inclusive as chaves inexistentes, ficam memorizados até a próxima escrita,
+    commit ou rollback da sessão, então a mesma chave não é consultada duas vezes na requisição.
+    """
+    def __init__(self, db: Session):
+        self.db = db
+        self._loaded = defaultdict(dict)
+        self.batches = 0
+
+    @staticmethod
+    def _primary_key(model):
+        return inspect(model).primary_key[0]
+
+    def _coerce(self, model, key):
+        # Parâmetros de rota chegam como texto em algumas rotas ("1" e 1 devem ser a mesma chave)
+        try:
+            return self._primary_key(model).type.python_type(key)
+        except (TypeError, ValueError, NotImplementedError):
+            return key
+
+    def _dispatch(self, model, keys: list):
+        keys = {key for key in keys if key not in self._loaded[model]}
+        if not keys:
+            return
+        primary_key = self._primary_key(model)
+        found = {getattr(obj, primary_key.key): obj for obj in self.db.query(model).filter(primary_key.in_(keys)).all()}
+        # Obtido depois da consulta: um autoflush durante ela limpa o carregador
+        loaded = self._loaded[model]
+        for key in keys:
+            loaded[key] = found.get(key)
+        self.batches += 1
+
+    def load(self, model, key):
+        """
+        Objeto com a chave informada, ou None se não existir.
+        """
+        key = self._coerce(model, key)
+        self._dispatch(model, [key])
+        return self._loaded[model][key]
+
+    def load_many(self, model, keys) -> dict:
+        """
+        Objetos por chave, na ordem pedida; chaves inexistentes mapeiam para None.
+        """
+        keys = [self._coerce(model, key) for key in keys]
+        self._dispatch(model, keys)
+        loaded = self._loaded[model]
+        return {key: loaded[key] for key in keys}
+
+    def clear(self):
+        self._loaded.clear()
+
+def get_batch_loader(db: Session) -> BatchLoader:
+    """
+    Carregador da sessão, criado no primeiro uso.
+    """
+    loader = db.info.get("batch_loader")
+    if loader is None:
+        loader = db.info["batch_loader"] = BatchLoader(db)
+    return loader
+
+def _clear_batch_loader(session: Session):
+    loader = session.info.get("batch_loader")
+    if loader is not None:
+        loader.clear()
+
+@event.listens_for(Session, "after_flush")
+def _clear_after_flush(session, flush_context):
+    _clear_batch_loader(session)
+
+@event.listens_for(Session, "do_orm_execute")
+def _clear_after_bulk_statement(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        _clear_batch_loader(orm_execute_state.session)
+
+@event.listens_for(Session, "after_commit")
+def _clear_after_commit(session):
+    _clear_batch_loader(session)
+
+@event.listens_for(Session, "after_rollback")
+def _clear_after_rollback(session):
+    _clear_batch_loader(session)
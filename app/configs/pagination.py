@@ -0,0 +1,75 @@
+from collections import namedtuple
+import base64
+import binascii
+import json
+import os
+
+from fastapi import Query
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import inspect, select
+from sqlalchemy.orm import Session
+
+from app.errors import InvalidCursor
+
+# Tamanho padrão e máximo das páginas das listagens
+PAGE_DEFAULT_LIMIT = int(os.getenv("PAGE_DEFAULT_LIMIT", "100"))
+PAGE_MAX_LIMIT = int(os.getenv("PAGE_MAX_LIMIT", "1000"))
+
+PageParams = namedtuple("PageParams", ["cursor", "limit"])
+
+def get_page_params(
+    cursor: str = Query(default=None),
+    limit: int = Query(default=PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT),
+) -> PageParams:
+    """
+    Parâmetros de paginação das listagens: `cursor` devolvido em `next_cursor` pela página anterior e `limit`.
+    """
+    return PageParams(cursor, limit)
+
+def encode_cursor(table: str, last_id: int) -> str:
+    # Opaco para o cliente: a tabela impede que o cursor de uma listagem seja usado em outra
+    payload = json.dumps({"t": table, "after": last_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+def decode_cursor(table: str, cursor: str = None):
+    """
+    Último id da página anterior, ou None na primeira página.
+    """
+    if cursor is None:
+        return None
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        after = payload["after"]
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise InvalidCursor("formato não reconhecido")
+    if payload.get("t") != table or not isinstance(after, int):
+        raise InvalidCursor("cursor de outra listagem")
+    return after
+
+def select_page_rows(model, columns: list, after: int = None, limit: int = PAGE_DEFAULT_LIMIT, db: Session = None) -> list:
+    """
+    Até `limit + 1` linhas de `columns`, como tuplas do Core (sem objetos do ORM), lidas com
+    `WHERE id > :after ORDER BY id LIMIT :limit + 1`. Sem OFFSET, a página N custa o mesmo que a primeira.
+    """
+    primary_key = inspect(model).primary_key[0]
+    statement = select(*(getattr(model, column) for column in columns)).order_by(primary_key).limit(limit + 1)
+    if after is not None:
+        statement = statement.where(primary_key > after)
+    return db.execute(statement).all()
+
+def page_response(model, columns: list, rows: list, limit: int) -> ORJSONResponse:
+    """
+    Página (mesmo formato de `Page`) com as linhas de `select_page_rows`, serializada direto em bytes pelo orjson.
+
+    O item excedente só indica que há uma próxima página, cujo cursor é a chave do último item devolvido.
+    As colunas já têm os tipos dos schemas de resposta (o mesmo contrato da exportação NDJSON/CSV), então as
+    linhas não passam por modelos Pydantic nem pela validação da anotação de retorno da rota.
+    """
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    key = columns.index(inspect(model).primary_key[0].key)
+    return ORJSONResponse({
+        "items": [dict(zip(columns, row)) for row in rows],
+        "next_cursor": encode_cursor(model.__tablename__, rows[-1][key]) if has_more else None,
+        "limit": limit,
+    })
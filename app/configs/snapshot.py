@@ -0,0 +1,357 @@
+from dataclasses import dataclass, field
+from logging import getLogger
+from threading import Lock
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+from fastapi.responses import Response
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.configs.cache import serialize_json
+from app.configs.database import SessionLocal
+from app.configs.versions import rewrites_key, table_versions
+from app.errors import SnapshotUnavailable
+from app.models.model_part import Part
+from app.models.model_supplier import Supplier
+from app.models.model_vehicle import Vehicle
+from app.models.model_warranty import Warranty
+from app.schemas.analytical import AnalyticsSourceEnum
+
+logger = getLogger(__name__)
+
+ANALYTICS_SNAPSHOT_ENABLED = os.getenv("ANALYTICS_SNAPSHOT_ENABLED", "false") in ("true", "yes")
+ANALYTICS_SNAPSHOT_MAX_BYTES = int(os.getenv("ANALYTICS_SNAPSHOT_MAX_BYTES", str(256 * 1024 * 1024)))
+ANALYTICS_SNAPSHOT_REFRESH_SECONDS = float(os.getenv("ANALYTICS_SNAPSHOT_REFRESH_SECONDS", "30"))
+
+# Chaves ausentes (NULL ou sem linha na dimensão) viram -1 nas colunas inteiras
+MISSING = -1
+
+# Versões observadas pelo snapshot: (época, fatos, reescritas dos fatos, dimensões...)
+SNAPSHOT_VERSION_TABLES = (
+    Warranty.__tablename__,
+    rewrites_key(Warranty.__tablename__),
+    Vehicle.__tablename__,
+    Part.__tablename__,
+    Supplier.__tablename__,
+)
+
+class SnapshotUnavailableError(Exception):
+    pass
+
+@dataclass
+class Dictionary:
+    """
+    Codificação por dicionário de uma coluna de texto: cada valor distinto (inclusive None) vira um int32.
+    """
+    codes: dict = field(default_factory=dict)
+    values: list = field(default_factory=list)
+
+    def encode(self, values) -> np.ndarray:
+        codes = self.codes
+        for value in values:
+            if value not in codes:
+                codes[value] = len(self.values)
+                self.values.append(value)
+        return np.fromiter((codes[value] for value in values), dtype=np.int32, count=len(values))
+
+    def code(self, value) -> int:
+        return self.codes.get(value, MISSING)
+
+    def decode(self, code: int):
+        return self.values[code] if code != MISSING else None
+
+    def copy(self) -> "Dictionary":
+        return Dictionary(codes=dict(self.codes), values=list(self.values))
+
+    def nbytes(self) -> int:
+        return sum(sys.getsizeof(value) for value in self.values) + sys.getsizeof(self.codes)
+
+def _int_column(values) -> np.ndarray:
+    return np.fromiter((MISSING if value is None else value for value in values), dtype=np.int32, count=len(values))
+
+def _date_column(values) -> np.ndarray:
+    return np.array(values, dtype="datetime64[s]")
+
+def _lookup(keys: np.ndarray, ids: np.ndarray) -> np.ndarray:
+    # Posição de cada chave no array ordenado de ids, ou -1 quando a chave não existe na dimensão
+    if not len(ids):
+        return np.full(len(keys), MISSING, dtype=np.int32)
+    positions = np.searchsorted(ids, keys)
+    positions = np.minimum(positions, len(ids) - 1)
+    return np.where(ids[positions] == keys, positions, MISSING).astype(np.int32)
+
+@dataclass
+class WarrantySnapshot:
+    """
+    Junção de fact_warranties com veículos, peças e fornecedores em colunas NumPy.
+    Os fatos guardam a posição da linha de cada dimensão (-1 quando não existe), então um
+    agrupamento vira um `bincount`/`unique` sobre arrays, sem ida ao banco.
+    Um snapshot nunca é alterado depois de publicado: cada refresh gera um novo.
+    """
+    versions: tuple
+    loaded_at: float
+    # Fatos, ordenados por claim_key
+    claim_key: np.ndarray
+    fact_part_id: np.ndarray
+    fact_vehicle_id: np.ndarray
+    repair_date: np.ndarray
+    failure: np.ndarray
+    failures: Dictionary
+    fact_part: np.ndarray
+    fact_vehicle: np.ndarray
+    # Veículos, ordenados por vehicle_id
+    vehicle_id: np.ndarray
+    vehicle_model: np.ndarray
+    vehicle_propulsion: np.ndarray
+    vehicle_year: np.ndarray
+    prod_date: np.ndarray
+    models: Dictionary
+    propulsions: Dictionary
+    # Peças, ordenadas por part_id
+    part_id: np.ndarray
+    part_name: np.ndarray
+    part_supplier_id: np.ndarray
+    # Fornecedores, ordenados por supplier_id
+    supplier_id: np.ndarray
+    supplier_name: np.ndarray
+    supplier_cpf: np.ndarray
+
+    def nbytes(self) -> int:
+        arrays = [value for value in self.__dict__.values() if isinstance(value, np.ndarray)]
+        object_arrays = (self.part_name, self.supplier_name, self.supplier_cpf)
+        return (
+            sum(array.nbytes for array in arrays)
+            + sum(sys.getsizeof(value) for array in object_arrays for value in array)
+            + self.failures.nbytes() + self.models.nbytes() + self.propulsions.nbytes()
+        )
+
+def _load_vehicles(db: Session, models: Dictionary, propulsions: Dictionary) -> dict:
+    rows = db.query(Vehicle.vehicle_id, Vehicle.model, Vehicle.propulsion, Vehicle.year, Vehicle.prod_date).order_by(Vehicle.vehicle_id).all()
+    return {
+        "vehicle_id": _int_column([row.vehicle_id for row in rows]),
+        "vehicle_model": models.encode([row.model for row in rows]),
+        "vehicle_propulsion": propulsions.encode([row.propulsion for row in rows]),
+        "vehicle_year": _int_column([row.year for row in rows]),
+        "prod_date": _date_column([row.prod_date for row in rows]),
+        "models": models,
+        "propulsions": propulsions,
+    }
+
+def _load_parts(db: Session) -> dict:
+    rows = db.query(Part.part_id, Part.part_name, Part.supplier_id).order_by(Part.part_id).all()
+    return {
+        "part_id": _int_column([row.part_id for row in rows]),
+        "part_name": np.array([row.part_name for row in rows], dtype=object),
+        "part_supplier_id": _int_column([row.supplier_id for row in rows]),
+    }
+
+def _load_suppliers(db: Session) -> dict:
+    rows = db.query(Supplier.supplier_id, Supplier.supplier_name, Supplier.supplier_cpf).order_by(Supplier.supplier_id).all()
+    return {
+        "supplier_id": _int_column([row.supplier_id for row in rows]),
+        "supplier_name": np.array([row.supplier_name for row in rows], dtype=object),
+        "supplier_cpf": np.array([row.supplier_cpf for row in rows], dtype=object),
+    }
+
+def _load_facts(db: Session, failures: Dictionary, after_claim_key: int = None) -> dict:
+    query = db.query(Warranty.claim_key, Warranty.part_id, Warranty.vehicle_id, Warranty.repair_date, Warranty.classified_failured)
+    if after_claim_key is not None:
+        query = query.filter(Warranty.claim_key > after_claim_key)
+    rows = query.order_by(Warranty.claim_key).all()
+    return {
+        "claim_key": np.fromiter((row.claim_key for row in rows), dtype=np.int64, count=len(rows)),
+        "fact_part_id": _int_column([row.part_id for row in rows]),
+        "fact_vehicle_id": _int_column([row.vehicle_id for row in rows]),
+        "repair_date": _date_column([row.repair_date for row in rows]),
+        "failure": failures.encode([row.classified_failured for row in rows]),
+        "failures": failures,
+    }
+
+def _count_facts(db: Session, up_to_claim_key: int) -> int:
+    return db.query(func.count(Warranty.claim_key)).filter(Warranty.claim_key <= up_to_claim_key).scalar()
+
+def load_warranty_snapshot(db: Session, previous: WarrantySnapshot = None) -> WarrantySnapshot:
+    """
+    Carrega o snapshot. Com `previous`, reaproveita tudo o que não mudou desde ele:
+    dimensões sem alteração não são relidas e, se os fatos só receberam inserções,
+    apenas as garantias com claim_key maior que o último carregado são buscadas.
+
+    No PostgreSQL, transações concorrentes podem confirmar valores da sequência fora de ordem: uma garantia
+    com claim_key menor pode aparecer depois da carga que já passou dela. Por isso a leitura incremental é
+    conferida com um COUNT(*) até o último claim_key carregado e, se faltar alguma linha, os fatos são relidos.
+    """
+    # As versões são lidas antes da carga: um commit concorrente só provoca um novo refresh
+    versions = table_versions.get(*SNAPSHOT_VERSION_TABLES)
+    if versions is None:
+        raise SnapshotUnavailableError("versões das tabelas indisponíveis")
+    epoch, facts_version, fact_rewrites, vehicles_version, parts_version, suppliers_version = versions
+
+    reuse = previous is not None and previous.versions is not None and previous.versions[0] == epoch
+    data = {}
+    if reuse and previous.versions[3] == vehicles_version:
+        data.update({name: getattr(previous, name) for name in ("vehicle_id", "vehicle_model", "vehicle_propulsion", "vehicle_year", "prod_date", "models", "propulsions")})
+    else:
+        data.update(_load_vehicles(db, Dictionary(), Dictionary()))
+    if reuse and previous.versions[4] == parts_version:
+        data.update({name: getattr(previous, name) for name in ("part_id", "part_name", "part_supplier_id")})
+    else:
+        data.update(_load_parts(db))
+    if reuse and previous.versions[5] == suppliers_version:
+        data.update({name: getattr(previous, name) for name in ("supplier_id", "supplier_name", "supplier_cpf")})
+    else:
+        data.update(_load_suppliers(db))
+
+    fact_columns = ("claim_key", "fact_part_id", "fact_vehicle_id", "repair_date", "failure")
+    if reuse and previous.versions[2] == fact_rewrites:
+        if previous.versions[1] == facts_version:
+            data.update({name: getattr(previous, name) for name in (*fact_columns, "failures")})
+        else:
+            # Apenas inserções desde o último snapshot
+            last_claim_key = int(previous.claim_key[-1]) if len(previous.claim_key) else 0
+            new_facts = _load_facts(db, previous.failures.copy(), after_claim_key=last_claim_key)
+            data.update({name: np.concatenate([getattr(previous, name), new_facts[name]]) for name in fact_columns})
+            data["failures"] = new_facts["failures"]
+            loaded = len(data["claim_key"])
+            if loaded and _count_facts(db, int(data["claim_key"][-1])) != loaded:
+                logger.warning("Garantias confirmadas fora da ordem do claim_key: recarregando todos os fatos do snapshot")
+                data.update(_load_facts(db, Dictionary()))
+    else:
+        data.update(_load_facts(db, Dictionary()))
+
+    # As posições das dimensões são recalculadas sempre: são só duas buscas binárias vetorizadas
+    data["fact_part"] = _lookup(data["fact_part_id"], data["part_id"])
+    data["fact_vehicle"] = _lookup(data["fact_vehicle_id"], data["vehicle_id"])
+    return WarrantySnapshot(versions=versions, loaded_at=time.time(), **data)
+
+class SnapshotStore:
+    """
+    Guarda o snapshot publicado e decide quando atualizá-lo.
+    O refresh acontece no acesso, no máximo uma vez a cada `refresh_seconds`, e só relê o que mudou.
+    Enquanto um refresh está em andamento as outras requisições continuam usando o snapshot anterior
+    (ou o banco, se ainda não houver snapshot).
+    """
+    def __init__(self, max_bytes: int, refresh_seconds: float):
+        self.max_bytes = max_bytes
+        self.refresh_seconds = refresh_seconds
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._lock = Lock()
+        self.last_error = None
+        self.refreshes = 0
+
+    def refresh(self, db: Session) -> WarrantySnapshot:
+        # A trava nunca é esperada: o refresh em andamento já vai publicar um snapshot atualizado
+        if not self._lock.acquire(blocking=False):
+            raise SnapshotUnavailableError("refresh do snapshot já em andamento")
+        try:
+            return self._refresh(db)
+        finally:
+            self._lock.release()
+
+    def _refresh(self, db: Session) -> WarrantySnapshot:
+        current = self._snapshot
+        self._checked_at = time.monotonic()
+        if current is not None and current.versions == table_versions.get(*SNAPSHOT_VERSION_TABLES):
+            return current
+        try:
+            snapshot = load_warranty_snapshot(db, previous=current)
+        except SnapshotUnavailableError as e:
+            self.last_error = str(e)
+            raise
+        nbytes = snapshot.nbytes()
+        if nbytes > self.max_bytes:
+            # Acima do orçamento o snapshot é descartado e as análises voltam para o banco
+            self._snapshot = None
+            self.last_error = f"snapshot com {nbytes} bytes excede o limite de {self.max_bytes} bytes"
+            logger.warning(self.last_error)
+            raise SnapshotUnavailableError(self.last_error)
+        self._snapshot = snapshot
+        self.last_error = None
+        self.refreshes += 1
+        return snapshot
+
+    def fresh(self):
+        """
+        Snapshot publicado, se ainda estiver dentro do intervalo de refresh; None quando é preciso consultar as versões.
+        """
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._checked_at < self.refresh_seconds:
+            return snapshot
+        return None
+
+    def get(self, db: Session) -> WarrantySnapshot:
+        """
+        Snapshot atualizado conforme o intervalo de refresh. Carrega na primeira chamada.
+        """
+        snapshot = self.fresh()
+        if snapshot is not None:
+            return snapshot
+        snapshot = self._snapshot
+        if not self._lock.acquire(blocking=False):
+            if snapshot is None:
+                raise SnapshotUnavailableError("snapshot ainda está sendo carregado")
+            return snapshot
+        try:
+            return self._refresh(db)
+        finally:
+            self._lock.release()
+
+    def loaded(self) -> bool:
+        return self._snapshot is not None
+
+    def versions(self):
+        # Versões das tabelas do snapshot publicado, sem refresh (pode estar atrás das versões atuais)
+        snapshot = self._snapshot
+        return snapshot.versions if snapshot is not None else None
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        return {
+            "enabled": ANALYTICS_SNAPSHOT_ENABLED,
+            "loaded": snapshot is not None,
+            "warranties": len(snapshot.claim_key) if snapshot is not None else 0,
+            "nbytes": snapshot.nbytes() if snapshot is not None else 0,
+            "max_bytes": self.max_bytes,
+            "refresh_seconds": self.refresh_seconds,
+            "refreshes": self.refreshes,
+            "loaded_at": snapshot.loaded_at if snapshot is not None else None,
+            "last_error": self.last_error,
+        }
+
+snapshot_store = SnapshotStore(max_bytes=ANALYTICS_SNAPSHOT_MAX_BYTES, refresh_seconds=ANALYTICS_SNAPSHOT_REFRESH_SECONDS)
+
+def _with_session(method):
+    with SessionLocal() as db:
+        return method(db)
+
+async def run_snapshot_in_thread(method):
+    """
+    Executa `snapshot_store.get` ou `snapshot_store.refresh` em uma thread, com uma sessão síncrona própria.
+    A carga monta os arrays NumPy e pode levar segundos: no event loop ela pararia todas as outras requisições.
+    """
+    return await asyncio.to_thread(_with_session, method)
+
+async def get_analytics_snapshot(source: AnalyticsSourceEnum = AnalyticsSourceEnum.auto):
+    """
+    Fonte escolhida pela requisição: o snapshot em memória ou None para consultar o banco.
+    `auto` usa o snapshot apenas quando ANALYTICS_SNAPSHOT_ENABLED está ligado e ele cabe no orçamento de memória.
+    """
+    if source == AnalyticsSourceEnum.db or (source == AnalyticsSourceEnum.auto and not ANALYTICS_SNAPSHOT_ENABLED):
+        return None
+    snapshot = snapshot_store.fresh()
+    if snapshot is not None:
+        return snapshot
+    try:
+        return await run_snapshot_in_thread(snapshot_store.get)
+    except SnapshotUnavailableError as e:
+        if source == AnalyticsSourceEnum.snapshot:
+            raise SnapshotUnavailable(e)
+        return None
+
+def snapshot_json_response(payload) -> Response:
+    # Respostas do snapshot não passam pelo cache: já são calculadas em memória
+    return Response(content=serialize_json(payload), media_type="application/json", headers={"X-Analytics-Source": "snapshot"})
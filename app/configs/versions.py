@@ -0,0 +1,117 @@
+from logging import getLogger
+import secrets
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.configs.cache_backend import create_cache_backend
+
+logger = getLogger(__name__)
+
+# Época das versões: um valor aleatório novo a cada boot e a cada recriação do schema, nunca um contador,
+# para que um processo reiniciado (ou outro worker, com o backend em memória) não repita as versões e os ETags
+# de dados diferentes
+EPOCH_KEY = "versions:__epoch__"
+# Horário (em segundos) do último commit de cada tabela, para o Last-Modified das respostas
+MODIFIED_EPOCH_KEY = "modified:__epoch__"
+
+def _new_epoch() -> int:
+    return secrets.randbits(63)
+
+class TableVersions:
+    """
+    Contadores de geração por tabela. Cada commit que altera uma tabela incrementa o seu contador,
+    então qualquer resultado derivado dela pode ser invalidado comparando as versões.
+    Os contadores ficam no backend de cache, e com o Redis são compartilhados entre os workers.
+    """
+    def __init__(self, backend):
+        self.backend = backend
+        if backend.name == "memory":
+            # Os contadores em memória recomeçam do zero a cada boot; no Redis a época é trocada por `bump_all`
+            backend.set_counters({EPOCH_KEY: _new_epoch()})
+
+    def get(self, *tables: str):
+        """
+        Retorna a tupla (época, *versões) ou None se o backend estiver indisponível,
+        caso em que nada deve ser lido nem gravado no cache.
+        """
+        try:
+            return tuple(self.backend.get_counters([EPOCH_KEY, *(f"versions:{table}" for table in tables)]))
+        except Exception as e:
+            logger.error(f"Erro ao ler as versões das tabelas {tables}: {str(e)}")
+            return None
+
+    def bump(self, *tables: str):
+        try:
+            self.backend.incr(*(f"versions:{table}" for table in tables))
+            self.backend.set_counters({f"modified:{table}": int(time.time()) for table in tables})
+        except Exception as e:
+            logger.error(f"Erro ao incrementar as versões das tabelas {tables}: {str(e)}")
+
+    def bump_all(self):
+        # Usado quando o schema é recriado e nenhuma versão anterior pode ser reaproveitada
+        try:
+            self.backend.set_counters({EPOCH_KEY: _new_epoch(), MODIFIED_EPOCH_KEY: int(time.time())})
+        except Exception as e:
+            logger.error(f"Erro ao trocar a época das versões: {str(e)}")
+
+    def validators(self, *tables: str):
+        """
+        Retorna (versões, último commit) das tabelas em uma única leitura, ou None se o backend estiver indisponível.
+        `versões` é a mesma tupla de `get`; o último commit é um timestamp em segundos (0 se desconhecido).
+        """
+        keys = [EPOCH_KEY, *(f"versions:{table}" for table in tables)]
+        try:
+            counters = self.backend.get_counters([*keys, MODIFIED_EPOCH_KEY, *(f"modified:{table}" for table in tables)])
+        except Exception as e:
+            logger.error(f"Erro ao ler as versões das tabelas {tables}: {str(e)}")
+            return None
+        return tuple(counters[:len(keys)]), max(counters[len(keys):])
+
+table_versions = TableVersions(create_cache_backend(max_entries=0))
+
+def rewrites_key(table: str) -> str:
+    """
+    Contador que só muda quando linhas existentes da tabela são alteradas ou removidas.
+    Permite distinguir tabelas que apenas receberam novas linhas (e podem ser lidas de forma incremental).
+    """
+    return f"{table}:rewrites"
+
+def _changed_tables(session: Session) -> set:
+    return session.info.setdefault("changed_tables", set())
+
+def mark_tables_changed(session: Session, *tables: str):
+    """
+    Registra escritas feitas fora do ORM (por exemplo, COPY direto na conexão), para que o commit incremente as versões.
+    """
+    _changed_tables(session).update(tables)
+
+@event.listens_for(Session, "after_flush")
+def _track_flushed_tables(session, flush_context):
+    # Nesse ponto new/dirty/deleted ainda refletem o estado anterior ao flush
+    for obj in session.new:
+        _changed_tables(session).add(obj.__table__.name)
+    for obj in (*session.dirty, *session.deleted):
+        _changed_tables(session).update((obj.__table__.name, rewrites_key(obj.__table__.name)))
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_bulk_statements(orm_execute_state):
+    # INSERT/UPDATE/DELETE em massa (query.update(), query.delete(), insert().from_select()) não passam pelo flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None:
+            table = mapper.local_table.name
+            _changed_tables(orm_execute_state.session).add(table)
+            if not orm_execute_state.is_insert:
+                _changed_tables(orm_execute_state.session).add(rewrites_key(table))
+
+@event.listens_for(Session, "after_commit")
+def _bump_committed_tables(session):
+    tables = session.info.pop("changed_tables", None)
+    if tables:
+        table_versions.bump(*tables)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back_tables(session):
+    session.info.pop("changed_tables", None)
@@ -0,0 +1,136 @@
+from collections import namedtuple
+from logging import getLogger
+import asyncio
+import os
+import time
+
+from fastapi import HTTPException
+
+from app.configs.cache import ANALYTICS_CACHE_TTL_SECONDS, VersionedCache, call_cache_backend, serialize_json
+from app.configs.database import AsyncSessionLocal
+from app.configs.versions import table_versions
+
+logger = getLogger(__name__)
+
+# Pré-cálculo das análises em segundo plano, iniciado junto com a aplicação
+ANALYTICS_WARMUP_ENABLED = os.getenv("ANALYTICS_WARMUP_ENABLED", "false").lower() == "true"
+# Intervalo entre recálculos completos e entre verificações de mudança nos dados.
+# Por padrão, metade do TTL do cache: cada resposta é regravada antes de expirar
+ANALYTICS_WARMUP_INTERVAL_SECONDS = float(os.getenv("ANALYTICS_WARMUP_INTERVAL_SECONDS", str(ANALYTICS_CACHE_TTL_SECONDS / 2)))
+ANALYTICS_WARMUP_POLL_SECONDS = float(os.getenv("ANALYTICS_WARMUP_POLL_SECONDS", "5"))
+
+# Uma resposta a pré-calcular: chave no cache, tabelas lidas e corrotina que recebe a AsyncSession
+WarmupJob = namedtuple("WarmupJob", ["key", "tables", "compute"])
+
+class AnalyticsWarmer:
+    """
+    Agendador que mantém as respostas de analytics pré-calculadas no cache.
+
+    A cada `poll_seconds` recalcula apenas as respostas cujas tabelas mudaram desde o último cálculo;
+    a cada `interval_seconds` recalcula todas, antes que expirem. `list_jobs(db)` enumera as respostas
+    a partir dos dados atuais, então províncias, modelos e fornecedores novos entram na próxima passada.
+    Com o Redis, a trava de revalidação do cache evita que vários workers calculem a mesma resposta.
+    """
+    def __init__(self, cache: VersionedCache, list_jobs, interval_seconds: float = ANALYTICS_WARMUP_INTERVAL_SECONDS, poll_seconds: float = ANALYTICS_WARMUP_POLL_SECONDS):
+        self.cache = cache
+        self.list_jobs = list_jobs
+        self.interval_seconds = interval_seconds
+        self.poll_seconds = poll_seconds
+        self.ready = False
+        self.runs = 0
+        self.warmed = 0
+        self.errors = 0
+        self.last_failed = 0
+        self.last_run_at = None
+        self._warmed_versions = {}
+        self._full_run_at = None
+        self._task = None
+
+    def _backends(self) -> tuple:
+        return table_versions.backend, self.cache.backend
+
+    async def _warm_job(self, job: WarmupJob, versions: tuple) -> bool:
+        # Sessão própria por resposta, como em uma requisição
+        async with AsyncSessionLocal() as db:
+            try:
+                payload = await job.compute(db)
+            except HTTPException:
+                # Combinação sem dados (404): nada a guardar até a próxima mudança
+                return False
+        await call_cache_backend(self._backends(), self.cache.set, job.key, serialize_json(payload), versions)
+        self.warmed += 1
+        return True
+
+    async def warm(self, force: bool = False) -> int:
+        """
+        Executa uma passada e retorna quantas respostas foram recalculadas.
+        Com `force`, recalcula também as que não mudaram. `ready` só passa a True ao fim de uma passada sem falhas:
+        com alguma resposta com erro, o cache ainda não está aquecido.
+        """
+        async with AsyncSessionLocal() as db:
+            jobs = await self.list_jobs(db)
+
+        warmed = 0
+        failed = 0
+        backends = self._backends()
+        for job in jobs:
+            versions = await call_cache_backend(backends, table_versions.get, *job.tables)
+            if versions is None or (not force and self._warmed_versions.get(job.key) == versions):
+                continue
+            if not await call_cache_backend(backends, self.cache.start_revalidation, job.key):
+                continue
+            try:
+                warmed += await self._warm_job(job, versions)
+                self._warmed_versions[job.key] = versions
+            except Exception as e:
+                logger.error(f"Erro ao pré-calcular {job.key}: {str(e)}")
+                self.errors += 1
+                failed += 1
+            finally:
+                await call_cache_backend(backends, self.cache.finish_revalidation, job.key)
+
+        self.runs += 1
+        self.last_run_at = time.time()
+        self.last_failed = failed
+        if not failed:
+            self.ready = True
+        return warmed
+
+    async def run(self):
+        while True:
+            now = time.monotonic()
+            force = self._full_run_at is None or now - self._full_run_at >= self.interval_seconds
+            try:
+                await self.warm(force=force)
+                if force:
+                    self._full_run_at = now
+            except Exception as e:
+                logger.error(f"Erro no pré-cálculo das análises: {str(e)}")
+                self.errors += 1
+            await asyncio.sleep(self.poll_seconds)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "enabled": ANALYTICS_WARMUP_ENABLED,
+            "ready": self.ready,
+            "runs": self.runs,
+            "warmed": self.warmed,
+            "errors": self.errors,
+            "last_failed": self.last_failed,
+            "last_run_at": self.last_run_at,
+            "interval_seconds": self.interval_seconds,
+            "poll_seconds": self.poll_seconds,
+        }
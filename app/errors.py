@@ -1,6 +1,6 @@
 from fastapi import HTTPException
 from fastapi import status
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 
 class DecodeTokenException(HTTPException):
     """Decodificação do token"""
@@ -92,9 +92,96 @@ class UserNotFound(HTTPException):
 
     pass
 
+class SnapshotUnavailable(HTTPException):
+    """Snapshot em memória das análises não pode ser usado"""
+    def __init__(self, reason):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Snapshot de analytics indisponível: {reason}",
+        )
+
+class InvalidCubeQuery(HTTPException):
+    """Combinação de dimensões, medidas e filtros não suportada pelo cubo"""
+    def __init__(self, reason):
+        super().__init__(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Consulta ao cubo inválida: {reason}",
+        )
+
+class InvalidTimeWindow(HTTPException):
+    """Intervalo de datas inválido nas rotas de analytics"""
+    def __init__(self, reason):
+        super().__init__(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Intervalo de datas inválido: {reason}",
+        )
+
+class InvalidCursor(HTTPException):
+    """Cursor de paginação inválido nas listagens"""
+    def __init__(self, reason):
+        super().__init__(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Cursor de paginação inválido: {reason}",
+        )
+
+class BulkCreateRejected(HTTPException):
+    """Carga em massa atômica com linhas inválidas: nenhuma linha é gravada"""
+    def __init__(self, errors: list):
+        super().__init__(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail={"message": "Nenhuma linha foi gravada", "errors": errors},
+        )
+
+class BulkBodyTooLarge(HTTPException):
+    """Corpo da carga em massa acima do limite: recusado antes de ler o restante"""
+    def __init__(self, max_bytes: int):
+        super().__init__(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Corpo da requisição acima do máximo de {max_bytes} bytes",
+        )
+
+class UnsupportedIngestFormat(HTTPException):
+    """Arquivo de ingestão em formato não suportado"""
+    def __init__(self, filename):
+        super().__init__(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Formato do arquivo '{filename}' não reconhecido: use CSV ou NDJSON, ou informe o parâmetro 'format'",
+        )
+
+class InvalidBulkSelection(HTTPException):
+    """Seleção ou patch inválido nas atualizações e exclusões em massa"""
+    def __init__(self, reason):
+        super().__init__(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Operação em massa inválida: {reason}",
+        )
+
+class InvalidBatchIds(HTTPException):
+    """Lista de ids inválida nas consultas em lote"""
+    def __init__(self, reason):
+        super().__init__(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Lista de ids inválida: {reason}",
+        )
+
+class UnknownFields(HTTPException):
+    """Campos pedidos em `fields` que não existem na resposta"""
+    def __init__(self, fields: list):
+        super().__init__(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Campos desconhecidos em 'fields': {', '.join(fields)}",
+        )
+
+class NotModified(HTTPException):
+    """GET condicional cujo ETag (ou Last-Modified, nas rotas que só dependem das tabelas) ainda é o atual: 304 sem corpo"""
+    def __init__(self, headers: dict):
+        super().__init__(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
 def configure_exception_handlers(app):
     @app.exception_handler(HTTPException)
     async def http_exception_handler(request, exc):
+        if exc.status_code == status.HTTP_304_NOT_MODIFIED:
+            return Response(status_code=exc.status_code, headers=exc.headers)
         return JSONResponse(
             status_code=exc.status_code,
             content={"detail": exc.detail}
@@ -1,10 +1,16 @@
+from contextlib import asynccontextmanager
+from logging import getLogger
 from typing import Annotated
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.responses import JSONResponse
 from app.configs.config import configurar_banco
 from fastapi.middleware.cors import CORSMiddleware
 from app.routers import analytical, location, part, purchase, supplier, vehicle, warranty, auth
 from app.configs.auth import get_current_active_user
+from app.configs.conditional import ConditionalHeadersMiddleware
+from app.configs.database import SessionLocal
+from app.configs.snapshot import ANALYTICS_SNAPSHOT_ENABLED, SnapshotUnavailableError, snapshot_store
+from app.configs.warmup import ANALYTICS_WARMUP_ENABLED
 import os
 
 from app.errors import configure_exception_handlers
@@ -16,9 +22,29 @@ from app.models.model_part import Part
 from app.models.model_warranty import Warranty
 from app.models.model_user import User
 from app.models.model_token import Token
+from app.models.model_rollup import PurchaseRollup, RollupState, SupplierRollup, WarrantyClaimRollup, WarrantySketchRollup
 
 
-app = FastAPI()
+logger = getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Carrega o snapshot das garantias na subida para que a primeira requisição já o encontre pronto
+    if ANALYTICS_SNAPSHOT_ENABLED:
+        db = SessionLocal()
+        try:
+            snapshot_store.refresh(db)
+        except SnapshotUnavailableError as e:
+            logger.warning(f"Snapshot de analytics não carregado: {str(e)}")
+        finally:
+            db.close()
+    # Pré-calcula as análises em segundo plano; /ready só responde 200 depois da primeira passada
+    if ANALYTICS_WARMUP_ENABLED:
+        analytical.analytics_warmer.start()
+    yield
+    await analytical.analytics_warmer.stop()
+
+app = FastAPI(lifespan=lifespan)
 configure_exception_handlers(app)
 
 # USER DEPENDENCIES
@@ -42,12 +68,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ETag, Last-Modified e Cache-Control das rotas GET com validadores (ver app/configs/conditional.py)
+app.add_middleware(ConditionalHeadersMiddleware)
+
 @app.get("/", status_code=200)
 async def main(user: user_dependency):
     if user is None:
         raise HTTPException(status_code=401, detail="Autenticação falhou")
     return {"message": "Desafio backend concluido com sucesso!"}
 
+@app.get("/ready")
+async def ready():
+    """
+    Prontidão para receber tráfego: com o pré-cálculo habilitado, só depois da primeira passada.
+    """
+    if ANALYTICS_WARMUP_ENABLED and not analytical.analytics_warmer.ready:
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content={"status": "warming_up"})
+    return {"status": "ready"}
+
 app.include_router(auth.router)
 app.include_router(location.router)
 app.include_router(vehicle.router)
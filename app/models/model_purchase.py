@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from app.configs.database import Base
 
@@ -10,4 +10,10 @@ class Purchase(Base):
     purchase_date = Column(DateTime)
     part_id = Column(Integer, ForeignKey('parts.part_id'))
 
-    part = relationship("Part", back_populates="purchases")
\ No newline at end of file
+    part = relationship("Part", back_populates="purchases")
+
+    # Intervalos de datas das análises: por tipo de compra e por peça dentro do período
+    __table_args__ = (
+        Index('ix_purchases_type_date', 'purchase_type', 'purchase_date'),
+        Index('ix_purchases_part_date', 'part_id', 'purchase_date'),
+    )
@@ -0,0 +1,69 @@
+from sqlalchemy import Column, DateTime, Index, Integer, LargeBinary, String
+from app.configs.database import Base
+
+class WarrantyClaimRollup(Base):
+    __tablename__ = 'rollup_warranty_claims'
+
+    rollup_id = Column(Integer, primary_key=True, autoincrement=True)
+    part_id = Column(Integer)
+    model = Column(String)
+    propulsion = Column(String)
+    month = Column(String(7))
+    claims = Column(Integer)
+
+    __table_args__ = (
+        Index('ix_rollup_warranty_claims_part_month', 'part_id', 'month'),
+        Index('ix_rollup_warranty_claims_model', 'model'),
+        Index('ix_rollup_warranty_claims_propulsion', 'propulsion'),
+    )
+
+class WarrantySketchRollup(Base):
+    __tablename__ = 'rollup_warranty_sketches'
+
+    # Mesma partição de rollup_warranty_claims, com sketches combináveis para o modo aproximado
+    rollup_id = Column(Integer, primary_key=True, autoincrement=True)
+    part_id = Column(Integer)
+    model = Column(String)
+    propulsion = Column(String)
+    month = Column(String(7))
+    claims = Column(Integer)
+    vehicles_sketch = Column(LargeBinary)  # HyperLogLog dos veículos
+    days_sketch = Column(LargeBinary)  # t-digest dos dias até a falha
+
+    __table_args__ = (
+        Index('ix_rollup_warranty_sketches_part_month', 'part_id', 'month'),
+        Index('ix_rollup_warranty_sketches_model', 'model'),
+        Index('ix_rollup_warranty_sketches_propulsion', 'propulsion'),
+    )
+
+class PurchaseRollup(Base):
+    __tablename__ = 'rollup_purchases'
+
+    rollup_id = Column(Integer, primary_key=True, autoincrement=True)
+    part_id = Column(Integer)
+    purchase_type = Column(String(50))
+    month = Column(String(7))
+    purchases = Column(Integer)
+    first_purchase_date = Column(DateTime)
+    last_purchase_date = Column(DateTime)
+
+    __table_args__ = (
+        Index('ix_rollup_purchases_part_month', 'part_id', 'month'),
+        Index('ix_rollup_purchases_type', 'purchase_type'),
+    )
+
+class SupplierRollup(Base):
+    __tablename__ = 'rollup_suppliers'
+
+    supplier_id = Column(Integer, primary_key=True)
+    location_id = Column(Integer, index=True)
+    total_parts = Column(Integer)
+    total_purchases = Column(Integer)
+    bulk_purchases = Column(Integer)
+    warranty_purchases = Column(Integer)
+
+class RollupState(Base):
+    __tablename__ = 'rollup_state'
+
+    rollup_name = Column(String(50), primary_key=True)
+    built_at = Column(DateTime)
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index
+from sqlalchemy.orm import deferred
 from app.configs.database import Base
 
 class Warranty(Base):
@@ -7,9 +8,16 @@ class Warranty(Base):
     vehicle_id = Column(Integer, ForeignKey('vehicles.vehicle_id'))
     claim_key = Column(Integer, autoincrement=True, primary_key=True)
     repair_date = Column(DateTime)
-    client_comment = Column(String)
-    tech_comment = Column(String)
+    # Texto livre e sem limite: só carregado quando pedido (`fields` nas rotas ou acesso ao atributo)
+    client_comment = deferred(Column(String), group='comments')
+    tech_comment = deferred(Column(String), group='comments')
     part_id = Column(Integer, ForeignKey('parts.part_id'))
     classified_failured = Column(String)
     location_id = Column(Integer, ForeignKey('locations.location_id'))
     purchase_id = Column(Integer, ForeignKey('purchases.purchase_id'))
+
+    # Intervalos de datas das análises: pela data sozinha e por peça dentro do período
+    __table_args__ = (
+        Index('ix_fact_warranties_repair_date', 'repair_date'),
+        Index('ix_fact_warranties_part_repair_date', 'part_id', 'repair_date'),
+    )
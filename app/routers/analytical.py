@@ -1,158 +1,202 @@
 from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone
+from functools import partial
 from logging import getLogger
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.configs.database import get_db
-from app.schemas.analytical import ProvinceAnalytics, SupplierAnalytics
+from app.configs.cache import analytics_cache, cached_json_response_async
+from app.configs.conditional import conditional_get
+from app.configs.database import get_async_db
+from app.configs.export import BinaryNegotiationRoute
+from app.configs.fanout import run_concurrently
+from app.configs.warmup import AnalyticsWarmer, WarmupJob
+from app.configs.snapshot import SnapshotUnavailableError, WarrantySnapshot, get_analytics_snapshot, run_snapshot_in_thread, snapshot_json_response, snapshot_store
+from app.errors import InvalidTimeWindow, SnapshotUnavailable
+from app.models.model_location import Location
+from app.models.model_part import Part
+from app.models.model_purchase import Purchase
+from app.models.model_rollup import PurchaseRollup, RollupState, SupplierRollup, WarrantyClaimRollup, WarrantySketchRollup
+from app.models.model_supplier import Supplier
+from app.models.model_vehicle import Vehicle
+from app.models.model_warranty import Warranty
+from app.schemas.analytical import CubeDimensionEnum, CubeMeasureEnum, ProvinceAnalytics, SupplierAnalytics, TimeWindow
+from app.schemas.location import MarketEnum
 from app.schemas.purchase import PurchaseEnum
 from app.schemas.vehicle import PropulsionEnum
-from app.utils.location import get_locations_by_province_util, get_province_by_location_province_util
-from app.utils.part import get_part_by_id_util, get_parts_by_supplier_id_util
-from app.utils.purchase import get_purchases_by_part_id_util, get_purchases_by_purchase_type_util
-from app.utils.supplier import get_supplier_by_location_id_util, get_supplier_by_name_util
-from app.utils.vehicle import get_vehicle_by_id_util, get_vehicle_by_model_util, get_vehicle_by_propulsion_util
-from app.utils.warranty import get_warranties_by_part_id_util, get_warranties_by_vehicle_id_util
-
-router = APIRouter(prefix="/analytics", tags=["analytics"])
+from app.utils.analytical import get_part_claims_by_propulsion_util, get_part_claims_by_vehicle_model_util, get_part_models_by_propulsion_util, get_province_suppliers_by_market_util, get_purchase_monthly_trend_by_type_util, get_purchase_summary_by_type_util, get_province_top_suppliers_util, get_province_totals_util, get_supplier_parts_warranty_breakdown_util, get_supplier_parts_warranty_stats_util, get_top_parts_by_purchase_type_util, get_vehicle_counts_by_model_util, get_vehicle_counts_by_propulsion_util
+from app.utils.analytical import get_distinct_provinces_util, get_distinct_supplier_names_util, get_distinct_vehicle_models_util
+from app.utils.approx import (
+    approximation_bounds,
+    get_part_claims_by_propulsion_approx_util,
+    get_part_claims_by_vehicle_model_approx_util,
+    get_part_models_by_propulsion_approx_util,
+    get_supplier_parts_warranty_stats_approx_util,
+)
+from app.utils.cube import ANALYTICS_CUBE_MAX_ROWS, dimension_labels, get_cube_util
+from app.utils.location import get_province_by_location_province_util
+from app.utils.rollup import rebuild_rollups_util, rollups_available_util
+from app.utils.snapshot import (
+    get_part_claims_by_propulsion_snapshot_util,
+    get_part_claims_by_vehicle_model_snapshot_util,
+    get_part_models_by_propulsion_snapshot_util,
+    get_supplier_by_name_snapshot_util,
+    get_supplier_parts_warranty_breakdown_snapshot_util,
+    get_supplier_parts_warranty_stats_snapshot_util,
+    get_vehicle_counts_by_model_snapshot_util,
+    get_vehicle_counts_by_propulsion_snapshot_util,
+)
+from app.utils.supplier import get_supplier_by_name_util
+
+# JSON por padrão; MessagePack ou Arrow IPC quando pedidos no header Accept
+router = APIRouter(prefix="/analytics", tags=["analytics"], route_class=BinaryNegotiationRoute)
 logger = getLogger(__name__)
 
-@router.get("/supplier_by_province/{location_province}")
-def analytics_supplier_by_province(location_province:str, db: Session = Depends(get_db)) -> ProvinceAnalytics:
+# Tabelas lidas por cada análise; um commit em qualquer uma delas invalida as respostas em cache
+SUPPLIER_BY_PROVINCE_TABLES = (Location.__tablename__, Supplier.__tablename__, Part.__tablename__, Purchase.__tablename__, SupplierRollup.__tablename__, RollupState.__tablename__)
+PURCHASE_TYPE_TABLES = (Purchase.__tablename__, Part.__tablename__, PurchaseRollup.__tablename__, RollupState.__tablename__)
+VEHICLE_MODEL_TABLES = (Vehicle.__tablename__, Warranty.__tablename__, Part.__tablename__, WarrantyClaimRollup.__tablename__, RollupState.__tablename__)
+PROPULSION_TYPE_TABLES = (Vehicle.__tablename__, Warranty.__tablename__, Part.__tablename__)
+SUPPLIER_PARTS_TABLES = (Supplier.__tablename__, Part.__tablename__, Warranty.__tablename__, Vehicle.__tablename__)
+# Respostas do modo aproximado também dependem dos sketches
+APPROX_TABLES = (WarrantySketchRollup.__tablename__, RollupState.__tablename__)
+CUBE_TABLES = (Warranty.__tablename__, Purchase.__tablename__, Vehicle.__tablename__, Part.__tablename__, Supplier.__tablename__, Location.__tablename__)
+
+def analytics_state() -> tuple:
+    # Também entram no ETag: janelas `last_days` mudam à meia-noite e o snapshot em memória pode estar atrás das versões
+    return date.today().isoformat(), snapshot_store.versions()
+
+def _naive_utc(value: datetime):
+    # As colunas de data não guardam fuso: datas com fuso são convertidas para UTC
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def get_time_window(
+    start: datetime = Query(default=None, alias="from"),
+    end: datetime = Query(default=None, alias="to"),
+    last_days: int = Query(default=None, ge=1),
+) -> TimeWindow:
+    """
+    Intervalo das análises: de `from` (inclusivo) até `to` (exclusivo), ou os últimos `last_days` dias.
+    Sem parâmetros, as análises cobrem todo o histórico.
+    """
+    start, end = _naive_utc(start), _naive_utc(end)
+    if last_days is not None:
+        if start is not None:
+            raise InvalidTimeWindow("informe 'from' ou 'last_days', não os dois")
+        # Contado a partir da meia-noite, para que a mesma janela use a mesma entrada do cache durante o dia
+        start = datetime.combine(date.today() - timedelta(days=last_days), time.min)
+    if start is not None and end is not None and start >= end:
+        raise InvalidTimeWindow("'from' deve ser anterior a 'to'")
+    return TimeWindow(start=start, end=end, last_days=last_days)
+
+@router.get("/warmup/stats")
+async def analytics_warmup_stats() -> dict:
+    """
+    Estado do pré-cálculo das análises em segundo plano (passadas, respostas recalculadas e erros).
+    """
+    return analytics_warmer.stats()
+
+@router.get("/cache/stats")
+async def analytics_cache_stats() -> dict:
+    """
+    Contadores do cache de respostas de analytics (acertos, faltas, despejos e invalidações).
+    """
+    return analytics_cache.stats()
+
+@router.get("/snapshot/stats")
+async def analytics_snapshot_stats() -> dict:
+    """
+    Estado do snapshot em memória das garantias (tamanho, orçamento de memória e último refresh).
+    """
+    return snapshot_store.stats()
+
+@router.post("/snapshot/refresh")
+async def refresh_analytics_snapshot() -> dict:
+    """
+    Força o refresh do snapshot em memória, relendo apenas o que mudou desde o último.
+    """
+    try:
+        await run_snapshot_in_thread(snapshot_store.refresh)
+    except SnapshotUnavailableError as e:
+        raise SnapshotUnavailable(e)
+    return snapshot_store.stats()
+
+@router.post("/rollups/rebuild")
+async def rebuild_analytics_rollups(db: AsyncSession = Depends(get_async_db)) -> dict:
+    """
+    Reconstrói as tabelas de rollup a partir de fact_warranties e purchases.
+    Após o primeiro rebuild as rotas de analytics passam a ler das rollups,
+    que são mantidas pelas rotas de escrita de garantias, compras, peças, fornecedores e veículos.
+    """
+    built_at = await db.run_sync(rebuild_rollups_util)
+    return {"message": "Rollups reconstruídas", "built_at": built_at}
+
+@router.get("/supplier_by_province/{location_province}", dependencies=[conditional_get(*SUPPLIER_BY_PROVINCE_TABLES, authenticated=True, extra=analytics_state)])
+async def analytics_supplier_by_province(location_province:str, background_tasks: BackgroundTasks, window: TimeWindow = Depends(get_time_window), db: AsyncSession = Depends(get_async_db)) -> ProvinceAnalytics:
     """
     Obtém análises detalhadas de fornecedores por província, incluindo:
     - Total de vendas por fornecedor
     - Número de produtos fornecidos
     - Top 5 fornecedores com maior volume de vendas
     - Comparação com a média da província
+
+    Com um intervalo, as compras contadas são as do período.
+    """
+    return await cached_json_response_async(
+        analytics_cache,
+        key=("supplier_by_province", location_province, *window.cache_key()),
+        tables=SUPPLIER_BY_PROVINCE_TABLES,
+        compute=lambda session: load_supplier_by_province_analytics(location_province, session, window),
+        db=db,
+        background_tasks=background_tasks,
+    )
+
+async def load_supplier_by_province_analytics(location_province: str, db: AsyncSession, window: TimeWindow = TimeWindow()) -> dict:
+    """
+    Executa ao mesmo tempo as consultas independentes da análise por província e monta a resposta.
+    """
+    # As rollups não guardam datas: com intervalo, as consultas vão às tabelas de fatos
+    use_rollups = not window.bounded and await db.run_sync(rollups_available_util)
+    results = await run_concurrently(
+        db,
+        province_exists=lambda session: get_province_by_location_province_util(location_province, db=session),
+        totals=lambda session: get_province_totals_util(location_province, use_rollups=use_rollups, window=window, db=session),
+        market_counts=lambda session: get_province_suppliers_by_market_util(location_province, db=session),
+        top_suppliers=lambda session: get_province_top_suppliers_util(location_province, limit=5, use_rollups=use_rollups, window=window, db=session),
+    )
+    return build_supplier_by_province_analytics(location_province, window=window, **results)
+
+def build_supplier_by_province_analytics(location_province:str, province_exists, totals, market_counts: list, top_suppliers: list, window: TimeWindow = TimeWindow()) -> dict:
+    """
+    Análise de fornecedores da província a partir das linhas já consultadas, sem cache.
     """
     
-    province_exists = get_province_by_location_province_util(location_province, db=db)
     if not province_exists:
             raise HTTPException(status_code=404, detail=f"Província '{location_province}' não encontrada")
     try:
-        locations = get_locations_by_province_util(location_province, db=db)
-        location_ids = [loc.location_id for loc in locations]
-            
-        if not location_ids:
-            return ProvinceAnalytics(
-                province=location_province,
-                total_suppliers=0,
-                total_parts=0,
-                total_purchases=0,
-                bulk_percentage=0,
-                warranty_percentage=0,
-                suppliers_by_market={},
-                top_suppliers=[]
-            )
-        
-        all_suppliers = []
-        
-        # Para cada localização, obter todos os fornecedores
-        for location_id in location_ids:
-            # Esta função provavelmente retorna uma lista de fornecedores
-            suppliers_at_location = get_supplier_by_location_id_util(location_id, db=db)
-            
-            # Se a função retornar um único fornecedor em vez de uma lista, garanta que seja uma lista
-            if not isinstance(suppliers_at_location, list):
-                suppliers_at_location = [suppliers_at_location]
-                
-            # Adicionar fornecedores desta localização à lista geral
-            all_suppliers.extend(suppliers_at_location)
-        
-        total_suppliers = len(all_suppliers)
-        all_parts = []
-        all_purchases = []
-        
-        # Mapeamento de partes para fornecedores
-        part_to_supplier = {}
-        
-        # Para cada fornecedor, obter peças
-        for supplier in all_suppliers:
-            # Obter partes deste fornecedor
-            supplier_parts = get_parts_by_supplier_id_util(supplier.supplier_id, db=db)
-            
-            # Se a função retornar um único item em vez de uma lista, garanta que seja uma lista
-            if not isinstance(supplier_parts, list):
-                supplier_parts = [supplier_parts]
-                
-            # Adicionar à lista geral de partes
-            all_parts.extend(supplier_parts)
-            
-            # Adicionar ao mapeamento
-            for part in supplier_parts[:1]:
-                part_to_supplier[part.part_id] = supplier.supplier_id
-                
-                # Obter compras para cada parte
-                part_purchases = get_purchases_by_part_id_util(part.part_id, db=db)
-                
-                # Se a função retornar um único item em vez de uma lista, garanta que seja uma lista
-                if not isinstance(part_purchases, list):
-                    part_purchases = [part_purchases]
-                    
-                # Adicionar à lista geral de compras
-                all_purchases.extend(part_purchases)
-
-        bulk_count = sum(1 for p in all_purchases if p.purchase_type == PurchaseEnum.bulk)
-        warranty_count = sum(1 for p in all_purchases if p.purchase_type == PurchaseEnum.warranty)
-        # Análise por mercado
-        market_counts = {}
-        for loc in locations:
-            if loc.market not in market_counts:
-                market_counts[loc.market] = 0
-            
-            # Contar fornecedores neste mercado
-            suppliers_in_loc = sum(1 for s in all_suppliers if s.location_id == loc.location_id)
-            market_counts[loc.market] += suppliers_in_loc
-        
-        # Preparar análise para cada fornecedor
-        supplier_analytics = []
-        
-        for supplier in all_suppliers:
-            # Encontrar localização do fornecedor
-            location = next((loc for loc in locations if loc.location_id == supplier.location_id), None)
-            
-            # Encontrar partes deste fornecedor
-            supplier_parts = [part for part in all_parts if part.supplier_id == supplier.supplier_id]
-            supplier_part_ids = [part.part_id for part in supplier_parts]
-            
-            # Encontrar compras para as partes deste fornecedor
-            supplier_purchases = [p for p in all_purchases if p.part_id in supplier_part_ids]
-            
-            # Contagem de tipos de compra para este fornecedor
-            supplier_bulk = sum(1 for p in supplier_purchases if p.purchase_type == PurchaseEnum.bulk)
-            supplier_warranty = sum(1 for p in supplier_purchases if p.purchase_type == PurchaseEnum.warranty)
-            
-            analytics = SupplierAnalytics(
-                supplier_id=supplier.supplier_id,
-                supplier_name=supplier.supplier_name,
-                supplier_cpf=supplier.supplier_cpf,
-                location_id=supplier.location_id,
-                market=location.market if location else None,
-                country=location.country if location else "",
-                province=location.province if location else "",
-                city=location.city if location else "",
-                total_parts=len(supplier_parts),
-                total_purchases=len(supplier_purchases),
-                bulk_purchases=supplier_bulk,
-                warranty_purchases=supplier_warranty
-            )
-            
-            supplier_analytics.append(analytics)
-        
-        # Ordenar fornecedores por número total de compras
-        supplier_analytics.sort(key=lambda x: x.total_purchases, reverse=True)
-        top_suppliers = supplier_analytics[:5] #TOP 5 Fornecedores
+        # Totais, distribuição por mercado e top 5 saem de consultas agregadas,
+        # então o número de consultas não depende do tamanho da província
+        market_counts = {
+            market: total_suppliers
+            for market, total_suppliers in market_counts
+        }
+        top_suppliers = [SupplierAnalytics(**supplier._mapping) for supplier in top_suppliers]
         
+        total_purchases = totals.total_purchases
         response = ProvinceAnalytics(
             province=location_province,
-            total_suppliers=total_suppliers,
-            total_parts=len(all_parts),
-            total_purchases=len(all_purchases),
-            bulk_percentage=(bulk_count / len(all_purchases) * 100) if all_purchases else 0,
-            warranty_percentage=(warranty_count / len(all_purchases) * 100) if all_purchases else 0,
+            total_suppliers=totals.total_suppliers,
+            total_parts=totals.total_parts,
+            total_purchases=total_purchases,
+            bulk_percentage=(totals.bulk_purchases / total_purchases * 100) if total_purchases else 0,
+            warranty_percentage=(totals.warranty_purchases / total_purchases * 100) if total_purchases else 0,
             suppliers_by_market=market_counts,
-            top_suppliers=top_suppliers
+            top_suppliers=top_suppliers,
+            window=window.describe(),
         )
         return response.model_dump()
         
@@ -160,14 +204,41 @@ def analytics_supplier_by_province(location_province:str, db: Session = Depends(
         logger.error(f"Erro ao analisar fornecedores na província {location_province}: {str(e)}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Erro ao processar análise: {str(e)}")
     
-@router.get("/purchases_by_type/{purchase_type}")
-def analytics_by_purchase_type(purchase_type: PurchaseEnum, db: Session = Depends(get_db)) -> dict:
+@router.get("/purchases_by_type/{purchase_type}", dependencies=[conditional_get(*PURCHASE_TYPE_TABLES, authenticated=True, extra=analytics_state)])
+async def analytics_by_purchase_type(purchase_type: PurchaseEnum, background_tasks: BackgroundTasks, window: TimeWindow = Depends(get_time_window), db: AsyncSession = Depends(get_async_db)) -> dict:
     """
     Obtém estatísticas de compras por tipo (bulk, warranty)
     """
+    return await cached_json_response_async(
+        analytics_cache,
+        key=("purchases_by_type", purchase_type.value, *window.cache_key()),
+        tables=PURCHASE_TYPE_TABLES,
+        compute=lambda session: load_purchase_type_analytics(purchase_type, session, window),
+        db=db,
+        background_tasks=background_tasks,
+    )
+
+async def load_purchase_type_analytics(purchase_type: PurchaseEnum, db: AsyncSession, window: TimeWindow = TimeWindow()) -> dict:
+    """
+    Executa ao mesmo tempo o resumo, a tendência mensal e o top 5 de peças e monta a resposta.
+    """
+    use_rollups = not window.bounded and await db.run_sync(rollups_available_util)
+    results = await run_concurrently(
+        db,
+        summary=lambda session: get_purchase_summary_by_type_util(purchase_type, use_rollups=use_rollups, window=window, db=session),
+        # Agrupa por mês para análise de tendência, já no banco de dados
+        monthly_trend=lambda session: get_purchase_monthly_trend_by_type_util(purchase_type, use_rollups=use_rollups, window=window, db=session),
+        # Top 5 peças mais compradas por tipo, com o nome da peça na mesma consulta
+        top_parts=lambda session: get_top_parts_by_purchase_type_util(purchase_type, limit=5, use_rollups=use_rollups, window=window, db=session),
+    )
+    return build_purchase_type_analytics(purchase_type, window=window, **results)
+
+def build_purchase_type_analytics(purchase_type: PurchaseEnum, summary, monthly_trend: list, top_parts: list, window: TimeWindow = TimeWindow()) -> dict:
+    """
+    Estatísticas de compras por tipo a partir das linhas já consultadas, sem cache.
+    """
     
-    purchases = get_purchases_by_purchase_type_util(purchase_type, db=db)
-    if not purchases:
+    if not summary.total_count:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, 
             detail={
@@ -177,113 +248,137 @@ def analytics_by_purchase_type(purchase_type: PurchaseEnum, db: Session = Depend
             }
         )
     try:
-        # Agrupa por mês para análise de tendência
-        monthly_data = defaultdict(int)
-        parts_count = defaultdict(int)
-
-        for purchase in purchases:
-            month_year = purchase.purchase_date.strftime("%Y-%m")
-            monthly_data[month_year] += 1
-            
-            # Contabiliza quais peças são mais compradas por tipo
-            parts_count[purchase.part_id] += 1
-
-        # Obtém detalhes das top 5 peças mais compradas
-        top_parts = []
-        for part_id, count in sorted(parts_count.items(), key=lambda x: x[1], reverse=True)[:5]:
-            part = get_part_by_id_util(part_id, db)
-            if part:
-                top_parts.append({
-                    "part_id": part.part_id,
-                    "part_name": part.part_name,
-                    "count": count
-                })
-        
         return {
             "purchase_type": purchase_type,
-            "total_count": len(purchases),
+            "total_count": summary.total_count,
             "monthly_trend": [
-                {"month": k, "count": v} for k, v in sorted(monthly_data.items())
+                {"month": month, "count": count} for month, count in monthly_trend
             ],
-            "top_parts": top_parts,
-            "first_purchase_date": min(p.purchase_date for p in purchases),
-            "last_purchase_date": max(p.purchase_date for p in purchases)
+            "top_parts": [
+                {"part_id": part.part_id, "part_name": part.part_name, "count": part.count}
+                for part in top_parts
+            ],
+            "first_purchase_date": summary.first_purchase_date,
+            "last_purchase_date": summary.last_purchase_date,
+            "window": window.describe(),
         }
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
-@router.get("/vehicle_model/{vehicle_model}")
-def analytics_by_vehicle_model(vehicle_model: str, db: Session = Depends(get_db)) -> dict:
+@router.get("/vehicle_model/{vehicle_model}", dependencies=[conditional_get(*VEHICLE_MODEL_TABLES, *APPROX_TABLES, authenticated=True, extra=analytics_state)])
+async def analytics_by_vehicle_model(
+    vehicle_model: str,
+    background_tasks: BackgroundTasks,
+    approx: bool = False,
+    window: TimeWindow = Depends(get_time_window),
+    db: AsyncSession = Depends(get_async_db),
+    snapshot: WarrantySnapshot = Depends(get_analytics_snapshot),
+) -> dict:
+    """
+    Obtém estatísticas baseado no modelo do veículo.
+    Com um intervalo, as garantias contadas são as reparadas no período; a frota continua completa.
+    Com `approx`, as garantias vêm dos sketches mensais das rollups, e a resposta traz os limites de erro.
+    """
+    if snapshot is not None and not approx:
+        return snapshot_json_response(build_vehicle_model_analytics(
+            vehicle_model,
+            vehicle_groups=get_vehicle_counts_by_model_snapshot_util(vehicle_model, snapshot),
+            part_claims=get_part_claims_by_vehicle_model_snapshot_util(vehicle_model, snapshot, window),
+            window=window,
+        ))
+    return await cached_json_response_async(
+        analytics_cache,
+        key=("vehicle_model", vehicle_model, *window.cache_key(), *(("approx",) if approx else ())),
+        tables=VEHICLE_MODEL_TABLES + (APPROX_TABLES if approx else ()),
+        compute=lambda session: load_vehicle_model_analytics(vehicle_model, session, window, approx),
+        db=db,
+        background_tasks=background_tasks,
+    )
+
+async def load_vehicle_model_analytics(vehicle_model: str, db: AsyncSession, window: TimeWindow = TimeWindow(), approx: bool = False) -> dict:
     """
-    Obtém estatísticas baseado no modelo do veículo
+    Executa ao mesmo tempo os agrupamentos de veículos e de garantias do modelo e monta a resposta.
+    Com `approx` e rollups disponíveis, as garantias vêm dos sketches; sem rollups, a resposta é exata.
     """
-    vehicles = get_vehicle_by_model_util(vehicle_model, db=db)
+    rollups_available = await db.run_sync(rollups_available_util)
+    use_rollups = not window.bounded and rollups_available
+    approx = approx and rollups_available
 
-    if not vehicles:
+    def part_claims(session):
+        if approx:
+            return get_part_claims_by_vehicle_model_approx_util(vehicle_model, window=window, db=session)
+        return get_part_claims_by_vehicle_model_util(vehicle_model, use_rollups=use_rollups, window=window, db=session)
+
+    results = await run_concurrently(
+        db,
+        # Contagem de veículos por propulsão e ano em uma única consulta agrupada
+        vehicle_groups=lambda session: get_vehicle_counts_by_model_util(vehicle_model, db=session),
+        # Garantias agrupadas por peça, já ordenadas pela contagem (decrescente)
+        part_claims=part_claims,
+    )
+    approximation = approximation_bounds(window) if approx else None
+    return build_vehicle_model_analytics(vehicle_model, window=window, approximation=approximation, **results)
+
+def build_vehicle_model_analytics(vehicle_model: str, vehicle_groups: list, part_claims: list, window: TimeWindow = TimeWindow(), approximation: dict = None) -> dict:
+    """
+    Estatísticas por modelo de veículo a partir dos agrupamentos (do banco ou do snapshot), sem cache.
+    """
+    total_vehicles = sum(group.vehicles for group in vehicle_groups)
+
+    if not total_vehicles:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, 
             detail=f" 'vehicle_model': {vehicle_model}, 'total_count': 0, 'message': f'Nenhum modelo {vehicle_model} de carro encontrado'"
             )
     try:
-        parts_count = defaultdict(int)
         propulsion_count = defaultdict(int)
-        total_warranty_claims = 0
         years_count = defaultdict(int)
 
-        for vehicle in vehicles:
-            # Contagem por tipo de propulsão
-            propulsion_count[vehicle.propulsion] += 1
-            
-            # Contagem por ano
-            years_count[vehicle.year] += 1
-            
-            # Obtém garantias relacionadas a este veículo
-            warranties = get_warranties_by_vehicle_id_util(vehicle.vehicle_id, db=db)
-            total_warranty_claims += len(warranties)
-            
-            # Conta ocorrências de peças em garantias
-            for warranty in warranties:
-                parts_count[warranty.part_id] += 1
-        top_parts = []
-        if parts_count:
-            # Ordena as peças por contagem (decrescente)
-            sorted_parts = sorted(parts_count.items(), key=lambda x: x[1], reverse=True)
-            
-            # Obtém os detalhes das 5 peças mais comuns
-            for part_id, count in sorted_parts[:5]:
-                part = get_part_by_id_util(part_id, db=db)
-                part_name = part.part_name if part else f"Peça ID {part_id}"
-                top_parts.append({
-                    "part_id": part_id,
-                    "name": part_name,
-                    "count": count,
-                    "percentage": round((count / total_warranty_claims) * 100, 2) if total_warranty_claims > 0 else 0
-                })
+        for group in vehicle_groups:
+            propulsion_count[group.propulsion] += group.vehicles
+            years_count[group.year] += group.vehicles
+
+        total_warranty_claims = sum(part.claims for part in part_claims)
+
+        # Obtém os detalhes das 5 peças mais comuns
+        top_parts = [
+            {
+                "part_id": part.part_id,
+                "name": part.part_name if part.part_name is not None else f"Peça ID {part.part_id}",
+                "count": part.claims,
+                "percentage": round((part.claims / total_warranty_claims) * 100, 2) if total_warranty_claims > 0 else 0
+            }
+            for part in part_claims[:5]
+        ]
         
         # Prepara os dados de propulsão para o retorno
         propulsion_stats = [
-            {"type": prop_type, "count": count, "percentage": round((count / len(vehicles)) * 100, 2)}
+            {"type": prop_type, "count": count, "percentage": round((count / total_vehicles) * 100, 2)}
             for prop_type, count in propulsion_count.items()
         ]
         
         # Prepara os dados de anos para o retorno
         year_stats = [
-            {"year": year, "count": count, "percentage": round((count / len(vehicles)) * 100, 2)}
-            for year, count in years_count.items()
+            {"year": year, "count": count, "percentage": round((count / total_vehicles) * 100, 2)}
+            for year, count in sorted(years_count.items(), key=lambda x: (x[0] is None, x[0]))
         ]
         
         # Retorna as estatísticas compiladas
-        return {
+        result = {
             "vehicle_model": vehicle_model,
-            "total_count": len(vehicles),
+            "total_count": total_vehicles,
             "propulsion_stats": propulsion_stats,
             "year_distribution": year_stats,
             "warranty_stats": {
                 "total_claims": total_warranty_claims,
-                "claims_per_vehicle": round(total_warranty_claims / len(vehicles), 2) if vehicles else 0,
+                "claims_per_vehicle": round(total_warranty_claims / total_vehicles, 2),
                 "top_failing_parts": top_parts
-            }
+            },
+            "window": window.describe(),
         }
+        if approximation is not None:
+            result["approximation"] = approximation
+        return result
     
     except Exception as e:
         # Captura outras exceções e retorna uma resposta de erro
@@ -292,79 +387,108 @@ def analytics_by_vehicle_model(vehicle_model: str, db: Session = Depends(get_db)
             detail=f"Erro ao processar estatísticas: {str(e)}"
         )
     
-@router.get("/propulsion_type/{propulsion_type}")
-def analytics_part_by_propulsion_type(propulsion_type: PropulsionEnum, db: Session = Depends(get_db)) -> dict:
+@router.get("/propulsion_type/{propulsion_type}", dependencies=[conditional_get(*PROPULSION_TYPE_TABLES, *APPROX_TABLES, authenticated=True, extra=analytics_state)])
+async def analytics_part_by_propulsion_type(
+    propulsion_type: PropulsionEnum,
+    background_tasks: BackgroundTasks,
+    approx: bool = False,
+    window: TimeWindow = Depends(get_time_window),
+    db: AsyncSession = Depends(get_async_db),
+    snapshot: WarrantySnapshot = Depends(get_analytics_snapshot),
+) -> dict:
+    """
+    Obtém a quantidade de peças vendidas baseado na propulsão do veículo.
+    Com um intervalo, as garantias contadas são as reparadas no período; a frota continua completa.
+    Com `approx`, peças e veículos afetados vêm dos sketches mensais das rollups, e a resposta traz os limites de erro.
     """
-    Obtém a quantidade de peças vendidas baseado na propulsão do veículo
+    if snapshot is not None and not approx:
+        return snapshot_json_response(build_propulsion_type_analytics(
+            propulsion_type,
+            model_groups=get_vehicle_counts_by_propulsion_snapshot_util(propulsion_type, snapshot),
+            part_claims=get_part_claims_by_propulsion_snapshot_util(propulsion_type, snapshot, window),
+            part_models=get_part_models_by_propulsion_snapshot_util(propulsion_type, snapshot, window),
+            window=window,
+        ))
+    return await cached_json_response_async(
+        analytics_cache,
+        key=("propulsion_type", propulsion_type.value, *window.cache_key(), *(("approx",) if approx else ())),
+        tables=PROPULSION_TYPE_TABLES + (APPROX_TABLES if approx else ()),
+        compute=lambda session: load_propulsion_type_analytics(propulsion_type, session, window, approx),
+        db=db,
+        background_tasks=background_tasks,
+    )
+
+async def load_propulsion_type_analytics(propulsion_type: PropulsionEnum, db: AsyncSession, window: TimeWindow = TimeWindow(), approx: bool = False) -> dict:
+    """
+    Executa ao mesmo tempo os agrupamentos de veículos, garantias e modelos por peça e monta a resposta.
+    Com `approx` e rollups disponíveis, as garantias vêm dos sketches; sem rollups, a resposta é exata.
+    """
+    approx = approx and await db.run_sync(rollups_available_util)
+    part_claims_util = get_part_claims_by_propulsion_approx_util if approx else get_part_claims_by_propulsion_util
+    part_models_util = get_part_models_by_propulsion_approx_util if approx else get_part_models_by_propulsion_util
+    results = await run_concurrently(
+        db,
+        # Contagem de veículos por modelo em uma única consulta agrupada
+        model_groups=lambda session: get_vehicle_counts_by_propulsion_util(propulsion_type, db=session),
+        # Garantias agrupadas por peça (contagem e veículos distintos) e modelos afetados por peça
+        part_claims=lambda session: part_claims_util(propulsion_type, window=window, db=session),
+        part_models=lambda session: part_models_util(propulsion_type, window=window, db=session),
+    )
+    approximation = approximation_bounds(window, distinct_vehicles=True) if approx else None
+    return build_propulsion_type_analytics(propulsion_type, window=window, approximation=approximation, **results)
+
+def build_propulsion_type_analytics(propulsion_type: PropulsionEnum, model_groups: list, part_claims: list, part_models: list, window: TimeWindow = TimeWindow(), approximation: dict = None) -> dict:
+    """
+    Estatísticas de peças por tipo de propulsão a partir dos agrupamentos (do banco ou do snapshot), sem cache.
     """
     
-    vehicles = get_vehicle_by_propulsion_util(propulsion_type, db=db)
-    if not vehicles:
+    total_vehicles = sum(group.vehicles for group in model_groups)
+
+    if not total_vehicles:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, 
             detail=f" 'propulsion_type_vehicle': {propulsion_type.value}, 'total_count': 0, 'message': f'Nenhum tipo de propulsão {propulsion_type.value} de carro encontrado'"
             )
     try:
-        # Inicializa dicionários para estatísticas
-        part_stats = defaultdict(lambda: {"count": 0, "vehicles": 0, "models": set()})
-        model_count = defaultdict(int)
-        total_parts = 0
-        
-        # Para cada veículo, busca as garantias relacionadas e compila estatísticas de peças
-        for vehicle in vehicles:
-            model_count[vehicle.model] += 1
-            
-            # Obtém as garantias associadas ao veículo
-            warranties = get_warranties_by_vehicle_id_util(vehicle.vehicle_id, db=db)
-            
-            # Rastreia quais veículos têm problemas com quais peças
-            vehicle_parts = set()
-            
-            for warranty in warranties:
-                part_id = warranty.part_id
-                total_parts += 1
-                part_stats[part_id]["count"] += 1
-                part_stats[part_id]["models"].add(vehicle.model)
-                
-                if part_id not in vehicle_parts:
-                    vehicle_parts.add(part_id)
-                    part_stats[part_id]["vehicles"] += 1
-            
-        # Formata as estatísticas de peças para o retorno
-        formatted_part_stats = []
-        for part_id, stats in part_stats.items():
-            # Busca informações da peça no banco de dados
-            part = get_part_by_id_util(part_id, db=db)
-            part_name = part.part_name if part else f"Peça ID {part_id}"
+        models_by_part = defaultdict(list)
+        for part_id, model in part_models:
+            models_by_part[part_id].append(model)
+
+        total_parts = sum(part.claims for part in part_claims)
             
-            formatted_part_stats.append({
-                "part_id": part_id,
-                "name": part_name,
-                "count": stats["count"],
-                "vehicles_affected": stats["vehicles"],
-                "percentage_of_vehicles": round((stats["vehicles"] / len(vehicles)) * 100, 2),
-                "models_affected": list(stats["models"]),
-                "average_per_affected_vehicle": round(stats["count"] / stats["vehicles"], 2) if stats["vehicles"] > 0 else 0
-            })
-        
-        # Ordena as estatísticas de peças pela contagem (decrescente)
-        formatted_part_stats.sort(key=lambda x: x["count"], reverse=True)
+        # Formata as estatísticas de peças para o retorno, já ordenadas pela contagem (decrescente)
+        formatted_part_stats = [
+            {
+                "part_id": part.part_id,
+                "name": part.part_name if part.part_name is not None else f"Peça ID {part.part_id}",
+                "count": part.claims,
+                "vehicles_affected": part.vehicles_affected,
+                "percentage_of_vehicles": round((part.vehicles_affected / total_vehicles) * 100, 2),
+                "models_affected": models_by_part[part.part_id],
+                "average_per_affected_vehicle": round(part.claims / part.vehicles_affected, 2) if part.vehicles_affected > 0 else 0
+            }
+            for part in part_claims
+        ]
         
         # Prepara as estatísticas de modelos para o retorno
         model_stats = [
-            {"model": model, "count": count, "percentage": round((count / len(vehicles)) * 100, 2)}
-            for model, count in model_count.items()
+            {"model": group.model, "count": group.vehicles, "percentage": round((group.vehicles / total_vehicles) * 100, 2)}
+            for group in model_groups
         ]
         
         # Retorna as estatísticas compiladas
-        return {
+        result = {
             "propulsion_type": propulsion_type,
-            "total_vehicles": len(vehicles),
+            "total_vehicles": total_vehicles,
             "total_parts_replaced": total_parts,
-            "average_parts_per_vehicle": round(total_parts / len(vehicles), 2) if vehicles else 0,
+            "average_parts_per_vehicle": round(total_parts / total_vehicles, 2),
             "model_distribution": model_stats,
-            "part_stats": formatted_part_stats
+            "part_stats": formatted_part_stats,
+            "window": window.describe(),
         }
+        if approximation is not None:
+            result["approximation"] = approximation
+        return result
         
     except Exception as e:
         # Captura outras exceções e retorna uma resposta de erro
@@ -373,21 +497,67 @@ def analytics_part_by_propulsion_type(propulsion_type: PropulsionEnum, db: Sessi
             detail=f"Erro ao processar estatísticas por tipo de propulsão: {str(e)}"
         )
 
-@router.get("/part_by_suppliers/{supplier_name}")
-def analytics_supplier_by_part(supplier_name: str, db: Session = Depends(get_db)) -> dict:
+@router.get("/part_by_suppliers/{supplier_name}", dependencies=[conditional_get(*SUPPLIER_PARTS_TABLES, *APPROX_TABLES, authenticated=True, extra=analytics_state)])
+async def analytics_supplier_by_part(
+    supplier_name: str,
+    background_tasks: BackgroundTasks,
+    approx: bool = False,
+    window: TimeWindow = Depends(get_time_window),
+    db: AsyncSession = Depends(get_async_db),
+    snapshot: WarrantySnapshot = Depends(get_analytics_snapshot),
+) -> dict:
     """
     Obtém análise detalhada das peças fornecidas por um determinado fornecedor,
     incluindo estatísticas de falhas, uso em diferentes modelos de veículos e tendências.
+    Com um intervalo, as garantias contadas são as reparadas no período.
+    Com `approx`, os totais por peça vêm dos sketches mensais das rollups e incluem os quantis de dias até a falha.
     """
-    supplier = get_supplier_by_name_util(supplier_name, db=db)
+    if snapshot is not None and not approx:
+        supplier = get_supplier_by_name_snapshot_util(supplier_name, snapshot)
+        return snapshot_json_response(build_supplier_parts_analytics(
+            supplier_name,
+            supplier,
+            parts=get_supplier_parts_warranty_stats_snapshot_util(supplier.supplier_id, snapshot, window) if supplier else [],
+            breakdown=get_supplier_parts_warranty_breakdown_snapshot_util(supplier.supplier_id, snapshot, window) if supplier else [],
+            window=window,
+        ))
+    return await cached_json_response_async(
+        analytics_cache,
+        key=("part_by_suppliers", supplier_name, *window.cache_key(), *(("approx",) if approx else ())),
+        tables=SUPPLIER_PARTS_TABLES + (APPROX_TABLES if approx else ()),
+        compute=lambda session: load_supplier_parts_analytics(supplier_name, session, window, approx),
+        db=db,
+        background_tasks=background_tasks,
+    )
 
+async def load_supplier_parts_analytics(supplier_name: str, db: AsyncSession, window: TimeWindow = TimeWindow(), approx: bool = False) -> dict:
+    """
+    Busca o fornecedor e executa ao mesmo tempo os totais por peça e os agrupamentos por veículo/classificação.
+    Com `approx` e rollups disponíveis, os totais por peça vêm dos sketches; os agrupamentos continuam exatos.
+    """
+    supplier = await db.run_sync(lambda session: get_supplier_by_name_util(supplier_name, db=session))
+    if not supplier:
+        return build_supplier_parts_analytics(supplier_name, supplier, parts=[], breakdown=[], window=window)
+    approx = approx and await db.run_sync(rollups_available_util)
+    parts_util = get_supplier_parts_warranty_stats_approx_util if approx else get_supplier_parts_warranty_stats_util
+    results = await run_concurrently(
+        db,
+        parts=lambda session: parts_util(supplier.supplier_id, window=window, db=session),
+        breakdown=lambda session: get_supplier_parts_warranty_breakdown_util(supplier.supplier_id, window=window, db=session),
+    )
+    approximation = approximation_bounds(window, distinct_vehicles=True, quantiles=True) if approx else None
+    return build_supplier_parts_analytics(supplier_name, supplier, window=window, approximation=approximation, **results)
+
+def build_supplier_parts_analytics(supplier_name: str, supplier, parts: list, breakdown: list, window: TimeWindow = TimeWindow(), approximation: dict = None) -> dict:
+    """
+    Análise das peças de um fornecedor a partir das linhas já consultadas (do banco ou do snapshot), sem cache.
+    """
     if not supplier:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Fornecedor '{supplier_name}' não encontrado"
         )
     try:
-        parts = get_parts_by_supplier_id_util(supplier.supplier_id, db=db)
         if not parts:
             return {
                 "supplier": {
@@ -396,94 +566,64 @@ def analytics_supplier_by_part(supplier_name: str, db: Session = Depends(get_db)
                 },
                 "total_parts": 0,
                 "message": "Nenhuma peça encontrada para este fornecedor",
-                "parts_analysis": []
+                "parts_analysis": [],
+                "window": window.describe(),
             }
+
+        # Agrupa por modelo de veículo, tipo de propulsão, classificação e faixa de anos para cada peça
+        model_stats = defaultdict(lambda: defaultdict(int))
+        propulsion_stats = defaultdict(lambda: defaultdict(int))
+        failure_classifications = defaultdict(lambda: defaultdict(int))
+        year_ranges = defaultdict(lambda: defaultdict(int))
+
+        for group in breakdown:
+            failure_classifications[group.part_id][group.classified_failured] += group.claims
+
+            # Garantias sem veículo associado não entram nas estatísticas de veículo
+            if group.vehicle_claims:
+                model_stats[group.part_id][group.model] += group.vehicle_claims
+                propulsion_stats[group.part_id][group.propulsion] += group.vehicle_claims
+                if group.year is not None:
+                    range_start = (group.year // 5) * 5  # Agrupa em faixas de 5 anos
+                    range_key = f"{range_start}-{range_start+4}"
+                    year_ranges[group.part_id][range_key] += group.vehicle_claims
+
+        def format_stats(stats: dict, label: str, total_claims: int) -> list[dict]:
+            return [
+                {label: key, "count": count, "percentage": round((count / total_claims) * 100, 2)}
+                for key, count in sorted(stats.items(), key=lambda x: x[1], reverse=True)
+            ]
+
         # Inicializa análise de peças
         parts_analysis = []
         
         for part in parts:
-            # Busca garantias relacionadas a esta peça
-            warranties = get_warranties_by_part_id_util(part.part_id, db=db)
-            
-            # Agrupa por modelo de veículo e tipo de propulsão
-            model_stats = defaultdict(int)
-            propulsion_stats = defaultdict(int)
-            failure_classifications = defaultdict(int)
-            vehicle_years = defaultdict(int)
-            
-            # Coleta IDs únicos de veículos para calcular taxa de falha
-            unique_vehicles = set()
-            
-            for warranty in warranties:
-                # Obtém informações do veículo
-                vehicle = get_vehicle_by_id_util(warranty.vehicle_id, db=db)
-                if vehicle:
-                    model_stats[vehicle.model] += 1
-                    propulsion_stats[vehicle.propulsion] += 1
-                    vehicle_years[vehicle.year] += 1
-                    unique_vehicles.add(vehicle.vehicle_id)
-                
-                # Estatísticas de classificação de falhas
-                failure_classifications[warranty.classified_failured] += 1
-            
-            # Calcula tempo médio até falha (em dias)
-            avg_time_to_failure = 0
-            if warranties:
-                total_days = 0
-                count = 0
-                for warranty in warranties:
-                    vehicle = get_vehicle_by_id_util(warranty.vehicle_id, db=db)
-                    if vehicle:
-                        days_to_failure = (warranty.repair_date - vehicle.prod_date).days
-                        if days_to_failure > 0:  # Previne valores negativos
-                            total_days += days_to_failure
-                            count += 1
-                
-                if count > 0:
-                    avg_time_to_failure = total_days / count
-            
-            # Formata estatísticas para incluir na análise
-            formatted_model_stats = [
-                {"model": model, "count": count, "percentage": round((count / len(warranties)) * 100, 2)}
-                for model, count in sorted(model_stats.items(), key=lambda x: x[1], reverse=True)
-            ]
-            
-            formatted_propulsion_stats = [
-                {"type": prop_type, "count": count, "percentage": round((count / len(warranties)) * 100, 2)}
-                for prop_type, count in sorted(propulsion_stats.items(), key=lambda x: x[1], reverse=True)
-            ]
-            
-            formatted_failure_stats = [
-                {"classification": classification, "count": count, "percentage": round((count / len(warranties)) * 100, 2)}
-                for classification, count in sorted(failure_classifications.items(), key=lambda x: x[1], reverse=True)
-            ]
-            
-            # Agrega anos por faixa para identificar tendências
-            year_ranges = defaultdict(int)
-            for year, count in vehicle_years.items():
-                range_start = (year // 5) * 5  # Agrupa em faixas de 5 anos
-                range_key = f"{range_start}-{range_start+4}"
-                year_ranges[range_key] += count
-                
-            formatted_year_stats = [
-                {"range": year_range, "count": count, "percentage": round((count / len(warranties)) * 100, 2)}
-                for year_range, count in sorted(year_ranges.items())
-            ]
-            
+            total_claims = part.total_claims
+
+            warranty_stats = {
+                "total_claims": total_claims,
+                "affected_vehicles": part.affected_vehicles,
+                "avg_time_to_failure_days": round(float(part.avg_time_to_failure_days or 0), 1),
+                "failure_classifications": format_stats(failure_classifications[part.part_id], "classification", total_claims)
+            }
+            if approximation is not None:
+                warranty_stats["days_to_failure_quantiles"] = {
+                    label: round(value, 1) if value is not None else None
+                    for label, value in part.days_to_failure_quantiles.items()
+                }
+
             # Adiciona análise desta peça ao resultado
             parts_analysis.append({
                 "part_id": part.part_id,
                 "name": part.part_name,
-                "warranty_stats": {
-                    "total_claims": len(warranties),
-                    "affected_vehicles": len(unique_vehicles),
-                    "avg_time_to_failure_days": round(avg_time_to_failure, 1),
-                    "failure_classifications": formatted_failure_stats
-                },
+                "warranty_stats": warranty_stats,
                 "vehicle_stats": {
-                    "models": formatted_model_stats,
-                    "propulsion_types": formatted_propulsion_stats,
-                    "year_distribution": formatted_year_stats
+                    "models": format_stats(model_stats[part.part_id], "model", total_claims),
+                    "propulsion_types": format_stats(propulsion_stats[part.part_id], "type", total_claims),
+                    "year_distribution": [
+                        {"range": year_range, "count": count, "percentage": round((count / total_claims) * 100, 2)}
+                        for year_range, count in sorted(year_ranges[part.part_id].items())
+                    ]
                 }
             })
         
@@ -491,7 +631,7 @@ def analytics_supplier_by_part(supplier_name: str, db: Session = Depends(get_db)
         parts_analysis.sort(key=lambda x: x["warranty_stats"]["total_claims"], reverse=True)
         
         # Retorna a análise completa
-        return {
+        result = {
             "supplier": {
                 "supplier_id": supplier.supplier_id,
                 "name": supplier.supplier_name,
@@ -499,11 +639,132 @@ def analytics_supplier_by_part(supplier_name: str, db: Session = Depends(get_db)
             },
             "total_parts": len(parts),
             "parts_with_warranty_claims": sum(1 for p in parts_analysis if p["warranty_stats"]["total_claims"] > 0),
-            "parts_analysis": parts_analysis
+            "parts_analysis": parts_analysis,
+            "window": window.describe(),
         }
+        if approximation is not None:
+            result["approximation"] = approximation
+        return result
     except Exception as e:
         # Captura outras exceções e retorna uma resposta de erro
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Erro ao processar estatísticas de peças por fornecedor: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+@router.get("/cube", dependencies=[conditional_get(*CUBE_TABLES, authenticated=True, extra=analytics_state)])
+async def analytics_cube(
+    background_tasks: BackgroundTasks,
+    dimensions: List[CubeDimensionEnum] = Query(default=[]),
+    measures: List[CubeMeasureEnum] = Query(default=[CubeMeasureEnum.claims]),
+    market: MarketEnum = None,
+    country: str = None,
+    province: str = None,
+    supplier: str = None,
+    part: int = None,
+    model: str = None,
+    propulsion: PropulsionEnum = None,
+    year: int = None,
+    repair_month: str = Query(default=None, pattern=r"^\d{4}-\d{2}$"),
+    classified_failured: str = None,
+    limit: int = Query(default=1000, ge=1, le=ANALYTICS_CUBE_MAX_ROWS),
+    window: TimeWindow = Depends(get_time_window),
+    db: AsyncSession = Depends(get_async_db),
+) -> dict:
+    """
+    Cubo sobre o esquema estrela das garantias e compras: agrupa por qualquer combinação de dimensões
+    (market, country, province, supplier, part, model, propulsion, year, repair_month, classified_failured)
+    e calcula as medidas pedidas (claims, vehicles, purchases, avg_days_to_failure).
+    Os demais parâmetros filtram pela dimensão de mesmo nome (supplier pelo nome do fornecedor).
+    O local das garantias é o do reparo; a medida purchases só combina com part e supplier.
+    O intervalo se aplica à data de reparo das garantias e à data das compras.
+    """
+    # Ordem preservada e repetições descartadas, para que a mesma consulta use a mesma entrada no cache
+    dimensions = list(dict.fromkeys(dimensions))
+    measures = list(dict.fromkeys(measures))
+    filters = {
+        CubeDimensionEnum(name): getattr(value, "value", value)
+        for name, value in {
+            "market": market, "country": country, "province": province, "supplier": supplier, "part": part,
+            "model": model, "propulsion": propulsion, "year": year, "repair_month": repair_month,
+            "classified_failured": classified_failured,
+        }.items()
+        if value is not None
+    }
+    return await cached_json_response_async(
+        analytics_cache,
+        key=(
+            "cube",
+            ",".join(dimension.value for dimension in dimensions),
+            ",".join(measure.value for measure in measures),
+            "&".join(f"{dimension.value}={value}" for dimension, value in filters.items()),
+            limit,
+            *window.cache_key(),
+        ),
+        tables=CUBE_TABLES,
+        compute=lambda session: session.run_sync(lambda sync_session: build_cube_analytics(dimensions, measures, filters, limit, sync_session, window)),
+        db=db,
+        background_tasks=background_tasks,
+    )
+
+def build_cube_analytics(dimensions: list, measures: list, filters: dict, limit: int, db: Session, window: TimeWindow = TimeWindow()) -> dict:
+    """
+    Consulta ao cubo, sem cache.
+    """
+    rows = get_cube_util(dimensions, measures, filters, limit=limit, window=window, db=db)
+    labels = [label for dimension in dimensions for label in dimension_labels(dimension)]
+
+    def measure_value(measure: CubeMeasureEnum, value):
+        if measure == CubeMeasureEnum.avg_days_to_failure:
+            return round(float(value), 1) if value is not None else None
+        return value
+
+    return {
+        "dimensions": [dimension.value for dimension in dimensions],
+        "measures": [measure.value for measure in measures],
+        "filters": {dimension.value: value for dimension, value in filters.items()},
+        "rows": [
+            {
+                **{label: row._mapping[label] for label in labels},
+                **{measure.value: measure_value(measure, row._mapping[measure.value]) for measure in measures},
+            }
+            for row in rows[:limit]
+        ],
+        "truncated": len(rows) > limit,
+        "window": window.describe(),
+    }
+
+async def list_analytics_warmup_jobs(db: AsyncSession) -> list:
+    """
+    Todas as respostas de analytics a pré-calcular, com as mesmas chaves e tabelas das rotas.
+    """
+    dimensions = await run_concurrently(
+        db,
+        provinces=get_distinct_provinces_util,
+        models=get_distinct_vehicle_models_util,
+        supplier_names=get_distinct_supplier_names_util,
+    )
+    return [
+        *(
+            WarmupJob(("supplier_by_province", province), SUPPLIER_BY_PROVINCE_TABLES, partial(load_supplier_by_province_analytics, province))
+            for province in dimensions["provinces"]
+        ),
+        *(
+            WarmupJob(("purchases_by_type", purchase_type.value), PURCHASE_TYPE_TABLES, partial(load_purchase_type_analytics, purchase_type))
+            for purchase_type in PurchaseEnum
+        ),
+        *(
+            WarmupJob(("vehicle_model", model), VEHICLE_MODEL_TABLES, partial(load_vehicle_model_analytics, model))
+            for model in dimensions["models"]
+        ),
+        *(
+            WarmupJob(("propulsion_type", propulsion_type.value), PROPULSION_TYPE_TABLES, partial(load_propulsion_type_analytics, propulsion_type))
+            for propulsion_type in PropulsionEnum
+        ),
+        *(
+            WarmupJob(("part_by_suppliers", supplier_name), SUPPLIER_PARTS_TABLES, partial(load_supplier_parts_analytics, supplier_name))
+            for supplier_name in dimensions["supplier_names"]
+        ),
+    ]
+
+analytics_warmer = AnalyticsWarmer(analytics_cache, list_analytics_warmup_jobs)
@@ -1,30 +1,78 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 
+from app.configs.cache import cached_json_response, dimension_cache
+from app.configs.batch import build_batch, get_batch_ids, parse_batch_ids
+from app.configs.conditional import conditional_get
 from app.configs.database import get_db
+from app.configs.fields import get_fields, project, query_fields, select_fields
+from app.configs.export import export_media_type, stream_table_response
+from app.configs.pagination import PageParams, decode_cursor, get_page_params, page_response
 from app.models.model_location import Location
-from app.schemas.location import LocationDelete, LocationRequest, LocationResponse, LocationUpdate
-from app.utils.location import delete_location_by_id_util, get_all_locations_util, get_location_by_id_util, get_locations_by_country_util, get_locations_by_market_util, get_locations_by_city_util, get_locations_by_province_util, update_location_by_id_util
+from app.schemas.location import LocationDelete, LocationFields, LocationRequest, LocationResponse, LocationUpdate
+from app.schemas.batch import BatchGetRequest, BatchResponse
+from app.schemas.bulk import BulkCreateResponse, BulkDeleteRequest, BulkUpdateRequest, BulkWriteResponse
+from app.schemas.pagination import Page
+from app.utils.location import delete_location_by_id_util, get_locations_by_ids_util, get_locations_page_util, get_location_by_id_util, get_locations_by_country_util, get_locations_by_market_util, get_locations_by_city_util, get_locations_by_province_util, update_location_by_id_util
+from app.utils.bulk import bulk_count_util, bulk_create_util, bulk_criteria_util, bulk_delete_util, bulk_patch_util, bulk_update_util, read_bulk_body
 
 router = APIRouter(prefix="/location", tags=["location"])
 
-@router.get("/")
-def list_location(db: Session = Depends(get_db)) -> list[LocationResponse]: 
+@router.get("/", dependencies=[conditional_get(Location.__tablename__)])
+def list_location(request: Request, page: PageParams = Depends(get_page_params), fields: list = Depends(get_fields), db: Session = Depends(get_db)) -> Page[LocationFields]:
+    """
+    Lista as localizações, em páginas ordenadas pelo id.
+    Com `Accept: application/x-ndjson` ou `text/csv`, exporta a tabela inteira em streaming.
+    `fields=a,b` restringe o SELECT e a resposta a esses campos (o id sempre vem).
+    """
+    fields = select_fields(Location, LocationResponse, fields)
+    media_type = export_media_type(request)
+    if media_type is not None:
+        return stream_table_response(Location, fields, media_type)
+    after = decode_cursor(Location.__tablename__, page.cursor)
+    return page_response(Location, fields, get_locations_page_util(fields, after, page.limit, db=db), page.limit)
+
+@router.get("/batch", response_model_exclude_unset=True, dependencies=[conditional_get(Location.__tablename__)])
+def get_locations_batch(ids: list = Depends(get_batch_ids), fields: list = Depends(get_fields), db: Session = Depends(get_db)) -> BatchResponse[LocationFields]:
+    """
+    Obtém várias localizações pelos ids (`?ids=1,2,3`) com uma única consulta, na ordem pedida.
+    Ids inexistentes são listados em `missing`.
+    """
+    fields = select_fields(Location, LocationResponse, fields)
+    return build_batch(get_locations_by_ids_util(ids, query_fields(Location, LocationResponse, fields), db=db), fields, LocationFields)
+
+@router.post("/batch", response_model_exclude_unset=True)
+def post_locations_batch(batch: BatchGetRequest, fields: list = Depends(get_fields), db: Session = Depends(get_db)) -> BatchResponse[LocationFields]:
     """
-    Lista todas as localizações.
+    Como `GET /batch`, com os ids no corpo, para listas longas demais para a URL.
     """
-    all_locations = get_all_locations_util(db)
-    return [LocationResponse.model_validate(location.__dict__) for location in all_locations]
+    fields = select_fields(Location, LocationResponse, fields)
+    return build_batch(get_locations_by_ids_util(parse_batch_ids(batch.ids), query_fields(Location, LocationResponse, fields), db=db), fields, LocationFields)
 
-@router.get("/id/{location_id}")
-def get_location_by_id(location_id: int, db: Session = Depends(get_db)) -> LocationResponse:
+@router.get("/id/{location_id}", response_model_exclude_unset=True, dependencies=[conditional_get(Location.__tablename__)])
+def get_location_by_id(location_id: int, background_tasks: BackgroundTasks, fields: list = Depends(get_fields), db: Session = Depends(get_db)) -> LocationFields:
     """
     Obtém uma localização pelo seu ID.
+    `fields=a,b` restringe o SELECT e a resposta a esses campos (o id sempre vem); cada combinação tem a sua entrada no cache.
+    """
+    fields = select_fields(Location, LocationResponse, fields)
+    return cached_json_response(
+        dimension_cache,
+        key=(Location.__tablename__, location_id, ",".join(fields)),
+        tables=(Location.__tablename__,),
+        compute=lambda session: build_location_by_id(location_id, fields, session),
+        db=db,
+        background_tasks=background_tasks,
+    )
+
+def build_location_by_id(location_id: int, fields: list, db: Session) -> dict:
     """
-    location = get_location_by_id_util(location_id, db)
+    Localização por id, só com `fields`, sem cache.
+    """
+    location = get_location_by_id_util(location_id, query_fields(Location, LocationResponse, fields), db=db)
     if not location:
         raise HTTPException(status_code=404, detail="Localização não encontrada")
-    return LocationResponse(**location.__dict__)
+    return project(location, fields, LocationFields).model_dump(exclude_unset=True)
 
 @router.get("/market/{market}")
 def get_location_by_market(market: str, db: Session = Depends(get_db)) -> list[LocationResponse]:
@@ -79,6 +127,45 @@ def create_location(location: LocationRequest, db: Session = Depends(get_db)) ->
     db.refresh(new_location)
     return LocationResponse( **new_location.__dict__ )
 
+@router.post("/bulk", status_code=201)
+def create_locations_bulk(body: bytes = Depends(read_bulk_body), atomic: bool = False, db: Session = Depends(get_db)) -> BulkCreateResponse:
+    """
+    Cria várias localizações em uma única transação, a partir de uma lista JSON no corpo.
+    Linhas inválidas são reportadas pela posição e as demais são gravadas; com `atomic`, qualquer erro recusa a carga inteira.
+    """
+    result = bulk_create_util(Location, LocationRequest, body, atomic=atomic, db=db)
+    db.commit()
+    return result
+
+@router.patch("/bulk")
+def update_locations_bulk(bulk: BulkUpdateRequest[LocationUpdate], dry_run: bool = False, db: Session = Depends(get_db)) -> BulkWriteResponse:
+    """
+    Aplica o mesmo patch às localizações de `ids` e/ou que satisfazem `where` (igualdade por campo), em um único UPDATE.
+    Com `dry_run`, apenas conta as linhas que seriam alteradas.
+    """
+    patch = bulk_patch_util(bulk.patch)
+    criteria = bulk_criteria_util(Location, LocationResponse, bulk.ids, bulk.where)
+    if dry_run:
+        return BulkWriteResponse(matched=bulk_count_util(Location, criteria, db=db), dry_run=True)
+
+    matched = bulk_update_util(Location, criteria, patch, db=db)
+    db.commit()
+    return BulkWriteResponse(matched=matched, dry_run=False)
+
+@router.delete("/bulk")
+def delete_locations_bulk(bulk: BulkDeleteRequest, dry_run: bool = False, db: Session = Depends(get_db)) -> BulkWriteResponse:
+    """
+    Deleta as localizações de `ids` e/ou que satisfazem `where` em um único DELETE.
+    Com `dry_run`, apenas conta as linhas que seriam removidas.
+    """
+    criteria = bulk_criteria_util(Location, LocationResponse, bulk.ids, bulk.where)
+    if dry_run:
+        return BulkWriteResponse(matched=bulk_count_util(Location, criteria, db=db), dry_run=True)
+
+    matched = bulk_delete_util(Location, criteria, db=db)
+    db.commit()
+    return BulkWriteResponse(matched=matched, dry_run=False)
+
 @router.put("/id/{location_id}")
 def update_location(location: LocationUpdate, location_id: int, db: Session = Depends(get_db)) -> LocationResponse:
     """
@@ -117,4 +204,5 @@ def delete_location(location: LocationDelete, db: Session = Depends(get_db)) ->
     if not deleted_location:
         raise HTTPException(status_code=500, detail="Falha ao excluir a localização")
     
+    db.commit()
     return response_data
\ No newline at end of file
@@ -1,30 +1,79 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 
+from app.configs.cache import cached_json_response, dimension_cache
+from app.configs.batch import build_batch, get_batch_ids, parse_batch_ids
+from app.configs.conditional import conditional_get
 from app.configs.database import get_db
+from app.configs.fields import get_fields, project, query_fields, select_fields
+from app.configs.export import export_media_type, stream_table_response
+from app.configs.pagination import PageParams, decode_cursor, get_page_params, page_response
 from app.models.model_part import Part
-from app.schemas.part import PartDelete, PartRequest, PartResponse, PartUpdate
-from app.utils.part import delete_part_by_part_name, get_all_parts_util, get_part_by_id_util, get_part_by_name_util, update_part_by_id_util
+from app.schemas.part import PartDelete, PartFields, PartRequest, PartResponse, PartUpdate
+from app.schemas.batch import BatchGetRequest, BatchResponse
+from app.schemas.bulk import BulkCreateResponse, BulkDeleteRequest, BulkUpdateRequest, BulkWriteResponse
+from app.schemas.pagination import Page
+from app.utils.rollup import refresh_supplier_rollups_util, supplier_ids_by_parts_util
+from app.utils.part import delete_part_by_part_name, get_parts_by_ids_util, get_parts_page_util, get_part_by_id_util, get_part_by_name_util, update_part_by_id_util
+from app.utils.bulk import bulk_count_util, bulk_create_util, bulk_criteria_util, bulk_delete_util, bulk_patch_util, bulk_update_util, chunked, read_bulk_body
 
 router = APIRouter(prefix="/part", tags=["part"])
 
-@router.get("/")
-def list_part(db: Session = Depends(get_db)) -> list[PartResponse]:
+@router.get("/", dependencies=[conditional_get(Part.__tablename__)])
+def list_part(request: Request, page: PageParams = Depends(get_page_params), fields: list = Depends(get_fields), db: Session = Depends(get_db)) -> Page[PartFields]:
     """
-    Lista todas as partes.
+    Lista as partes, em páginas ordenadas pelo id.
+    Com `Accept: application/x-ndjson` ou `text/csv`, exporta a tabela inteira em streaming.
+    `fields=a,b` restringe o SELECT e a resposta a esses campos (o id sempre vem).
     """
-    all_parts = get_all_parts_util(db)
-    return [PartResponse.model_validate(part.__dict__) for part in all_parts]
+    fields = select_fields(Part, PartResponse, fields)
+    media_type = export_media_type(request)
+    if media_type is not None:
+        return stream_table_response(Part, fields, media_type)
+    after = decode_cursor(Part.__tablename__, page.cursor)
+    return page_response(Part, fields, get_parts_page_util(fields, after, page.limit, db=db), page.limit)
 
-@router.get("/id/{part_id}")
-def get_part_by_id(part_id: int, db: Session = Depends(get_db)) -> PartResponse:
+@router.get("/batch", response_model_exclude_unset=True, dependencies=[conditional_get(Part.__tablename__)])
+def get_parts_batch(ids: list = Depends(get_batch_ids), fields: list = Depends(get_fields), db: Session = Depends(get_db)) -> BatchResponse[PartFields]:
+    """
+    Obtém várias partes pelos ids (`?ids=1,2,3`) com uma única consulta, na ordem pedida.
+    Ids inexistentes são listados em `missing`.
+    """
+    fields = select_fields(Part, PartResponse, fields)
+    return build_batch(get_parts_by_ids_util(ids, query_fields(Part, PartResponse, fields), db=db), fields, PartFields)
+
+@router.post("/batch", response_model_exclude_unset=True)
+def post_parts_batch(batch: BatchGetRequest, fields: list = Depends(get_fields), db: Session = Depends(get_db)) -> BatchResponse[PartFields]:
+    """
+    Como `GET /batch`, com os ids no corpo, para listas longas demais para a URL.
+    """
+    fields = select_fields(Part, PartResponse, fields)
+    return build_batch(get_parts_by_ids_util(parse_batch_ids(batch.ids), query_fields(Part, PartResponse, fields), db=db), fields, PartFields)
+
+@router.get("/id/{part_id}", response_model_exclude_unset=True, dependencies=[conditional_get(Part.__tablename__)])
+def get_part_by_id(part_id: int, background_tasks: BackgroundTasks, fields: list = Depends(get_fields), db: Session = Depends(get_db)) -> PartFields:
     """
     Obtém uma parte pelo seu ID.
+    `fields=a,b` restringe o SELECT e a resposta a esses campos (o id sempre vem); cada combinação tem a sua entrada no cache.
     """
-    part = get_part_by_id_util(part_id, db=db)
+    fields = select_fields(Part, PartResponse, fields)
+    return cached_json_response(
+        dimension_cache,
+        key=(Part.__tablename__, part_id, ",".join(fields)),
+        tables=(Part.__tablename__,),
+        compute=lambda session: build_part_by_id(part_id, fields, session),
+        db=db,
+        background_tasks=background_tasks,
+    )
+
+def build_part_by_id(part_id: int, fields: list, db: Session) -> dict:
+    """
+    Parte por id, só com `fields`, sem cache.
+    """
+    part = get_part_by_id_util(part_id, query_fields(Part, PartResponse, fields), db=db)
     if not part:
         raise HTTPException(status_code=404, detail="Parte não encontrada")
-    return PartResponse(**part.__dict__)
+    return project(part, fields, PartFields).model_dump(exclude_unset=True)
 
 @router.post("/", status_code=201)
 def create_part(part: PartRequest, db: Session = Depends(get_db)) -> PartResponse:
@@ -33,10 +82,58 @@ def create_part(part: PartRequest, db: Session = Depends(get_db)) -> PartRespons
     """
     new_part = Part(**part.model_dump())
     db.add(new_part)
+    db.flush()
+
+    refresh_supplier_rollups_util({new_part.supplier_id}, db=db)
     db.commit()
     db.refresh(new_part)
     return PartResponse(**new_part.__dict__)
 
+@router.post("/bulk", status_code=201)
+def create_parts_bulk(body: bytes = Depends(read_bulk_body), atomic: bool = False, db: Session = Depends(get_db)) -> BulkCreateResponse:
+    """
+    Cria várias partes em uma única transação, a partir de uma lista JSON no corpo.
+    Linhas inválidas são reportadas pela posição e as demais são gravadas; com `atomic`, qualquer erro recusa a carga inteira.
+    """
+    result = bulk_create_util(Part, PartRequest, body, atomic=atomic, db=db)
+    supplier_ids = set()
+    for ids in chunked(result.ids):
+        supplier_ids |= supplier_ids_by_parts_util(Part.part_id.in_(ids), db=db)
+    refresh_supplier_rollups_util(supplier_ids, db=db)
+    db.commit()
+    return result
+
+@router.patch("/bulk")
+def update_parts_bulk(bulk: BulkUpdateRequest[PartUpdate], dry_run: bool = False, db: Session = Depends(get_db)) -> BulkWriteResponse:
+    """
+    Aplica o mesmo patch às partes de `ids` e/ou que satisfazem `where` (igualdade por campo), em um único UPDATE.
+    Com `dry_run`, apenas conta as linhas que seriam alteradas.
+    """
+    patch = bulk_patch_util(bulk.patch)
+    criteria = bulk_criteria_util(Part, PartResponse, bulk.ids, bulk.where)
+    if dry_run:
+        return BulkWriteResponse(matched=bulk_count_util(Part, criteria, db=db), dry_run=True)
+
+    matched = bulk_update_util(Part, criteria, patch, db=db)
+    db.commit()
+    return BulkWriteResponse(matched=matched, dry_run=False)
+
+@router.delete("/bulk")
+def delete_parts_bulk(bulk: BulkDeleteRequest, dry_run: bool = False, db: Session = Depends(get_db)) -> BulkWriteResponse:
+    """
+    Deleta as partes de `ids` e/ou que satisfazem `where` em um único DELETE.
+    Com `dry_run`, apenas conta as linhas que seriam removidas.
+    """
+    criteria = bulk_criteria_util(Part, PartResponse, bulk.ids, bulk.where)
+    if dry_run:
+        return BulkWriteResponse(matched=bulk_count_util(Part, criteria, db=db), dry_run=True)
+
+    supplier_ids = supplier_ids_by_parts_util(*criteria, db=db)
+    matched = bulk_delete_util(Part, criteria, db=db)
+    refresh_supplier_rollups_util(supplier_ids, db=db)
+    db.commit()
+    return BulkWriteResponse(matched=matched, dry_run=False)
+
 @router.put("/id/{part_id}")
 def update_part(part: PartUpdate, part_id: int, db: Session = Depends(get_db)) -> PartResponse:
     """
@@ -70,9 +167,12 @@ def delete_part(part: PartDelete, db: Session = Depends(get_db)) -> PartResponse
 
     response_data = PartResponse.model_validate(part_to_delete.__dict__)
     
+    supplier_ids = supplier_ids_by_parts_util(Part.part_name == part.part_name, db=db)
     deleted_part = delete_part_by_part_name(part.part_name, db=db)
     
     if not deleted_part:
         raise HTTPException(status_code=500, detail="Falha ao excluir a parte")
     
+    refresh_supplier_rollups_util(supplier_ids, db=db)
+    db.commit()
     return response_data
@@ -1,31 +1,69 @@
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, UploadFile
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from app.configs.batch import build_batch, get_batch_ids, parse_batch_ids
+from app.configs.conditional import conditional_get
 from app.configs.database import get_db
+from app.configs.fields import get_fields, project, query_fields, select_fields
+from app.configs.export import export_media_type, stream_table_response
+from app.configs.pagination import PageParams, decode_cursor, get_page_params, page_response
 from app.models.model_purchase import Purchase
-from app.schemas.purchase import PurchaseDelete, PurchaseEnum, PurchaseRequest, PurchaseResponse, PurchaseUpdate
-from app.utils.purchase import delete_purchase_by_id, get_all_purchase_util, get_purchase_by_id_util, get_purchases_by_purchase_date_util, get_purchases_by_purchase_type_util, update_purchase_by_id_util
+from app.schemas.purchase import PurchaseDelete, PurchaseEnum, PurchaseFields, PurchaseRequest, PurchaseResponse, PurchaseUpdate
+from app.schemas.batch import BatchGetRequest, BatchResponse
+from app.schemas.bulk import BulkCreateResponse, BulkDeleteRequest, BulkUpdateRequest, BulkWriteResponse
+from app.schemas.ingest import IngestFormatEnum, IngestReport
+from app.schemas.pagination import Page
+from app.models.model_part import Part
+from app.utils.rollup import patched_partitions_util, purchase_partitions_util, refresh_purchase_rollups_util, refresh_supplier_rollups_util, supplier_ids_by_parts_util
+from app.utils.purchase import delete_purchase_by_id, get_purchases_by_ids_util, get_purchases_page_util, get_purchase_by_id_util, get_purchases_by_purchase_date_util, get_purchases_by_purchase_type_util, update_purchase_by_id_util
+from app.utils.bulk import bulk_count_util, bulk_create_util, bulk_criteria_util, bulk_delete_util, bulk_patch_util, bulk_update_util, chunked, read_bulk_body
+from app.utils.ingest import ingest_file_util, ingest_format
 
 router = APIRouter(prefix="/purchases", tags=["purchases"])
 
-@router.get("/")
-def list_purchases(db: Session = Depends(get_db)) -> list[PurchaseResponse]:
+@router.get("/", dependencies=[conditional_get(Purchase.__tablename__)])
+def list_purchases(request: Request, page: PageParams = Depends(get_page_params), fields: list = Depends(get_fields), db: Session = Depends(get_db)) -> Page[PurchaseFields]:
     """
-    Lista todas as compras.
+    Lista as compras, em páginas ordenadas pelo id.
+    Com `Accept: application/x-ndjson` ou `text/csv`, exporta a tabela inteira em streaming.
+    `fields=a,b` restringe o SELECT e a resposta a esses campos (o id sempre vem).
     """
-    all_purchases = get_all_purchase_util(db=db)
-    return [PurchaseResponse.model_validate(purchase.__dict__) for purchase in all_purchases]
+    fields = select_fields(Purchase, PurchaseResponse, fields)
+    media_type = export_media_type(request)
+    if media_type is not None:
+        return stream_table_response(Purchase, fields, media_type)
+    after = decode_cursor(Purchase.__tablename__, page.cursor)
+    return page_response(Purchase, fields, get_purchases_page_util(fields, after, page.limit, db=db), page.limit)
 
-@router.get("/id/{purchase_id}")
-def get_purchase_by_id(purchase_id: int, db: Session = Depends(get_db)) -> PurchaseResponse:
+@router.get("/batch", response_model_exclude_unset=True, dependencies=[conditional_get(Purchase.__tablename__)])
+def get_purchases_batch(ids: list = Depends(get_batch_ids), fields: list = Depends(get_fields), db: Session = Depends(get_db)) -> BatchResponse[PurchaseFields]:
+    """
+    Obtém várias compras pelos ids (`?ids=1,2,3`) com uma única consulta, na ordem pedida.
+    Ids inexistentes são listados em `missing`.
+    """
+    fields = select_fields(Purchase, PurchaseResponse, fields)
+    return build_batch(get_purchases_by_ids_util(ids, query_fields(Purchase, PurchaseResponse, fields), db=db), fields, PurchaseFields)
+
+@router.post("/batch", response_model_exclude_unset=True)
+def post_purchases_batch(batch: BatchGetRequest, fields: list = Depends(get_fields), db: Session = Depends(get_db)) -> BatchResponse[PurchaseFields]:
+    """
+    Como `GET /batch`, com os ids no corpo, para listas longas demais para a URL.
+    """
+    fields = select_fields(Purchase, PurchaseResponse, fields)
+    return build_batch(get_purchases_by_ids_util(parse_batch_ids(batch.ids), query_fields(Purchase, PurchaseResponse, fields), db=db), fields, PurchaseFields)
+
+@router.get("/id/{purchase_id}", response_model_exclude_unset=True, dependencies=[conditional_get(Purchase.__tablename__)])
+def get_purchase_by_id(purchase_id: int, fields: list = Depends(get_fields), db: Session = Depends(get_db)) -> PurchaseFields:
     """
     Obtem compra pelo seu ID.
     """
-    location = get_purchase_by_id_util(purchase_id, db=db)
+    fields = select_fields(Purchase, PurchaseResponse, fields)
+    location = get_purchase_by_id_util(purchase_id, query_fields(Purchase, PurchaseResponse, fields), db=db)
     if not location:
         raise HTTPException(status_code=404, detail=f"Compra com id {purchase_id} não encontrada no banco de dados")
-    return PurchaseResponse(**location.__dict__)
+    return project(location, fields, PurchaseFields)
 
 @router.get("/type/{purchase_type}")
 def get_purchase_by_type(purchase_type: PurchaseEnum, db: Session = Depends(get_db)) -> list[PurchaseResponse]:
@@ -54,10 +92,78 @@ def create_purchase(purchase: PurchaseRequest, db: Session = Depends(get_db)) ->
     """
     new_purchase = Purchase(**purchase.model_dump())
     db.add(new_purchase)
+    db.flush()
+
+    # Mantém as rollups de compras e os contadores do fornecedor na mesma transação da escrita
+    refresh_purchase_rollups_util(purchase_partitions_util(Purchase.purchase_id == new_purchase.purchase_id, db=db), db=db)
+    refresh_supplier_rollups_util(supplier_ids_by_parts_util(Part.part_id == new_purchase.part_id, db=db), db=db)
     db.commit()
     db.refresh(new_purchase)
     return PurchaseResponse(**new_purchase.__dict__)
 
+@router.post("/bulk", status_code=201)
+def create_purchases_bulk(body: bytes = Depends(read_bulk_body), atomic: bool = False, db: Session = Depends(get_db)) -> BulkCreateResponse:
+    """
+    Cria várias compras em uma única transação, a partir de uma lista JSON no corpo.
+    Linhas inválidas são reportadas pela posição e as demais são gravadas; com `atomic`, qualquer erro recusa a carga inteira.
+    """
+    result = bulk_create_util(Purchase, PurchaseRequest, body, atomic=atomic, db=db)
+    # Rollups de compras e contadores dos fornecedores, uma vez para a carga inteira
+    partitions, supplier_ids = set(), set()
+    for ids in chunked(result.ids):
+        partitions |= purchase_partitions_util(Purchase.purchase_id.in_(ids), db=db)
+        supplier_ids |= supplier_ids_by_parts_util(Part.part_id.in_(select(Purchase.part_id).where(Purchase.purchase_id.in_(ids))), db=db)
+    refresh_purchase_rollups_util(partitions, db=db)
+    refresh_supplier_rollups_util(supplier_ids, db=db)
+    db.commit()
+    return result
+
+@router.post("/ingest")
+def ingest_purchases(file: UploadFile, file_format: IngestFormatEnum = Query(default=None, alias="format"), db: Session = Depends(get_db)) -> IngestReport:
+    """
+    Carrega um arquivo CSV ou NDJSON de compras, lido e gravado em lotes em uma única transação.
+    O formato vem da extensão do arquivo ou de `format`; o relatório traz as linhas recusadas e a vazão.
+    """
+    report = ingest_file_util("purchases", file.file, file_format or ingest_format(file.filename, file.content_type), db=db)
+    db.commit()
+    return report
+
+@router.patch("/bulk")
+def update_purchases_bulk(bulk: BulkUpdateRequest[PurchaseUpdate], dry_run: bool = False, db: Session = Depends(get_db)) -> BulkWriteResponse:
+    """
+    Aplica o mesmo patch às compras de `ids` e/ou que satisfazem `where` (igualdade por campo), em um único UPDATE.
+    Com `dry_run`, apenas conta as linhas que seriam alteradas.
+    """
+    patch = bulk_patch_util(bulk.patch)
+    criteria = bulk_criteria_util(Purchase, PurchaseResponse, bulk.ids, bulk.where)
+    if dry_run:
+        return BulkWriteResponse(matched=bulk_count_util(Purchase, criteria, db=db), dry_run=True)
+
+    partitions = purchase_partitions_util(*criteria, db=db)
+    matched = bulk_update_util(Purchase, criteria, patch, db=db)
+    partitions |= patched_partitions_util(partitions, patch, "purchase_date")
+    refresh_purchase_rollups_util(partitions, db=db)
+    refresh_supplier_rollups_util(supplier_ids_by_parts_util(Part.part_id.in_({part_id for part_id, _ in partitions}), db=db), db=db)
+    db.commit()
+    return BulkWriteResponse(matched=matched, dry_run=False)
+
+@router.delete("/bulk")
+def delete_purchases_bulk(bulk: BulkDeleteRequest, dry_run: bool = False, db: Session = Depends(get_db)) -> BulkWriteResponse:
+    """
+    Deleta as compras de `ids` e/ou que satisfazem `where` em um único DELETE.
+    Com `dry_run`, apenas conta as linhas que seriam removidas.
+    """
+    criteria = bulk_criteria_util(Purchase, PurchaseResponse, bulk.ids, bulk.where)
+    if dry_run:
+        return BulkWriteResponse(matched=bulk_count_util(Purchase, criteria, db=db), dry_run=True)
+
+    partitions = purchase_partitions_util(*criteria, db=db)
+    matched = bulk_delete_util(Purchase, criteria, db=db)
+    refresh_purchase_rollups_util(partitions, db=db)
+    refresh_supplier_rollups_util(supplier_ids_by_parts_util(Part.part_id.in_({part_id for part_id, _ in partitions}), db=db), db=db)
+    db.commit()
+    return BulkWriteResponse(matched=matched, dry_run=False)
+
 @router.put("/id/{purchase_id}")
 def update_purchase(purchase: PurchaseUpdate, purchase_id:int, db: Session = Depends(get_db)) -> PurchaseResponse:
     """
@@ -66,13 +172,17 @@ def update_purchase(purchase: PurchaseUpdate, purchase_id:int, db: Session = Dep
     update_data = purchase.model_dump()
     update_data["purchase_id"] = purchase_id
 
+    partitions = purchase_partitions_util(Purchase.purchase_id == purchase_id, db=db)
     rows_updated = update_purchase_by_id_util(**update_data, db=db)
 
     if not rows_updated:
         raise HTTPException(status_code=404, detail=f"Não foi possível atualizar compra")
     
+    partitions |= purchase_partitions_util(Purchase.purchase_id == purchase_id, db=db)
+    refresh_purchase_rollups_util(partitions, db=db)
+    refresh_supplier_rollups_util(supplier_ids_by_parts_util(Part.part_id.in_({part_id for part_id, _ in partitions}), db=db), db=db)
     db.commit()
-    updated_part = get_purchase_by_id(purchase_id, db=db)
+    updated_part = get_purchase_by_id_util(purchase_id, db=db)
 
     if not updated_part:
         raise HTTPException(status_code=404, detail=f"Não foi possível encontrar compra após atualização")
@@ -91,9 +201,13 @@ def delete_purchase(purchase: PurchaseDelete, db: Session = Depends(get_db)) ->
 
     response_data = PurchaseResponse.model_validate(purchase_to_delete.__dict__)
     
+    partitions = purchase_partitions_util(Purchase.purchase_id == purchase.purchase_id, db=db)
     deleted_part = delete_purchase_by_id(purchase.purchase_id, db=db)
     
     if not deleted_part:
         raise HTTPException(status_code=500, detail="Falha ao excluir a compra")
     
+    refresh_purchase_rollups_util(partitions, db=db)
+    refresh_supplier_rollups_util(supplier_ids_by_parts_util(Part.part_id == response_data.part_id, db=db), db=db)
+    db.commit()
     return response_data
\ No newline at end of file
@@ -1,27 +1,79 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 
+from app.configs.cache import cached_json_response, dimension_cache
+from app.configs.batch import build_batch, get_batch_ids, parse_batch_ids
+from app.configs.conditional import conditional_get
 from app.configs.database import get_db
+from app.configs.fields import get_fields, project, query_fields, select_fields
+from app.configs.export import export_media_type, stream_table_response
+from app.configs.pagination import PageParams, decode_cursor, get_page_params, page_response
 from app.models.model_supplier import Supplier
-from app.schemas.supplier import SupplierDelete, SupplierRequest, SupplierResponse, SupplierUpdate
-from app.utils.supplier import delete_supplier_by_name, get_all_suppliers_util, get_supplier_by_cpf_util, get_supplier_by_id_util, get_supplier_by_name_util, update_supplier_by_id_util
+from app.schemas.supplier import SupplierDelete, SupplierFields, SupplierRequest, SupplierResponse, SupplierUpdate
+from app.schemas.batch import BatchGetRequest, BatchResponse
+from app.schemas.bulk import BulkCreateResponse, BulkDeleteRequest, BulkUpdateRequest, BulkWriteResponse
+from app.schemas.pagination import Page
+from app.utils.rollup import refresh_supplier_rollups_util
+from app.utils.supplier import delete_supplier_by_name, get_suppliers_by_ids_util, get_suppliers_page_util, get_supplier_by_cpf_util, get_supplier_by_id_util, get_supplier_by_name_util, update_supplier_by_id_util
+from app.utils.bulk import bulk_count_util, bulk_create_util, bulk_criteria_util, bulk_delete_util, bulk_patch_util, bulk_update_util, read_bulk_body
 
 router = APIRouter(prefix="/supplier", tags=["supplier"])
 
-@router.get("/")
-def list_supplier(db: Session = Depends(get_db)) -> list[SupplierResponse]:
-    all_suppliers = get_all_suppliers_util(db)
-    return [SupplierResponse.model_validate(supplier.__dict__) for supplier in all_suppliers]
+@router.get("/", dependencies=[conditional_get(Supplier.__tablename__)])
+def list_supplier(request: Request, page: PageParams = Depends(get_page_params), fields: list = Depends(get_fields), db: Session = Depends(get_db)) -> Page[SupplierFields]:
+    """
+    Lista os fornecedores, em páginas ordenadas pelo id.
+    Com `Accept: application/x-ndjson` ou `text/csv`, exporta a tabela inteira em streaming.
+    `fields=a,b` restringe o SELECT e a resposta a esses campos (o id sempre vem).
+    """
+    fields = select_fields(Supplier, SupplierResponse, fields)
+    media_type = export_media_type(request)
+    if media_type is not None:
+        return stream_table_response(Supplier, fields, media_type)
+    after = decode_cursor(Supplier.__tablename__, page.cursor)
+    return page_response(Supplier, fields, get_suppliers_page_util(fields, after, page.limit, db=db), page.limit)
+
+@router.get("/batch", response_model_exclude_unset=True, dependencies=[conditional_get(Supplier.__tablename__)])
+def get_suppliers_batch(ids: list = Depends(get_batch_ids), fields: list = Depends(get_fields), db: Session = Depends(get_db)) -> BatchResponse[SupplierFields]:
+    """
+    Obtém vários fornecedores pelos ids (`?ids=1,2,3`) com uma única consulta, na ordem pedida.
+    Ids inexistentes são listados em `missing`.
+    """
+    fields = select_fields(Supplier, SupplierResponse, fields)
+    return build_batch(get_suppliers_by_ids_util(ids, query_fields(Supplier, SupplierResponse, fields), db=db), fields, SupplierFields)
+
+@router.post("/batch", response_model_exclude_unset=True)
+def post_suppliers_batch(batch: BatchGetRequest, fields: list = Depends(get_fields), db: Session = Depends(get_db)) -> BatchResponse[SupplierFields]:
+    """
+    Como `GET /batch`, com os ids no corpo, para listas longas demais para a URL.
+    """
+    fields = select_fields(Supplier, SupplierResponse, fields)
+    return build_batch(get_suppliers_by_ids_util(parse_batch_ids(batch.ids), query_fields(Supplier, SupplierResponse, fields), db=db), fields, SupplierFields)
 
-@router.get("/id/{supplier_id}")
-def get_supplier_by_id(supplier_id: int, db: Session = Depends(get_db)) -> SupplierResponse:
+@router.get("/id/{supplier_id}", response_model_exclude_unset=True, dependencies=[conditional_get(Supplier.__tablename__)])
+def get_supplier_by_id(supplier_id: int, background_tasks: BackgroundTasks, fields: list = Depends(get_fields), db: Session = Depends(get_db)) -> SupplierFields:
     """
     Obtém um fornecedor pelo seu ID.
+    `fields=a,b` restringe o SELECT e a resposta a esses campos (o id sempre vem); cada combinação tem a sua entrada no cache.
+    """
+    fields = select_fields(Supplier, SupplierResponse, fields)
+    return cached_json_response(
+        dimension_cache,
+        key=(Supplier.__tablename__, supplier_id, ",".join(fields)),
+        tables=(Supplier.__tablename__,),
+        compute=lambda session: build_supplier_by_id(supplier_id, fields, session),
+        db=db,
+        background_tasks=background_tasks,
+    )
+
+def build_supplier_by_id(supplier_id: int, fields: list, db: Session) -> dict:
+    """
+    Fornecedor por id, só com `fields`, sem cache.
     """
-    supplier = get_supplier_by_id_util(supplier_id, db)
+    supplier = get_supplier_by_id_util(supplier_id, query_fields(Supplier, SupplierResponse, fields), db=db)
     if not supplier:
         raise HTTPException(status_code=404, detail=f"Não foi possível encontrar o fornecedor pelo seu ID")
-    return SupplierResponse.model_validate(supplier.__dict__)
+    return project(supplier, fields, SupplierFields).model_dump(exclude_unset=True)
 
 @router.get("/name/{supplier_name}")
 def get_supplier_by_name(supplier_name: str, db: Session = Depends(get_db)) -> SupplierResponse:
@@ -50,10 +102,57 @@ def create_supplier(supplier: SupplierRequest, db: Session = Depends(get_db)) ->
     """
     new_supplier = Supplier(**supplier.model_dump())
     db.add(new_supplier)
+    db.flush()
+
+    refresh_supplier_rollups_util({new_supplier.supplier_id}, db=db)
     db.commit()
     db.refresh(new_supplier)
     return SupplierResponse(**new_supplier.__dict__)
 
+@router.post("/bulk", status_code=201)
+def create_suppliers_bulk(body: bytes = Depends(read_bulk_body), atomic: bool = False, db: Session = Depends(get_db)) -> BulkCreateResponse:
+    """
+    Cria vários fornecedores em uma única transação, a partir de uma lista JSON no corpo.
+    Linhas inválidas são reportadas pela posição e as demais são gravadas; com `atomic`, qualquer erro recusa a carga inteira.
+    """
+    result = bulk_create_util(Supplier, SupplierRequest, body, atomic=atomic, db=db)
+    refresh_supplier_rollups_util(set(result.ids), db=db)
+    db.commit()
+    return result
+
+@router.patch("/bulk")
+def update_suppliers_bulk(bulk: BulkUpdateRequest[SupplierUpdate], dry_run: bool = False, db: Session = Depends(get_db)) -> BulkWriteResponse:
+    """
+    Aplica o mesmo patch aos fornecedores de `ids` e/ou que satisfazem `where` (igualdade por campo), em um único UPDATE.
+    Com `dry_run`, apenas conta as linhas que seriam alteradas.
+    """
+    patch = bulk_patch_util(bulk.patch)
+    criteria = bulk_criteria_util(Supplier, SupplierResponse, bulk.ids, bulk.where)
+    if dry_run:
+        return BulkWriteResponse(matched=bulk_count_util(Supplier, criteria, db=db), dry_run=True)
+
+    supplier_ids = {row.supplier_id for row in db.query(Supplier.supplier_id).filter(*criteria)}
+    matched = bulk_update_util(Supplier, criteria, patch, db=db)
+    refresh_supplier_rollups_util(supplier_ids, db=db)
+    db.commit()
+    return BulkWriteResponse(matched=matched, dry_run=False)
+
+@router.delete("/bulk")
+def delete_suppliers_bulk(bulk: BulkDeleteRequest, dry_run: bool = False, db: Session = Depends(get_db)) -> BulkWriteResponse:
+    """
+    Deleta os fornecedores de `ids` e/ou que satisfazem `where` em um único DELETE.
+    Com `dry_run`, apenas conta as linhas que seriam removidas.
+    """
+    criteria = bulk_criteria_util(Supplier, SupplierResponse, bulk.ids, bulk.where)
+    if dry_run:
+        return BulkWriteResponse(matched=bulk_count_util(Supplier, criteria, db=db), dry_run=True)
+
+    supplier_ids = {row.supplier_id for row in db.query(Supplier.supplier_id).filter(*criteria)}
+    matched = bulk_delete_util(Supplier, criteria, db=db)
+    refresh_supplier_rollups_util(supplier_ids, db=db)
+    db.commit()
+    return BulkWriteResponse(matched=matched, dry_run=False)
+
 @router.put("/id/{supplier_id}")
 def update_supplier(supplier: SupplierUpdate, supplier_id: int, db: Session = Depends(get_db)) -> SupplierResponse:
     """
@@ -66,6 +165,7 @@ def update_supplier(supplier: SupplierUpdate, supplier_id: int, db: Session = De
     if not rows_updated:
         raise HTTPException(status_code=404, detail=f"Não foi possível atualizar o fornecedor")
     
+    refresh_supplier_rollups_util({supplier_id}, db=db)
     db.commit()
     updated_part = get_supplier_by_id_util(supplier_id, db=db)
 
@@ -86,9 +186,12 @@ def delete_supplier(supplier: SupplierDelete, db: Session = Depends(get_db)) ->
 
     response_data = SupplierResponse.model_validate(supplier_to_delete.__dict__)
     
+    supplier_ids = {row.supplier_id for row in db.query(Supplier.supplier_id).filter(Supplier.supplier_name == supplier.supplier_name)}
     deleted_part = delete_supplier_by_name(supplier.supplier_name, db=db)
     
     if not deleted_part:
         raise HTTPException(status_code=500, detail="Falha ao excluir o fornecedor")
     
+    refresh_supplier_rollups_util(supplier_ids, db=db)
+    db.commit()
     return response_data
\ No newline at end of file
@@ -1,30 +1,81 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from app.configs.cache import cached_json_response, dimension_cache
+from app.configs.batch import build_batch, get_batch_ids, parse_batch_ids
+from app.configs.conditional import conditional_get
 from app.configs.database import get_db
+from app.configs.fields import get_fields, project, query_fields, select_fields
+from app.configs.export import export_media_type, stream_table_response
+from app.configs.pagination import PageParams, decode_cursor, get_page_params, page_response
 from app.models.model_vehicle import Vehicle
-from app.schemas.vehicle import VehicleDelete, VehicleRequest, VehicleResponse, VehicleUpdate
-from app.utils.vehicle import delete_vehicle_by_id_util, get_all_vehicles_util, get_vehicle_by_id_util, get_vehicle_by_model_util, get_vehicle_by_propulsion_util, get_vehicle_by_year_util, update_vehicle_by_id_util
+from app.models.model_warranty import Warranty
+from app.schemas.vehicle import VehicleDelete, VehicleFields, VehicleRequest, VehicleResponse, VehicleUpdate
+from app.schemas.batch import BatchGetRequest, BatchResponse
+from app.schemas.bulk import BulkCreateResponse, BulkDeleteRequest, BulkUpdateRequest, BulkWriteResponse
+from app.schemas.pagination import Page
+from app.utils.rollup import refresh_warranty_rollups_util, warranty_partitions_util
+from app.utils.vehicle import delete_vehicle_by_id_util, get_vehicles_by_ids_util, get_vehicles_page_util, get_vehicle_by_id_util, get_vehicle_by_model_util, get_vehicle_by_propulsion_util, get_vehicle_by_year_util, update_vehicle_by_id_util
+from app.utils.bulk import bulk_count_util, bulk_create_util, bulk_criteria_util, bulk_delete_util, bulk_patch_util, bulk_update_util, chunked, read_bulk_body
 
 router = APIRouter(prefix="/vehicle", tags=["vehicle"])
 
-@router.get("/")
-def list_vehicle(db: Session = Depends(get_db)) -> list[VehicleResponse]:
+@router.get("/", dependencies=[conditional_get(Vehicle.__tablename__)])
+def list_vehicle(request: Request, page: PageParams = Depends(get_page_params), fields: list = Depends(get_fields), db: Session = Depends(get_db)) -> Page[VehicleFields]:
     """
-    Lista todos os veículos do banco de dados.
+    Lista os veículos do banco de dados, em páginas ordenadas pelo id.
+    Com `Accept: application/x-ndjson` ou `text/csv`, exporta a tabela inteira em streaming.
+    `fields=a,b` restringe o SELECT e a resposta a esses campos (o id sempre vem).
     """
-    all_vehicles = get_all_vehicles_util(db=db)
-    return [VehicleResponse.model_validate(vehicle.__dict__) for vehicle in all_vehicles]
+    fields = select_fields(Vehicle, VehicleResponse, fields)
+    media_type = export_media_type(request)
+    if media_type is not None:
+        return stream_table_response(Vehicle, fields, media_type)
+    after = decode_cursor(Vehicle.__tablename__, page.cursor)
+    return page_response(Vehicle, fields, get_vehicles_page_util(fields, after, page.limit, db=db), page.limit)
 
-@router.get("/id/{vehicle_id}")
-def get_vehicle_by_id(vehicle_id:str, db: Session = Depends(get_db)) -> VehicleResponse:
+@router.get("/batch", response_model_exclude_unset=True, dependencies=[conditional_get(Vehicle.__tablename__)])
+def get_vehicles_batch(ids: list = Depends(get_batch_ids), fields: list = Depends(get_fields), db: Session = Depends(get_db)) -> BatchResponse[VehicleFields]:
+    """
+    Obtém vários veículos pelos ids (`?ids=1,2,3`) com uma única consulta, na ordem pedida.
+    Ids inexistentes são listados em `missing`.
+    """
+    fields = select_fields(Vehicle, VehicleResponse, fields)
+    return build_batch(get_vehicles_by_ids_util(ids, query_fields(Vehicle, VehicleResponse, fields), db=db), fields, VehicleFields)
+
+@router.post("/batch", response_model_exclude_unset=True)
+def post_vehicles_batch(batch: BatchGetRequest, fields: list = Depends(get_fields), db: Session = Depends(get_db)) -> BatchResponse[VehicleFields]:
+    """
+    Como `GET /batch`, com os ids no corpo, para listas longas demais para a URL.
+    """
+    fields = select_fields(Vehicle, VehicleResponse, fields)
+    return build_batch(get_vehicles_by_ids_util(parse_batch_ids(batch.ids), query_fields(Vehicle, VehicleResponse, fields), db=db), fields, VehicleFields)
+
+@router.get("/id/{vehicle_id}", response_model_exclude_unset=True, dependencies=[conditional_get(Vehicle.__tablename__)])
+def get_vehicle_by_id(vehicle_id: str, background_tasks: BackgroundTasks, fields: list = Depends(get_fields), db: Session = Depends(get_db)) -> VehicleFields:
     """
     Obtém um veículo pelo seu ID.
+    `fields=a,b` restringe o SELECT e a resposta a esses campos (o id sempre vem); cada combinação tem a sua entrada no cache.
     """
-    vehicle = get_vehicle_by_id_util(vehicle_id, db=db)
+    fields = select_fields(Vehicle, VehicleResponse, fields)
+    return cached_json_response(
+        dimension_cache,
+        key=(Vehicle.__tablename__, vehicle_id, ",".join(fields)),
+        tables=(Vehicle.__tablename__,),
+        compute=lambda session: build_vehicle_by_id(vehicle_id, fields, session),
+        db=db,
+        background_tasks=background_tasks,
+    )
+
+def build_vehicle_by_id(vehicle_id: str, fields: list, db: Session) -> dict:
+    """
+    Veículo por id, só com `fields`, sem cache.
+    """
+    vehicle = get_vehicle_by_id_util(vehicle_id, query_fields(Vehicle, VehicleResponse, fields), db=db)
     if not vehicle:
         raise HTTPException(status_code=404, detail=f"Nenhum carro encontrada com esse id '{vehicle_id}'")
-    return VehicleResponse.model_validate(vehicle.__dict__)
+    return project(vehicle, fields, VehicleFields).model_dump(exclude_unset=True)
 
 @router.get("/model/{vehicle_model}")
 def get_vehicle_by_model(vehicle_model:str, db: Session = Depends(get_db)) -> list[VehicleResponse]:
@@ -60,10 +111,63 @@ def create_vehicle(vehicle: VehicleRequest, db: Session = Depends(get_db)) -> Ve
     """
     new_vehicle = Vehicle(**vehicle.model_dump())
     db.add(new_vehicle)
+    db.flush()
+
+    # Garantias já registradas para este id passam a ter modelo e propulsão
+    refresh_warranty_rollups_util(warranty_partitions_util(Warranty.vehicle_id == new_vehicle.vehicle_id, db=db), db=db)
     db.commit()
     db.refresh(new_vehicle)
     return VehicleResponse(**new_vehicle.__dict__)
 
+@router.post("/bulk", status_code=201)
+def create_vehicles_bulk(body: bytes = Depends(read_bulk_body), atomic: bool = False, db: Session = Depends(get_db)) -> BulkCreateResponse:
+    """
+    Cria vários veículos em uma única transação, a partir de uma lista JSON no corpo.
+    Linhas inválidas são reportadas pela posição e as demais são gravadas; com `atomic`, qualquer erro recusa a carga inteira.
+    """
+    result = bulk_create_util(Vehicle, VehicleRequest, body, atomic=atomic, db=db)
+    # Garantias já registradas para esses ids passam a ter modelo e propulsão
+    partitions = set()
+    for ids in chunked(result.ids):
+        partitions |= warranty_partitions_util(Warranty.vehicle_id.in_(ids), db=db)
+    refresh_warranty_rollups_util(partitions, db=db)
+    db.commit()
+    return result
+
+@router.patch("/bulk")
+def update_vehicles_bulk(bulk: BulkUpdateRequest[VehicleUpdate], dry_run: bool = False, db: Session = Depends(get_db)) -> BulkWriteResponse:
+    """
+    Aplica o mesmo patch aos veículos de `ids` e/ou que satisfazem `where` (igualdade por campo), em um único UPDATE.
+    Com `dry_run`, apenas conta as linhas que seriam alteradas.
+    """
+    patch = bulk_patch_util(bulk.patch)
+    criteria = bulk_criteria_util(Vehicle, VehicleResponse, bulk.ids, bulk.where)
+    if dry_run:
+        return BulkWriteResponse(matched=bulk_count_util(Vehicle, criteria, db=db), dry_run=True)
+
+    # Modelo e propulsão fazem parte da chave das rollups de garantias
+    partitions = warranty_partitions_util(Warranty.vehicle_id.in_(select(Vehicle.vehicle_id).where(*criteria)), db=db)
+    matched = bulk_update_util(Vehicle, criteria, patch, db=db)
+    refresh_warranty_rollups_util(partitions, db=db)
+    db.commit()
+    return BulkWriteResponse(matched=matched, dry_run=False)
+
+@router.delete("/bulk")
+def delete_vehicles_bulk(bulk: BulkDeleteRequest, dry_run: bool = False, db: Session = Depends(get_db)) -> BulkWriteResponse:
+    """
+    Deleta os veículos de `ids` e/ou que satisfazem `where` em um único DELETE.
+    Com `dry_run`, apenas conta as linhas que seriam removidas.
+    """
+    criteria = bulk_criteria_util(Vehicle, VehicleResponse, bulk.ids, bulk.where)
+    if dry_run:
+        return BulkWriteResponse(matched=bulk_count_util(Vehicle, criteria, db=db), dry_run=True)
+
+    partitions = warranty_partitions_util(Warranty.vehicle_id.in_(select(Vehicle.vehicle_id).where(*criteria)), db=db)
+    matched = bulk_delete_util(Vehicle, criteria, db=db)
+    refresh_warranty_rollups_util(partitions, db=db)
+    db.commit()
+    return BulkWriteResponse(matched=matched, dry_run=False)
+
 @router.put("/id/{vehicle_id}")
 def update_vehicle(vehicle: VehicleUpdate, vehicle_id: int, db: Session = Depends(get_db)) -> VehicleResponse:
     """
@@ -76,6 +180,8 @@ def update_vehicle(vehicle: VehicleUpdate, vehicle_id: int, db: Session = Depend
     if not rows_updated:
         raise HTTPException(status_code=404, detail=f"Não foi possível atualizar o veículo")
     
+    # Modelo e propulsão fazem parte da chave das rollups de garantias
+    refresh_warranty_rollups_util(warranty_partitions_util(Warranty.vehicle_id == vehicle_id, db=db), db=db)
     db.commit()
     updated_vehicle = get_vehicle_by_id_util(vehicle_id, db=db)
 
@@ -101,4 +207,6 @@ def delete_vehicle(vehicle: VehicleDelete, db: Session = Depends(get_db)) -> Veh
     if not deleted_vehicle:
         raise HTTPException(status_code=500, detail="Falha ao excluir a veículo")
     
+    refresh_warranty_rollups_util(warranty_partitions_util(Warranty.vehicle_id == vehicle.vehicle_id, db=db), db=db)
+    db.commit()
     return response_data
\ No newline at end of file
@@ -1,31 +1,68 @@
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, UploadFile
 from sqlalchemy.orm import Session
 
+from app.configs.batch import build_batch, get_batch_ids, parse_batch_ids
+from app.configs.conditional import conditional_get
 from app.configs.database import get_db
+from app.configs.fields import get_fields, project, select_fields
+from app.configs.export import export_media_type, stream_table_response
+from app.configs.pagination import PageParams, decode_cursor, get_page_params, page_response
 from app.models.model_warranty import Warranty
-from app.schemas.warranty import WarrantyDelete, WarrantyRequest, WarrantyResponse, WarrantyUpdate
-from app.utils.warranty import delete_warranty_by_id_util, get_all_warranties_util, get_warranty_by_id_util, update_warranty_by_id_util
+from app.schemas.warranty import WarrantyDelete, WarrantyFields, WarrantyRequest, WarrantyResponse, WarrantyUpdate
+from app.schemas.batch import BatchGetRequest, BatchResponse
+from app.schemas.bulk import BulkCreateResponse, BulkDeleteRequest, BulkUpdateRequest, BulkWriteResponse
+from app.schemas.ingest import IngestFormatEnum, IngestReport
+from app.schemas.pagination import Page
+from app.utils.rollup import patched_partitions_util, refresh_warranty_rollups_util, warranty_partitions_util
+from app.utils.warranty import delete_warranty_by_id_util, get_warranties_by_ids_util, get_warranties_page_util, get_warranty_by_id_util, update_warranty_by_id_util
+from app.utils.bulk import bulk_count_util, bulk_create_util, bulk_criteria_util, bulk_delete_util, bulk_patch_util, bulk_update_util, chunked, read_bulk_body
+from app.utils.ingest import ingest_file_util, ingest_format
 
 router = APIRouter(prefix="/warranty", tags=["warranty"])
 
-@router.get("/")
-def list_warranties(db: Session = Depends(get_db)) -> list[WarrantyResponse]:
+@router.get("/", dependencies=[conditional_get(Warranty.__tablename__)])
+def list_warranties(request: Request, page: PageParams = Depends(get_page_params), fields: list = Depends(get_fields), db: Session = Depends(get_db)) -> Page[WarrantyFields]:
     """
-    Lista todas as garantias.
+    Lista as garantias, em páginas ordenadas pelo id.
+    Com `Accept: application/x-ndjson` ou `text/csv`, exporta a tabela inteira em streaming.
+    `fields=a,b` restringe o SELECT e a resposta a esses campos (o id sempre vem); os comentários só vêm quando pedidos ou com `fields=*`.
     """
-    all_warranties = get_all_warranties_util(db=db)
-    return [WarrantyResponse.model_validate(warranty.__dict__) for warranty in all_warranties]
+    fields = select_fields(Warranty, WarrantyResponse, fields)
+    media_type = export_media_type(request)
+    if media_type is not None:
+        return stream_table_response(Warranty, fields, media_type)
+    after = decode_cursor(Warranty.__tablename__, page.cursor)
+    return page_response(Warranty, fields, get_warranties_page_util(fields, after, page.limit, db=db), page.limit)
 
-@router.get("/id/{warranty_id}")
-def get_warranties_by_id(claim_key:str, db: Session = Depends(get_db)) -> WarrantyResponse:
+@router.get("/batch", response_model_exclude_unset=True, dependencies=[conditional_get(Warranty.__tablename__)])
+def get_warranties_batch(ids: list = Depends(get_batch_ids), fields: list = Depends(get_fields), db: Session = Depends(get_db)) -> BatchResponse[WarrantyFields]:
+    """
+    Obtém várias garantias pelos ids (`?ids=1,2,3`) com uma única consulta, na ordem pedida.
+    Ids inexistentes são listados em `missing`.
+    """
+    fields = select_fields(Warranty, WarrantyResponse, fields)
+    return build_batch(get_warranties_by_ids_util(ids, fields, db=db), fields, WarrantyFields)
+
+@router.post("/batch", response_model_exclude_unset=True)
+def post_warranties_batch(batch: BatchGetRequest, fields: list = Depends(get_fields), db: Session = Depends(get_db)) -> BatchResponse[WarrantyFields]:
+    """
+    Como `GET /batch`, com os ids no corpo, para listas longas demais para a URL.
+    """
+    fields = select_fields(Warranty, WarrantyResponse, fields)
+    return build_batch(get_warranties_by_ids_util(parse_batch_ids(batch.ids), fields, db=db), fields, WarrantyFields)
+
+@router.get("/id/{warranty_id}", response_model_exclude_unset=True, dependencies=[conditional_get(Warranty.__tablename__)])
+def get_warranties_by_id(claim_key:str, fields: list = Depends(get_fields), db: Session = Depends(get_db)) -> WarrantyFields:
     """
     Obtém garantia pelo seu ID.
+    Os comentários só vêm quando pedidos em `fields` (ou com `fields=*`).
     """
-    warranty = get_warranty_by_id_util(claim_key, db=db)
+    fields = select_fields(Warranty, WarrantyResponse, fields)
+    warranty = get_warranty_by_id_util(claim_key, fields, db=db)
     if not warranty:
         raise HTTPException(status_code=404, detail=f"Nenhuma garantia encontrada com esse id '{claim_key}'")
-    return WarrantyResponse(**warranty.__dict__)
+    return project(warranty, fields, WarrantyFields)
 
 @router.post("/")
 def create_warranty(warranty: WarrantyRequest,  db: Session = Depends(get_db)) -> WarrantyResponse:
@@ -34,9 +71,74 @@ def create_warranty(warranty: WarrantyRequest,  db: Session = Depends(get_db)) -
     """
     new_warranty = Warranty(**warranty.model_dump())
     db.add(new_warranty)
+    db.flush()
+
+    # Mantém as rollups de garantias na mesma transação da escrita
+    refresh_warranty_rollups_util(warranty_partitions_util(Warranty.claim_key == new_warranty.claim_key, db=db), db=db)
     db.commit()
     db.refresh(new_warranty)
-    return WarrantyResponse(**new_warranty.__dict__)
+    # Por atributo, e não por __dict__, para carregar os comentários adiados
+    return WarrantyResponse.model_validate(new_warranty, from_attributes=True)
+
+@router.post("/bulk", status_code=201)
+def create_warranties_bulk(body: bytes = Depends(read_bulk_body), atomic: bool = False, db: Session = Depends(get_db)) -> BulkCreateResponse:
+    """
+    Cria várias garantias em uma única transação, a partir de uma lista JSON no corpo.
+    Linhas inválidas são reportadas pela posição e as demais são gravadas; com `atomic`, qualquer erro recusa a carga inteira.
+    """
+    result = bulk_create_util(Warranty, WarrantyRequest, body, atomic=atomic, db=db)
+    # Rollups de garantias, uma vez para a carga inteira
+    partitions = set()
+    for ids in chunked(result.ids):
+        partitions |= warranty_partitions_util(Warranty.claim_key.in_(ids), db=db)
+    refresh_warranty_rollups_util(partitions, db=db)
+    db.commit()
+    return result
+
+@router.post("/ingest")
+def ingest_warranties(file: UploadFile, file_format: IngestFormatEnum = Query(default=None, alias="format"), db: Session = Depends(get_db)) -> IngestReport:
+    """
+    Carrega um arquivo CSV ou NDJSON de garantias, lido e gravado em lotes em uma única transação.
+    O formato vem da extensão do arquivo ou de `format`; o relatório traz as linhas recusadas e a vazão.
+    """
+    report = ingest_file_util("warranty", file.file, file_format or ingest_format(file.filename, file.content_type), db=db)
+    db.commit()
+    return report
+
+@router.patch("/bulk")
+def update_warranties_bulk(bulk: BulkUpdateRequest[WarrantyUpdate], dry_run: bool = False, db: Session = Depends(get_db)) -> BulkWriteResponse:
+    """
+    Aplica o mesmo patch às garantias de `ids` e/ou que satisfazem `where` (igualdade por campo), em um único UPDATE.
+    Com `dry_run`, apenas conta as linhas que seriam alteradas.
+    """
+    patch = bulk_patch_util(bulk.patch)
+    criteria = bulk_criteria_util(Warranty, WarrantyResponse, bulk.ids, bulk.where)
+    if dry_run:
+        return BulkWriteResponse(matched=bulk_count_util(Warranty, criteria, db=db), dry_run=True)
+
+    partitions = warranty_partitions_util(*criteria, db=db)
+    matched = bulk_update_util(Warranty, criteria, patch, db=db)
+    # Partições antigas e novas, caso a peça ou a data de reparo tenham mudado
+    partitions |= patched_partitions_util(partitions, patch, "repair_date")
+    refresh_warranty_rollups_util(partitions, db=db)
+    db.commit()
+    return BulkWriteResponse(matched=matched, dry_run=False)
+
+@router.delete("/bulk")
+def delete_warranties_bulk(bulk: BulkDeleteRequest, dry_run: bool = False, db: Session = Depends(get_db)) -> BulkWriteResponse:
+    """
+    Deleta as garantias de `ids` e/ou que satisfazem `where` em um único DELETE.
+    Com `dry_run`, apenas conta as linhas que seriam removidas.
+    """
+    criteria = bulk_criteria_util(Warranty, WarrantyResponse, bulk.ids, bulk.where)
+    if dry_run:
+        return BulkWriteResponse(matched=bulk_count_util(Warranty, criteria, db=db), dry_run=True)
+
+    partitions = warranty_partitions_util(*criteria, db=db)
+    matched = bulk_delete_util(Warranty, criteria, db=db)
+    refresh_warranty_rollups_util(partitions, db=db)
+    db.commit()
+    return BulkWriteResponse(matched=matched, dry_run=False)
 
 @router.put("/id/{warranty_id}")
 def update_warranty(warranty: WarrantyUpdate, claim_key: int, db: Session = Depends(get_db)) -> WarrantyResponse:
@@ -45,18 +147,22 @@ def update_warranty(warranty: WarrantyUpdate, claim_key: int, db: Session = Depe
     """
     update_data = warranty.model_dump()
     update_data["claim_key"] = claim_key
+    partitions = warranty_partitions_util(Warranty.claim_key == claim_key, db=db)
     rows_updated = update_warranty_by_id_util(**update_data, db=db)
 
     if not rows_updated:
         raise HTTPException(status_code=404, detail=f"Não foi possível atualizar a garantia")
     
+    # Partições antigas e novas, caso a peça ou a data de reparo tenham mudado
+    partitions |= warranty_partitions_util(Warranty.claim_key == claim_key, db=db)
+    refresh_warranty_rollups_util(partitions, db=db)
     db.commit()
     updated_location = get_warranty_by_id_util(claim_key, db=db)
 
     if not updated_location:
         raise HTTPException(status_code=404, detail=f"Não foi possível encontrar garantia após atualização")
     
-    return WarrantyResponse.model_validate(updated_location.__dict__)
+    return WarrantyResponse.model_validate(updated_location, from_attributes=True)
 
 @router.delete("/id/{warranty_id}")
 def delete_warranty(warranty: WarrantyDelete, db: Session = Depends(get_db)) -> WarrantyResponse:
@@ -66,13 +172,16 @@ def delete_warranty(warranty: WarrantyDelete, db: Session = Depends(get_db)) ->
     warranty_to_delete = get_warranty_by_id_util(warranty.claim_key, db=db)
     
     if not warranty_to_delete:
-        raise HTTPException(status_code=404, detail=f"Garantia com esse id '{warranty_to_delete.claim_key}' não encontrada")
+        raise HTTPException(status_code=404, detail=f"Garantia com esse id '{warranty.claim_key}' não encontrada")
     
-    response_data = WarrantyResponse.model_validate(warranty_to_delete.__dict__)
+    response_data = WarrantyResponse.model_validate(warranty_to_delete, from_attributes=True)
 
+    partitions = warranty_partitions_util(Warranty.claim_key == warranty.claim_key, db=db)
     deleted_location = delete_warranty_by_id_util(warranty.claim_key, db=db)
 
     if not deleted_location:
         raise HTTPException(status_code=500, detail="Falha ao excluir a garantia")
     
+    refresh_warranty_rollups_util(partitions, db=db)
+    db.commit()
     return response_data
\ No newline at end of file
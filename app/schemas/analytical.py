@@ -1,8 +1,34 @@
 # Classes auxiliares para respostas
-from typing import List
+from datetime import datetime
+from enum import Enum
+from typing import List, Optional
 from pydantic import BaseModel
 from app.schemas.location import MarketEnum
 
+class AnalyticsSourceEnum(str, Enum):
+    auto = 'auto'
+    snapshot = 'snapshot'
+    db = 'db'
+
+class TimeWindow(BaseModel):
+    """Intervalo [start, end) aplicado às datas dos fatos; limites ausentes ficam em aberto"""
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    last_days: Optional[int] = None
+
+    @property
+    def bounded(self) -> bool:
+        return self.start is not None or self.end is not None
+
+    def cache_key(self) -> tuple:
+        # Vazio sem intervalo, para que as chaves das análises completas não mudem
+        if not self.bounded:
+            return ()
+        return (self.start.isoformat() if self.start else "", self.end.isoformat() if self.end else "")
+
+    def describe(self) -> dict:
+        return {"from": self.start, "to": self.end, "last_days": self.last_days}
+
 class SupplierAnalytics(BaseModel):
     supplier_id: int
     supplier_name: str
@@ -25,4 +51,22 @@ class ProvinceAnalytics(BaseModel):
     bulk_percentage: float
     warranty_percentage: float
     suppliers_by_market: dict
-    top_suppliers: List[SupplierAnalytics]
\ No newline at end of file
+    top_suppliers: List[SupplierAnalytics]
+    window: Optional[dict] = None
+class CubeDimensionEnum(str, Enum):
+    market = 'market'
+    country = 'country'
+    province = 'province'
+    supplier = 'supplier'
+    part = 'part'
+    model = 'model'
+    propulsion = 'propulsion'
+    year = 'year'
+    repair_month = 'repair_month'
+    classified_failured = 'classified_failured'
+
+class CubeMeasureEnum(str, Enum):
+    claims = 'claims'
+    vehicles = 'vehicles'
+    purchases = 'purchases'
+    avg_days_to_failure = 'avg_days_to_failure'
@@ -0,0 +1,11 @@
+from typing import Generic, TypeVar
+from pydantic import BaseModel
+
+T = TypeVar("T")
+
+class BatchGetRequest(BaseModel):
+    ids: list[int]
+
+class BatchResponse(BaseModel, Generic[T]):
+    items: list[T]
+    missing: list[int]
@@ -0,0 +1,26 @@
+from typing import Generic, Optional, TypeVar
+from pydantic import BaseModel
+
+T = TypeVar("T")
+
+class BulkRowError(BaseModel):
+    index: int
+    errors: list[dict]
+
+class BulkCreateResponse(BaseModel):
+    created: int
+    ids: list[int]
+    errors: list[BulkRowError]
+
+class BulkUpdateRequest(BaseModel, Generic[T]):
+    ids: Optional[list[int]] = None
+    where: dict = {}
+    patch: T
+
+class BulkDeleteRequest(BaseModel):
+    ids: Optional[list[int]] = None
+    where: dict = {}
+
+class BulkWriteResponse(BaseModel):
+    matched: int
+    dry_run: bool
@@ -0,0 +1,14 @@
+from functools import lru_cache
+from typing import Optional
+from pydantic import create_model
+
+@lru_cache
+def partial_model(response_model):
+    """
+    `response_model` com todos os campos opcionais, para as respostas com `fields`.
+    As rotas usam `response_model_exclude_unset=True`: só os campos carregados aparecem no JSON.
+    """
+    return create_model(
+        f"{response_model.__name__}Fields",
+        **{name: (Optional[field.annotation], None) for name, field in response_model.model_fields.items()},
+    )
@@ -0,0 +1,19 @@
+from enum import Enum
+from pydantic import BaseModel
+
+class IngestFormatEnum(str, Enum):
+    csv = 'csv'
+    ndjson = 'ndjson'
+
+class IngestRowError(BaseModel):
+    line: int
+    errors: list[dict]
+
+class IngestReport(BaseModel):
+    rows: int
+    loaded: int
+    rejected: int
+    seconds: float
+    rows_per_second: float
+    errors: list[IngestRowError]
+    errors_truncated: bool
@@ -2,6 +2,8 @@ from enum import Enum
 from typing import Optional
 from pydantic import BaseModel
 
+from app.schemas.fields import partial_model
+
 class MarketEnum(str, Enum):
     north_america = "north_america"
     south_america = "south_america"
@@ -23,6 +25,9 @@ class LocationResponse(BaseModel):
     province: str
     city: str
 
+# Resposta com apenas os campos pedidos em `fields`
+LocationFields = partial_model(LocationResponse)
+
 class LocationRequest(BaseModel):
     market: MarketEnum
     country: str
@@ -1,12 +1,17 @@
 from typing import Optional
 from pydantic import BaseModel
 
+from app.schemas.fields import partial_model
+
 class PartResponse(BaseModel):
     part_id: int
     part_name: str
     last_id_purchase: int
     supplier_id: int
 
+# Resposta com apenas os campos pedidos em `fields`
+PartFields = partial_model(PartResponse)
+
 class PartRequest(BaseModel):
     part_name: str
     last_id_purchase: int
@@ -3,6 +3,8 @@ from enum import Enum
 from typing import Optional
 from pydantic import BaseModel
 
+from app.schemas.fields import partial_model
+
 class PurchaseEnum(str, Enum):
     bulk = 'bulk'
     warranty = 'warranty'
@@ -13,6 +15,9 @@ class PurchaseResponse(BaseModel):
     purchase_date: datetime
     part_id: int
 
+# Resposta com apenas os campos pedidos em `fields`
+PurchaseFields = partial_model(PurchaseResponse)
+
 class PurchaseRequest(BaseModel):
     purchase_type: PurchaseEnum
     purchase_date: datetime
@@ -1,12 +1,17 @@
 from typing import Optional
 from pydantic import BaseModel
 
+from app.schemas.fields import partial_model
+
 class SupplierResponse(BaseModel):
     supplier_id: int
     supplier_name: str
     supplier_cpf: str
     location_id: int
 
+# Resposta com apenas os campos pedidos em `fields`
+SupplierFields = partial_model(SupplierResponse)
+
 class SupplierRequest(BaseModel):
     supplier_name: str
     supplier_cpf: str
@@ -3,6 +3,8 @@ from enum import Enum
 from typing import Optional
 from pydantic import BaseModel
 
+from app.schemas.fields import partial_model
+
 
 class PropulsionEnum(str, Enum):
     eletric = 'eletric'
@@ -16,6 +18,9 @@ class VehicleResponse(BaseModel):
     year: int
     propulsion: PropulsionEnum
 
+# Resposta com apenas os campos pedidos em `fields`
+VehicleFields = partial_model(VehicleResponse)
+
 class VehicleRequest(BaseModel):
     model: str
     prod_date: datetime
@@ -2,6 +2,8 @@ from datetime import datetime
 from typing import Optional
 from pydantic import BaseModel
 
+from app.schemas.fields import partial_model
+
 class WarrantyResponse(BaseModel):
     vehicle_id: int
     claim_key: int
@@ -13,6 +15,9 @@ class WarrantyResponse(BaseModel):
     location_id: int
     purchase_id: int
 
+# Resposta com apenas os campos pedidos em `fields`
+WarrantyFields = partial_model(WarrantyResponse)
+
 class WarrantyRequest(BaseModel):
     vehicle_id: int
     repair_date: datetime
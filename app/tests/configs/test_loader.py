@@ -0,0 +1,130 @@
+from datetime import datetime
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+import pytest
+import os
+
+from app.configs.auth import get_current_active_user
+from app.configs.database import get_db, engine as app_engine
+from app.configs.loader import BatchLoader, get_batch_loader
+from app.configs.config import configurar_banco
+from app.main import app
+from app.models.model_user import User
+from app.schemas.user import IsActiveEnum
+from app.utils.supplier import get_supplier_by_id_util, get_suppliers_by_ids_util
+
+client = TestClient(app)
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+os.environ["DATABASE_URL"] = SQLALCHEMY_DATABASE_URL
+os.environ['TEST_DATABASE'] = 'true'
+
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+app.dependency_overrides[get_db] = override_get_db
+
+@pytest.fixture
+def mock_user():
+    user = User(
+        user_id=1,
+        user_name="felipeteste",
+        email="teste@gmail.com.br",
+        password="hashed_password",  # Não importa para o teste
+        cpf="12345678910",
+        created_at=datetime.now(),
+        updated_at=datetime.now(),
+        is_active=IsActiveEnum.active,
+        role="admin"
+    )
+    return user
+
+# Sobrescrever a dependência para os testes
+@pytest.fixture(autouse=True)
+def override_dependency(mock_user):
+    # Substitui a função get_current_active_user pelo mock
+    app.dependency_overrides[get_current_active_user] = lambda: mock_user
+    yield
+    # Limpar após os testes
+    app.dependency_overrides.clear()
+
+def test_batch_loader_resolves_keys_with_one_query_per_entity():
+    configurar_banco(SQLALCHEMY_DATABASE_URL)
+    client.post("location/", json={
+        "market": "latin_america",
+        "country": "Brasil",
+        "province": "Ceará",
+        "city": "Itapajé"
+    })
+    for supplier_name in ["felipe motos", "felipe viagens"]:
+        client.post("/supplier", json={
+            "supplier_name": supplier_name,
+            "supplier_cpf": "12345678910",
+            "location_id": 1
+        })
+
+    statements = []
+
+    def listener(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", listener)
+    db = TestingSessionLocal()
+    try:
+        # Chaves já carregadas na sessão, inclusive as inexistentes, não voltam ao banco
+        suppliers = get_suppliers_by_ids_util([1, 2, 3], db=db)
+        supplier = get_supplier_by_id_util("1", db=db)
+        assert get_supplier_by_id_util(2, db=db).supplier_name == "felipe viagens"
+        assert get_suppliers_by_ids_util([3, 2], db=db) == {3: None, 2: suppliers[2]}
+        assert get_batch_loader(db).batches == 1
+    finally:
+        db.close()
+        event.remove(engine, "before_cursor_execute", listener)
+
+    assert supplier.supplier_name == "felipe motos"
+    assert suppliers[3] is None
+    assert len([statement for statement in statements if "FROM suppliers" in statement]) == 1
+
+def test_batch_and_id_routes_read_default_fields_through_the_loader(monkeypatch):
+    configurar_banco(SQLALCHEMY_DATABASE_URL)
+    client.post("location/", json={"market": "latin_america", "country": "Brasil", "province": "Ceará", "city": "Itapajé"})
+    client.post("/supplier", json={"supplier_name": "felipe motos", "supplier_cpf": "12345678910", "location_id": 1})
+
+    loads = []
+    dispatch = BatchLoader._dispatch
+
+    def recording_dispatch(self, model, keys):
+        loads.append((model.__tablename__, sorted(keys)))
+        dispatch(self, model, keys)
+
+    monkeypatch.setattr(BatchLoader, "_dispatch", recording_dispatch)
+    assert client.get("/supplier/batch", params={"ids": "1,2"}).json()["missing"] == [2]
+    assert client.get("/location/id/1").status_code == 200
+    assert client.get("/purchases/batch", params={"ids": "1"}).status_code == 200
+    assert loads == [("suppliers", [1, 2]), ("locations", [1]), ("purchases", [1])]
+
+    # Com `fields`, a consulta própria restringe o SELECT e o carregador não é usado
+    statements = []
+
+    def listener(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(app_engine, "before_cursor_execute", listener)
+    try:
+        response = client.get("/supplier/batch", params={"ids": "1", "fields": "supplier_name"})
+    finally:
+        event.remove(app_engine, "before_cursor_execute", listener)
+    assert response.json()["items"] == [{"supplier_id": 1, "supplier_name": "felipe motos"}]
+    assert len(loads) == 3
+    assert [statement for statement in statements if "FROM suppliers" in statement and "supplier_cpf" in statement] == []
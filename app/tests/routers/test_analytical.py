@@ -1,16 +1,30 @@
-from datetime import datetime
+from datetime import date, datetime, timedelta
+import asyncio
+import json
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.orm import sessionmaker
+import fakeredis
+import httpx
 import pytest
 import os
 
 from app.configs.auth import get_current_active_user
-from app.configs.database import get_db
+from app.configs.cache import VersionedCache
+from app.configs.cache_backend import MemoryBackend, RedisBackend, TieredBackend
+from app.configs.versions import table_versions
+from app.configs.database import AsyncSessionLocal, SessionLocal as AppSessionLocal, get_db
+from app.configs.fanout import run_concurrently
+from app.configs.snapshot import snapshot_store
 from app.configs.config import configurar_banco
+from app import main
 from app.main import app
+from app.routers import analytical
+from app.models.model_supplier import Supplier
 from app.models.model_user import User
+from app.models.model_warranty import Warranty
 from app.schemas.user import IsActiveEnum
+from app.utils.auth import get_cached_user_by_id_async_util
 
 client = TestClient(app)
 
@@ -57,50 +71,6 @@ def override_dependency(mock_user):
     # Limpar após os testes
     app.dependency_overrides.clear()
 
-def test_create_location():
-    configurar_banco(SQLALCHEMY_DATABASE_URL)
-    new_location = {
-        "market": "latin_america",
-        "country": "Brasil",
-        "province": "Ceará",
-        "city": "Itapajé"
-    }
-    response = client.post("location/", json=new_location)
-    data = response.json()
-    assert response.status_code == 201
-    assert data["market"] == "latin_america"
-    assert data["country"] == "Brasil"
-    assert data["province"] == "Ceará"
-    assert data["city"] == "Itapajé"
-
-def test_create_location_invalid_format_or_not_found_market():
-    configurar_banco(SQLALCHEMY_DATABASE_URL)
-    new_location = {
-        "market": "latin america",
-        "country": "Brasil",
-        "province": "Ceará",
-        "city": "Itapajé"
-    }
-    response = client.post("location/", json=new_location)
-    assert response.status_code == 422
-    assert response.json()["detail"][0]["loc"] == ["body", "market"]
-
-def test_create_supplier():
-    configurar_banco(SQLALCHEMY_DATABASE_URL)
-    new_supplier = {
-        "supplier_name": "felipe motos",
-        "supplier_cpf": "12345678910",
-        "location_id": 1
-    }
-    
-    response = client.post("supplier/", json=new_supplier)
-    
-    assert response.status_code == 200
-    data = response.json()
-    assert data["supplier_name"] == "felipe motos"
-    assert data["supplier_cpf"] == "12345678910"
-    assert data["location_id"] == 1
-
 def test_analytics_supplier_by_province_success():
     configurar_banco(SQLALCHEMY_DATABASE_URL)
     # Locations
@@ -253,9 +223,13 @@ def test_analytics_supplier_by_province_success():
     assert data["province"] == "Ceará"
     assert data["total_suppliers"] == 6
     assert data["total_parts"] == 3
-    assert data["total_purchases"] == 2
-    assert "suppliers_by_market" in data
-    assert "top_suppliers" in data
+    assert data["total_purchases"] == 3
+    assert round(data["bulk_percentage"], 2) == 66.67
+    assert data["suppliers_by_market"] == {"latin_america": 6}
+    assert data["top_suppliers"][0]["supplier_id"] == 1
+    assert data["top_suppliers"][0]["total_parts"] == 2
+    assert data["top_suppliers"][0]["bulk_purchases"] == 2
+    assert data["top_suppliers"][0]["warranty_purchases"] == 1
 
 def test_analytics_supplier_by_province_not_found():
     configurar_banco(SQLALCHEMY_DATABASE_URL)    
@@ -392,6 +366,10 @@ def test_analytics_by_purchase_type_success():
     assert "top_parts" in data
     assert "first_purchase_date" in data
     assert "last_purchase_date" in data
+    assert data["monthly_trend"] == [{"month": "2023-03", "count": 3}, {"month": "2023-10", "count": 1}]
+    assert data["top_parts"][0] == {"part_id": 1, "part_name": "pneu", "count": 2}
+    assert data["first_purchase_date"] == "2023-03-01T00:00:00"
+    assert data["last_purchase_date"] == "2023-10-01T00:00:00"
 
 def test_analytics_by_purchase_type_invalid_format_or_not_found():
     configurar_banco(SQLALCHEMY_DATABASE_URL)
@@ -546,6 +524,11 @@ def test_analytics_by_vehicle_model_success():
     assert "propulsion_stats" in data
     assert "year_distribution" in data
     assert "warranty_stats" in data
+    assert data["warranty_stats"]["total_claims"] == 3
+    assert data["warranty_stats"]["claims_per_vehicle"] == 1.5
+    assert data["warranty_stats"]["top_failing_parts"][0] == {
+        "part_id": 1, "name": "pneu", "count": 2, "percentage": 66.67
+    }
 
 def test_analytics_by_vehicle_model_not_found():
     # Vehicles
@@ -719,6 +702,17 @@ def test_analytics_part_by_propulsion_type_success():
     assert "total_parts_replaced" in data
     assert "model_distribution" in data
     assert "part_stats" in data
+    assert data["total_parts_replaced"] == 1
+    assert data["model_distribution"] == [{"model": "Audi", "count": 1, "percentage": 100.0}]
+    assert data["part_stats"] == [{
+        "part_id": 1,
+        "name": "pneu",
+        "count": 1,
+        "vehicles_affected": 1,
+        "percentage_of_vehicles": 100.0,
+        "models_affected": ["Audi"],
+        "average_per_affected_vehicle": 1.0
+    }]
 
 def test_analytics_part_by_propulsion_type_invalid_format_or_not_found():
     # Fazer requisição
@@ -874,10 +868,757 @@ def test_analytics_supplier_by_part_success():
     assert "warranty_stats" in data["parts_analysis"][0]
     assert "vehicle_stats" in data["parts_analysis"][0]
 
+    top_part = data["parts_analysis"][0]
+    assert top_part["part_id"] == 1
+    assert top_part["warranty_stats"]["total_claims"] == 2
+    assert top_part["warranty_stats"]["affected_vehicles"] == 2
+    assert top_part["vehicle_stats"]["models"] == [{"model": "Audi", "count": 2, "percentage": 100.0}]
+    assert top_part["vehicle_stats"]["year_distribution"] == [
+        {"range": "2020-2024", "count": 1, "percentage": 50.0},
+        {"range": "2025-2029", "count": 1, "percentage": 50.0},
+    ]
+
+def test_analytics_supplier_by_part_avg_time_to_failure():
+    configurar_banco(SQLALCHEMY_DATABASE_URL)
+    client.post("location/", json={
+        "market": "latin_america",
+        "country": "Brasil",
+        "province": "Ceará",
+        "city": "Itapajé"
+    })
+    client.post("/supplier", json={
+        "supplier_name": "felipe motos",
+        "supplier_cpf": "12345678910",
+        "location_id": 1
+    })
+    client.post("/part", json={
+        "part_name": "pneu",
+        "last_id_purchase": 1,
+        "supplier_id": 1
+    })
+    client.post("/vehicle", json={
+        "model": "Audi",
+        "prod_date": "2023-01-01",
+        "year": 2023,
+        "propulsion": "eletric",
+    })
+    # 10 e 30 dias após a produção, e um reparo anterior à produção que é ignorado na média
+    for repair_date in ["2023-01-11T12:00:00", "2023-01-31", "2022-12-01"]:
+        client.post("/warranty", json={
+            "vehicle_id": 1,
+            "repair_date": repair_date,
+            "client_comment": "Clientes teste 1",
+            "tech_comment": "Equipe de TI teste 1",
+            "part_id": 1,
+            "classified_failured": "falha na bateria",
+            "location_id": 1,
+            "purchase_id": 1
+        })
+
+    response = client.get("/analytics/part_by_suppliers/felipe motos")
+
+    assert response.status_code == 200
+    warranty_stats = response.json()["parts_analysis"][0]["warranty_stats"]
+    assert warranty_stats["total_claims"] == 3
+    assert warranty_stats["affected_vehicles"] == 1
+    assert warranty_stats["avg_time_to_failure_days"] == 20.0
+
 def test_analytics_supplier_by_part_not_found():
     # Fazer requisição
     response = client.get("/analytics/part_by_suppliers/Fornecedor")
     
     # Verificar resposta
     assert response.status_code == 404
-    assert "não encontrado" in response.json()["detail"]
\ No newline at end of file
+    assert "não encontrado" in response.json()["detail"]
+
+def test_analytics_rollups_rebuild_and_incremental_maintenance():
+    configurar_banco(SQLALCHEMY_DATABASE_URL)
+    client.post("location/", json={
+        "market": "latin_america",
+        "country": "Brasil",
+        "province": "Ceará",
+        "city": "Itapajé"
+    })
+    client.post("/supplier", json={
+        "supplier_name": "felipe motos",
+        "supplier_cpf": "12345678910",
+        "location_id": 1
+    })
+    client.post("/part", json={
+        "part_name": "pneu",
+        "last_id_purchase": 1,
+        "supplier_id": 1
+    })
+    client.post("/vehicle", json={
+        "model": "Audi",
+        "prod_date": "2023-01-01",
+        "year": 2023,
+        "propulsion": "eletric",
+    })
+    client.post("/purchases", json={
+        "purchase_type": "bulk",
+        "purchase_date": "2023-03-01",
+        "part_id": 1
+    })
+    warranty = {
+        "vehicle_id": 1,
+        "repair_date": "2023-03-01",
+        "client_comment": "Clientes teste 1",
+        "tech_comment": "Equipe de TI teste 1",
+        "part_id": 1,
+        "classified_failured": "falha na bateria",
+        "location_id": 1,
+        "purchase_id": 1
+    }
+    client.post("/warranty", json=warranty)
+
+    response = client.post("/analytics/rollups/rebuild")
+    assert response.status_code == 200
+
+    # Escritas após o rebuild atualizam as rollups na mesma transação
+    client.post("/purchases", json={
+        "purchase_type": "bulk",
+        "purchase_date": "2023-04-15",
+        "part_id": 1
+    })
+    client.post("/warranty", json=warranty)
+    client.request("DELETE", "/purchases/id/1", json={"purchase_id": "1"})
+
+    data = client.get("/analytics/purchases_by_type/bulk").json()
+    assert data["total_count"] == 1
+    assert data["monthly_trend"] == [{"month": "2023-04", "count": 1}]
+    assert data["first_purchase_date"] == "2023-04-15T00:00:00"
+
+    data = client.get("/analytics/supplier_by_province/Ceará").json()
+    assert data["total_purchases"] == 1
+    assert data["top_suppliers"][0]["bulk_purchases"] == 1
+
+    data = client.get("/analytics/vehicle_model/Audi").json()
+    assert data["warranty_stats"]["total_claims"] == 2
+
+    client.put("/vehicle/id/1", json={"model": "Fiat"})
+    data = client.get("/analytics/vehicle_model/Fiat").json()
+    assert data["warranty_stats"]["total_claims"] == 2
+
+def test_analytics_cache_hit_and_invalidation_on_write():
+    configurar_banco(SQLALCHEMY_DATABASE_URL)
+    client.post("location/", json={
+        "market": "latin_america",
+        "country": "Brasil",
+        "province": "Ceará",
+        "city": "Itapajé"
+    })
+    client.post("/supplier", json={
+        "supplier_name": "felipe motos",
+        "supplier_cpf": "12345678910",
+        "location_id": 1
+    })
+    client.post("/part", json={
+        "part_name": "pneu",
+        "last_id_purchase": 1,
+        "supplier_id": 1
+    })
+    purchase = {
+        "purchase_type": "bulk",
+        "purchase_date": "2023-03-01",
+        "part_id": 1
+    }
+    client.post("/purchases", json=purchase)
+
+    first = client.get("/analytics/purchases_by_type/bulk")
+    second = client.get("/analytics/purchases_by_type/bulk")
+
+    assert first.headers["X-Cache"] == "MISS"
+    assert second.headers["X-Cache"] == "FRESH"
+    assert second.content == first.content
+    assert second.json()["total_count"] == 1
+
+    # Um commit em purchases incrementa a versão da tabela e invalida a resposta guardada
+    client.post("/purchases", json=purchase)
+    third = client.get("/analytics/purchases_by_type/bulk")
+
+    assert third.headers["X-Cache"] == "MISS"
+    assert third.json()["total_count"] == 2
+
+    stats = client.get("/analytics/cache/stats").json()
+    assert stats["hits"] >= 1
+    assert stats["invalidations"] >= 1
+
+def test_analytics_cache_shared_between_workers_through_redis(monkeypatch):
+    configurar_banco(SQLALCHEMY_DATABASE_URL)
+    redis = fakeredis.FakeRedis()
+    # Dois workers: cada um com o seu L1 em memória e o mesmo Redis como L2 e fonte das versões
+    worker_caches = [
+        VersionedCache(
+            TieredBackend(MemoryBackend(), RedisBackend(redis)),
+            namespace="analytics",
+            ttl_seconds=60,
+            serializer="raw",
+        )
+        for _ in range(2)
+    ]
+    monkeypatch.setattr(table_versions, "backend", RedisBackend(redis))
+
+    client.post("location/", json={
+        "market": "latin_america",
+        "country": "Brasil",
+        "province": "Ceará",
+        "city": "Itapajé"
+    })
+    client.post("/supplier", json={
+        "supplier_name": "felipe motos",
+        "supplier_cpf": "12345678910",
+        "location_id": 1
+    })
+
+    monkeypatch.setattr(analytical, "analytics_cache", worker_caches[0])
+    first = client.get("/analytics/supplier_by_province/Ceará")
+    monkeypatch.setattr(analytical, "analytics_cache", worker_caches[1])
+    second = client.get("/analytics/supplier_by_province/Ceará")
+
+    assert first.headers["X-Cache"] == "MISS"
+    assert second.headers["X-Cache"] == "FRESH"
+    assert second.content == first.content
+    assert worker_caches[1].stats()["l2_hits"] == 1
+
+    # O commit feito por um worker incrementa a versão no Redis e invalida o L1 do outro
+    client.post("/supplier", json={
+        "supplier_name": "outro fornecedor",
+        "supplier_cpf": "10987654321",
+        "location_id": 1
+    })
+    monkeypatch.setattr(analytical, "analytics_cache", worker_caches[0])
+    third = client.get("/analytics/supplier_by_province/Ceará")
+
+    assert third.headers["X-Cache"] == "MISS"
+    assert third.json()["total_suppliers"] == 2
+
+def test_analytics_cache_calls_to_redis_run_off_the_event_loop(monkeypatch):
+    configurar_banco(SQLALCHEMY_DATABASE_URL)
+    calls, on_loop = [], []
+
+    class LoopCheckingRedis:
+        # Registra as chamadas ao Redis feitas na thread do event loop
+        def __init__(self, client):
+            self.client = client
+
+        def __getattr__(self, name):
+            attribute = getattr(self.client, name)
+            if not callable(attribute):
+                return attribute
+
+            def call(*args, **kwargs):
+                calls.append(name)
+                try:
+                    asyncio.get_running_loop()
+                    on_loop.append(name)
+                except RuntimeError:
+                    pass
+                return attribute(*args, **kwargs)
+            return call
+
+    redis = LoopCheckingRedis(fakeredis.FakeRedis())
+    monkeypatch.setattr(table_versions, "backend", RedisBackend(redis))
+    monkeypatch.setattr(analytical, "analytics_cache", VersionedCache(TieredBackend(MemoryBackend(), RedisBackend(redis)), namespace="analytics", ttl_seconds=60, serializer="raw"))
+    monkeypatch.setattr("app.utils.auth.user_cache", VersionedCache(RedisBackend(redis), namespace="users", ttl_seconds=60))
+
+    client.post("/vehicle", json={"model": "Audi", "prod_date": "2023-01-01", "year": 2023, "propulsion": "gas"})
+    assert client.get("/analytics/vehicle_model/Audi", params={"source": "db"}).headers["x-cache"] == "MISS"
+    assert client.get("/analytics/vehicle_model/Audi", params={"source": "db"}).headers["x-cache"] == "FRESH"
+
+    # Usuário da sessão autenticada, lido do cache a cada requisição
+    async def load_user():
+        async with AsyncSessionLocal() as db:
+            return await get_cached_user_by_id_async_util(1, db)
+
+    assert asyncio.run(load_user()) is None
+    assert {"mget", "get", "set"} <= set(calls)
+    assert on_loop == []
+
+def test_cache_compresses_large_values():
+    redis = fakeredis.FakeRedis()
+    cache = VersionedCache(RedisBackend(redis), namespace="lookups", ttl_seconds=60, serializer="json")
+    value = {"parts": ["pneu"] * 1000}
+
+    cache.set("parts", value, (1, 1))
+
+    stored = redis.get("ford:lookups:parts")
+    assert len(stored) < len(str(value))
+    assert cache.get("parts", (1, 1)) == (value, "fresh")
+    assert cache.get("parts", (1, 2)) == (None, None)
+
+def test_analytics_snapshot_matches_database(monkeypatch):
+    configurar_banco(SQLALCHEMY_DATABASE_URL)
+    monkeypatch.setattr(snapshot_store, "refresh_seconds", 0)
+    client.post("location/", json={
+        "market": "latin_america",
+        "country": "Brasil",
+        "province": "Ceará",
+        "city": "Itapajé"
+    })
+    client.post("/supplier", json={
+        "supplier_name": "felipe motos",
+        "supplier_cpf": "12345678910",
+        "location_id": 1
+    })
+    for part_name in ["pneu", "bateria", "freio"]:
+        client.post("/part", json={
+            "part_name": part_name,
+            "last_id_purchase": 1,
+            "supplier_id": 1
+        })
+    for model, year, propulsion in [("Audi", 2023, "eletric"), ("Audi", 2019, "combustion"), ("Fiat", 2021, "eletric")]:
+        client.post("/vehicle", json={
+            "model": model,
+            "prod_date": "2019-01-01",
+            "year": year,
+            "propulsion": propulsion,
+        })
+    # A última garantia aponta para um veículo que não existe
+    for vehicle_id, part_id, repair_date, failure in [
+        (1, 1, "2023-03-01", "falha na bateria"),
+        (1, 1, "2023-05-10", "desgaste"),
+        (2, 2, "2022-01-01", "falha na bateria"),
+        (3, 1, "2021-07-15", "desgaste"),
+        (9, 3, "2021-07-15", "desgaste"),
+    ]:
+        client.post("/warranty", json={
+            "vehicle_id": vehicle_id,
+            "repair_date": repair_date,
+            "client_comment": "Clientes teste 1",
+            "tech_comment": "Equipe de TI teste 1",
+            "part_id": part_id,
+            "classified_failured": failure,
+            "location_id": 1,
+            "purchase_id": 1
+        })
+
+    paths = [
+        "/analytics/vehicle_model/Audi",
+        "/analytics/propulsion_type/eletric",
+        "/analytics/part_by_suppliers/felipe motos",
+    ]
+
+    def assert_sources_match():
+        for path in paths:
+            # Também com intervalo de datas, que no snapshot vira uma máscara sobre repair_date
+            for window in [{}, {"from": "2022-01-01", "to": "2023-04-01"}]:
+                from_db = client.get(path, params={"source": "db", **window})
+                from_snapshot = client.get(path, params={"source": "snapshot", **window})
+                assert from_snapshot.status_code == 200
+                assert from_snapshot.headers["X-Analytics-Source"] == "snapshot"
+                assert from_snapshot.json() == from_db.json()
+
+    assert_sources_match()
+    assert client.get("/analytics/vehicle_model/Fusca", params={"source": "snapshot"}).status_code == 404
+
+    # Inserções são lidas de forma incremental; alterações em dimensões recarregam só a dimensão
+    refreshes = snapshot_store.stats()["refreshes"]
+    client.post("/warranty", json={
+        "vehicle_id": 3,
+        "repair_date": "2024-01-01",
+        "client_comment": "Clientes teste 1",
+        "tech_comment": "Equipe de TI teste 1",
+        "part_id": 2,
+        "classified_failured": "desgaste",
+        "location_id": 1,
+        "purchase_id": 1
+    })
+    client.put("/vehicle/id/2", json={"model": "Fiat"})
+    assert_sources_match()
+    assert snapshot_store.stats()["refreshes"] > refreshes
+    assert snapshot_store.stats()["warranties"] == 6
+
+def test_analytics_snapshot_over_memory_budget(monkeypatch):
+    configurar_banco(SQLALCHEMY_DATABASE_URL)
+    monkeypatch.setattr(snapshot_store, "refresh_seconds", 0)
+    monkeypatch.setattr(snapshot_store, "max_bytes", 1)
+    client.post("/vehicle", json={
+        "model": "Audi",
+        "prod_date": "2023-01-01",
+        "year": 2023,
+        "propulsion": "eletric",
+    })
+
+    response = client.get("/analytics/vehicle_model/Audi", params={"source": "snapshot"})
+    assert response.status_code == 503
+    assert client.get("/analytics/vehicle_model/Audi").status_code == 200
+
+def test_analytics_snapshot_reloads_facts_committed_out_of_claim_key_order(monkeypatch):
+    configurar_banco(SQLALCHEMY_DATABASE_URL)
+    monkeypatch.setattr(snapshot_store, "refresh_seconds", 0)
+    client.post("/vehicle", json={"model": "Audi", "prod_date": "2023-01-01", "year": 2023, "propulsion": "eletric"})
+
+    def commit_warranty(claim_key):
+        with AppSessionLocal() as db:
+            db.add(Warranty(claim_key=claim_key, vehicle_id=1, repair_date=datetime(2023, 3, 1), part_id=1, classified_failured="desgaste"))
+            db.commit()
+
+    commit_warranty(10)
+    assert client.get("/analytics/vehicle_model/Audi", params={"source": "snapshot"}).status_code == 200
+    assert snapshot_store.stats()["warranties"] == 1
+
+    # Uma transação que pegou um claim_key menor confirma depois da carga incremental que passou dele
+    commit_warranty(7)
+    response = client.get("/analytics/vehicle_model/Audi", params={"source": "snapshot"})
+    assert response.json() == client.get("/analytics/vehicle_model/Audi", params={"source": "db"}).json()
+    assert snapshot_store.stats()["warranties"] == 2
+
+def test_analytics_concurrent_requests_on_async_session():
+    configurar_banco(SQLALCHEMY_DATABASE_URL)
+    client.post("/vehicle", json={
+        "model": "Audi",
+        "prod_date": "2023-01-01",
+        "year": 2023,
+        "propulsion": "eletric",
+    })
+
+    async def fetch_all():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+            paths = ["/analytics/vehicle_model/Audi", "/analytics/propulsion_type/eletric"] * 5
+            return await asyncio.gather(*(async_client.get(path, params={"source": "db"}) for path in paths))
+
+    responses = asyncio.run(fetch_all())
+
+    assert [response.status_code for response in responses] == [200] * 10
+    assert responses[0].json()["total_count"] == 1
+    assert responses[1].json()["total_vehicles"] == 1
+
+def test_analytics_fanout_runs_queries_on_separate_bounded_sessions():
+    configurar_banco(SQLALCHEMY_DATABASE_URL)
+    sessions = []
+    running = 0
+    max_running = 0
+
+    def query(session):
+        sessions.append(session)
+        return session.execute(text("SELECT 1")).scalar()
+
+    async def run(max_parallel: int):
+        async with AsyncSessionLocal() as db:
+            sync_engine = db.bind.sync_engine
+
+            def before_execute(*args):
+                nonlocal running, max_running
+                running += 1
+                max_running = max(max_running, running)
+
+            def after_execute(*args):
+                nonlocal running
+                running -= 1
+
+            event.listen(sync_engine, "before_cursor_execute", before_execute)
+            event.listen(sync_engine, "after_cursor_execute", after_execute)
+            try:
+                results = await run_concurrently(db, max_parallel=max_parallel, a=query, b=query, c=query, d=query)
+            finally:
+                event.remove(sync_engine, "before_cursor_execute", before_execute)
+                event.remove(sync_engine, "after_cursor_execute", after_execute)
+            return results, db.sync_session
+
+    results, request_session = asyncio.run(run(max_parallel=1))
+
+    # Cada consulta usa a sua própria sessão e o resultado volta pelo nome
+    assert results == {"a": 1, "b": 1, "c": 1, "d": 1}
+    assert len({id(session) for session in sessions}) == 4
+    assert all(session is not request_session for session in sessions)
+    # Com limite 1 por requisição as consultas nunca se sobrepõem
+    assert max_running == 1
+
+    max_running = 0
+    results, _ = asyncio.run(run(max_parallel=2))
+    assert results == {"a": 1, "b": 1, "c": 1, "d": 1}
+    assert max_running <= 2
+
+def test_analytics_fanout_matches_sequential_results(monkeypatch):
+    configurar_banco(SQLALCHEMY_DATABASE_URL)
+    client.post("/vehicle", json={"model": "Audi", "prod_date": "2023-01-01", "year": 2023, "propulsion": "eletric"})
+
+    parallel = client.get("/analytics/vehicle_model/Audi", params={"source": "db"}).json()
+    analytical.analytics_cache.clear()
+    monkeypatch.setattr("app.configs.fanout.ANALYTICS_MAX_PARALLEL_QUERIES", 1)
+    sequential = client.get("/analytics/vehicle_model/Audi", params={"source": "db"}).json()
+
+    assert parallel == sequential
+    assert parallel["total_count"] == 1
+
+def test_analytics_warmup_precomputes_responses_and_gates_readiness(monkeypatch):
+    configurar_banco(SQLALCHEMY_DATABASE_URL)
+    client.post("location/", json={"market": "latin_america", "country": "Brasil", "province": "Ceará", "city": "Sobral"})
+    client.post("/supplier", json={"supplier_name": "felipe motos", "supplier_cpf": "12345678910", "location_id": 1})
+    client.post("/vehicle", json={"model": "Audi", "prod_date": "2023-01-01", "year": 2023, "propulsion": "eletric"})
+
+    warmer = analytical.AnalyticsWarmer(analytical.analytics_cache, analytical.list_analytics_warmup_jobs)
+    monkeypatch.setattr(analytical, "analytics_warmer", warmer)
+    monkeypatch.setattr(main, "ANALYTICS_WARMUP_ENABLED", True)
+
+    # Antes da primeira passada a aplicação ainda não está pronta
+    assert client.get("/ready").status_code == 503
+
+    asyncio.run(warmer.warm(force=True))
+    assert client.get("/ready").status_code == 200
+
+    # A primeira requisição já encontra as respostas no cache
+    for path in ["/analytics/supplier_by_province/Ceará", "/analytics/vehicle_model/Audi", "/analytics/propulsion_type/eletric", "/analytics/part_by_suppliers/felipe motos"]:
+        response = client.get(path, params={"source": "db"} if "supplier_by_province" not in path else None)
+        assert response.status_code == 200
+        assert response.headers["X-Cache"] == "FRESH"
+
+    # Sem mudanças nos dados, uma passada incremental não recalcula nada; depois de uma escrita, só o que mudou
+    assert asyncio.run(warmer.warm()) == 0
+    client.post("/vehicle", json={"model": "Audi", "prod_date": "2022-01-01", "year": 2022, "propulsion": "gas"})
+    warmed = asyncio.run(warmer.warm())
+    assert 0 < warmed < len(asyncio.run(_list_warmup_jobs()))
+    assert client.get("/analytics/vehicle_model/Audi", params={"source": "db"}).json()["total_count"] == 2
+
+def test_analytics_warmup_stays_not_ready_after_a_pass_with_failures(monkeypatch):
+    configurar_banco(SQLALCHEMY_DATABASE_URL)
+    failing = {"on": True}
+
+    async def compute(db):
+        if failing["on"]:
+            raise RuntimeError("banco fora do ar")
+        return {"ok": True}
+
+    async def list_jobs(db):
+        return [analytical.WarmupJob(("warmup_test",), (Supplier.__tablename__,), compute)]
+
+    warmer = analytical.AnalyticsWarmer(analytical.analytics_cache, list_jobs)
+    monkeypatch.setattr(analytical, "analytics_warmer", warmer)
+    monkeypatch.setattr(main, "ANALYTICS_WARMUP_ENABLED", True)
+
+    # Uma passada em que todas as respostas falharam não aquece o cache
+    asyncio.run(warmer.warm(force=True))
+    assert warmer.stats()["last_failed"] == 1
+    assert client.get("/ready").status_code == 503
+
+    failing["on"] = False
+    asyncio.run(warmer.warm(force=True))
+    assert client.get("/ready").status_code == 200
+    assert warmer.interval_seconds < analytical.analytics_cache.ttl_seconds
+
+async def _list_warmup_jobs():
+    async with AsyncSessionLocal() as db:
+        return await analytical.list_analytics_warmup_jobs(db)
+
+def test_analytics_cube_groups_measures_and_filters():
+    configurar_banco(SQLALCHEMY_DATABASE_URL)
+    client.post("location/", json={"market": "latin_america", "country": "Brasil", "province": "Ceará", "city": "Sobral"})
+    client.post("location/", json={"market": "european_union", "country": "Portugal", "province": "Lisboa", "city": "Lisboa"})
+    client.post("/supplier", json={"supplier_name": "felipe motos", "supplier_cpf": "12345678910", "location_id": 1})
+    client.post("/part", json={"part_name": "pneu", "last_id_purchase": 1, "supplier_id": 1})
+    client.post("/part", json={"part_name": "motor", "last_id_purchase": 2, "supplier_id": 1})
+    client.post("/vehicle", json={"model": "Audi", "prod_date": "2023-01-01", "year": 2023, "propulsion": "eletric"})
+    client.post("/vehicle", json={"model": "Fiat", "prod_date": "2022-01-01", "year": 2022, "propulsion": "gas"})
+    for part_id, vehicle_id, location_id, repair_date in [(1, 1, 1, "2023-03-01"), (1, 1, 1, "2023-04-01"), (1, 2, 2, "2023-04-15"), (2, 2, 2, "2023-04-20")]:
+        client.post("/warranty", json={
+            "vehicle_id": vehicle_id,
+            "repair_date": repair_date,
+            "client_comment": "cliente",
+            "tech_comment": "técnico",
+            "part_id": part_id,
+            "classified_failured": "falha",
+            "location_id": location_id,
+            "purchase_id": 1,
+        })
+    for part_id in [1, 1, 2]:
+        client.post("/purchases", json={"purchase_type": "bulk", "purchase_date": "2023-03-01", "part_id": part_id})
+
+    response = client.get("/analytics/cube", params={"dimensions": ["model"], "measures": ["claims", "vehicles"]})
+    assert response.status_code == 200
+    # Ordenado pela primeira medida (decrescente) e, no empate, pelas dimensões
+    assert response.json()["rows"] == [
+        {"model": "Audi", "claims": 2, "vehicles": 1},
+        {"model": "Fiat", "claims": 2, "vehicles": 1},
+    ]
+
+    # Filtros por local e mês de reparo, agrupando por peça
+    response = client.get("/analytics/cube", params={"dimensions": ["part"], "province": "Lisboa", "repair_month": "2023-04"})
+    assert response.json()["rows"] == [
+        {"part_id": 1, "part_name": "pneu", "claims": 1},
+        {"part_id": 2, "part_name": "motor", "claims": 1},
+    ]
+
+    # Garantias e compras do mesmo fornecedor na mesma consulta
+    response = client.get("/analytics/cube", params={"dimensions": ["supplier", "part"], "measures": ["purchases", "claims"]})
+    assert response.json()["rows"] == [
+        {"supplier_id": 1, "supplier_name": "felipe motos", "part_id": 1, "part_name": "pneu", "purchases": 2, "claims": 3},
+        {"supplier_id": 1, "supplier_name": "felipe motos", "part_id": 2, "part_name": "motor", "purchases": 1, "claims": 1},
+    ]
+
+    # Limite de linhas e combinações sem sentido para o fato de compras
+    response = client.get("/analytics/cube", params={"dimensions": ["year"], "limit": 1})
+    assert len(response.json()["rows"]) == 1
+    assert response.json()["truncated"] is True
+    assert client.get("/analytics/cube", params={"dimensions": ["model"], "measures": ["purchases"]}).status_code == 422
+    assert client.get("/analytics/cube", params={"repair_month": "abril"}).status_code == 422
+
+def test_analytics_time_window_filters_facts_and_is_reported():
+    configurar_banco(SQLALCHEMY_DATABASE_URL)
+    client.post("location/", json={"market": "latin_america", "country": "Brasil", "province": "Ceará", "city": "Sobral"})
+    client.post("/supplier", json={"supplier_name": "felipe motos", "supplier_cpf": "12345678910", "location_id": 1})
+    client.post("/part", json={"part_name": "pneu", "last_id_purchase": 1, "supplier_id": 1})
+    client.post("/vehicle", json={"model": "Audi", "prod_date": "2020-01-01", "year": 2020, "propulsion": "gas"})
+    for repair_date in ["2023-01-10", "2023-02-10", "2023-03-10"]:
+        client.post("/warranty", json={
+            "vehicle_id": 1,
+            "repair_date": repair_date,
+            "client_comment": "cliente",
+            "tech_comment": "técnico",
+            "part_id": 1,
+            "classified_failured": "falha",
+            "location_id": 1,
+            "purchase_id": 1,
+        })
+    for purchase_date in ["2023-01-05", "2023-02-05"]:
+        client.post("/purchases", json={"purchase_type": "bulk", "purchase_date": purchase_date, "part_id": 1})
+    # Com as rollups construídas, as análises com intervalo continuam lendo os fatos
+    client.post("/analytics/rollups/rebuild")
+
+    window = {"from": "2023-02-01", "to": "2023-03-01"}
+    response = client.get("/analytics/vehicle_model/Audi", params={"source": "db", **window})
+    assert response.status_code == 200
+    assert response.json()["total_count"] == 1
+    assert response.json()["warranty_stats"]["total_claims"] == 1
+    assert response.json()["window"] == {"from": "2023-02-01T00:00:00", "to": "2023-03-01T00:00:00", "last_days": None}
+    assert client.get("/analytics/vehicle_model/Audi", params={"source": "db"}).json()["warranty_stats"]["total_claims"] == 3
+
+    response = client.get("/analytics/purchases_by_type/bulk", params={"from": "2023-02-01"})
+    assert response.json()["total_count"] == 1
+    assert response.json()["monthly_trend"] == [{"month": "2023-02", "count": 1}]
+
+    response = client.get("/analytics/supplier_by_province/Ceará", params={"to": "2023-02-01"})
+    assert response.json()["total_purchases"] == 1
+
+    response = client.get("/analytics/part_by_suppliers/felipe motos", params={"source": "db", "from": "2023-03-01"})
+    assert response.json()["parts_analysis"][0]["warranty_stats"]["total_claims"] == 1
+
+    response = client.get("/analytics/cube", params={"measures": ["claims"], **window})
+    assert response.json()["rows"] == [{"claims": 1}]
+
+    # Janela relativa e intervalos inválidos
+    response = client.get("/analytics/vehicle_model/Audi", params={"source": "db", "last_days": 30})
+    assert response.json()["window"]["last_days"] == 30
+    assert response.json()["warranty_stats"]["total_claims"] == 0
+    assert client.get("/analytics/vehicle_model/Audi", params={"from": "2023-03-01", "to": "2023-02-01"}).status_code == 422
+    assert client.get("/analytics/vehicle_model/Audi", params={"from": "2023-03-01", "last_days": 7}).status_code == 422
+
+def test_analytics_approx_mode_merges_monthly_sketches():
+    configurar_banco(SQLALCHEMY_DATABASE_URL)
+    client.post("location/", json={"market": "latin_america", "country": "Brasil", "province": "Ceará", "city": "Sobral"})
+    client.post("/supplier", json={"supplier_name": "felipe motos", "supplier_cpf": "12345678910", "location_id": 1})
+    client.post("/part", json={"part_name": "pneu", "last_id_purchase": 1, "supplier_id": 1})
+    client.post("/part", json={"part_name": "motor", "last_id_purchase": 1, "supplier_id": 1})
+    client.post("/vehicle", json={"model": "Audi", "prod_date": "2023-01-01", "year": 2023, "propulsion": "gas"})
+    client.post("/vehicle", json={"model": "Fiat", "prod_date": "2023-01-01", "year": 2023, "propulsion": "gas"})
+    for part_id, vehicle_id, repair_date in [(1, 1, "2023-01-11"), (1, 1, "2023-02-21"), (1, 2, "2023-02-01"), (2, 2, "2023-03-31")]:
+        client.post("/warranty", json={
+            "vehicle_id": vehicle_id,
+            "repair_date": repair_date,
+            "client_comment": "cliente",
+            "tech_comment": "técnico",
+            "part_id": part_id,
+            "classified_failured": "falha",
+            "location_id": 1,
+            "purchase_id": 1,
+        })
+
+    # Sem rollups, o modo aproximado responde com o cálculo exato
+    response = client.get("/analytics/propulsion_type/gas", params={"approx": True, "source": "db"})
+    assert "approximation" not in response.json()
+
+    client.post("/analytics/rollups/rebuild")
+    exact = client.get("/analytics/propulsion_type/gas", params={"source": "db"}).json()
+    approx = client.get("/analytics/propulsion_type/gas", params={"approx": True, "source": "db"}).json()
+    assert approx["part_stats"] == exact["part_stats"]
+    assert approx["approximation"]["claims"] == "exact"
+    assert approx["approximation"]["distinct_vehicles_relative_error"] < 0.05
+
+    response = client.get("/analytics/part_by_suppliers/felipe motos", params={"approx": True, "source": "db"})
+    stats = {part["part_id"]: part["warranty_stats"] for part in response.json()["parts_analysis"]}
+    assert stats[1]["total_claims"] == 3
+    assert stats[1]["affected_vehicles"] == 2
+    # Média exata de 10, 31 e 51 dias, e a mediana pelo t-digest
+    assert stats[1]["avg_time_to_failure_days"] == 30.7
+    assert stats[1]["days_to_failure_quantiles"]["p50"] == 31.0
+    assert set(response.json()["approximation"]["days_to_failure_quantile_rank_error"]) == {"p50", "p90", "p99"}
+
+    # O intervalo é arredondado para meses inteiros e informado na resposta
+    response = client.get("/analytics/vehicle_model/Audi", params={"approx": True, "source": "db", "from": "2023-02-15", "to": "2023-03-01"})
+    assert response.json()["warranty_stats"]["total_claims"] == 1
+    assert response.json()["approximation"]["months"] == {"from": "2023-02", "to": "2023-02"}
+    # Por modelo só as contagens de garantias saem das partições: nenhum veículo distinto é estimado
+    assert response.json()["approximation"] == {"method": "sketches", "months": {"from": "2023-02", "to": "2023-02"}, "claims": "exact"}
+
+    # Novas garantias atualizam os sketches das partições afetadas
+    client.post("/warranty", json={
+        "vehicle_id": 2,
+        "repair_date": "2023-03-02",
+        "client_comment": "cliente",
+        "tech_comment": "técnico",
+        "part_id": 2,
+        "classified_failured": "falha",
+        "location_id": 1,
+        "purchase_id": 1,
+    })
+    response = client.get("/analytics/part_by_suppliers/felipe motos", params={"approx": True, "source": "db"})
+    stats = {part["part_id"]: part["warranty_stats"] for part in response.json()["parts_analysis"]}
+    assert stats[2]["total_claims"] == 2
+    assert stats[2]["affected_vehicles"] == 1
+
+def test_analytics_conditional_get_answers_304_from_table_versions():
+    configurar_banco(SQLALCHEMY_DATABASE_URL)
+    client.post("/vehicle", json={"model": "Audi", "prod_date": "2023-01-01", "year": 2023, "propulsion": "gas"})
+
+    response = client.get("/analytics/vehicle_model/Audi", params={"source": "db"})
+    assert response.status_code == 200
+    response = client.get("/analytics/vehicle_model/Audi", params={"source": "db"}, headers={"If-None-Match": response.headers["etag"]})
+    assert response.status_code == 304
+
+def test_conditional_get_on_last_days_ignores_if_modified_since_after_date_change(monkeypatch):
+    configurar_banco(SQLALCHEMY_DATABASE_URL)
+    client.post("/vehicle", json={"model": "Audi", "prod_date": "2023-01-01", "year": 2023, "propulsion": "gas"})
+    # Segundo do último commit já passou: uma rota só de tabelas enviaria Last-Modified
+    monkeypatch.setattr("app.configs.conditional.time.time", lambda: 4102444800)
+    params = {"source": "db", "last_days": 30}
+
+    response = client.get("/analytics/vehicle_model/Audi", params=params)
+    assert response.status_code == 200
+    assert "last-modified" not in response.headers
+    etag = response.headers["etag"]
+    if_modified_since = "Fri, 01 Jan 2100 00:00:00 GMT"
+
+    class Tomorrow(date):
+        @classmethod
+        def today(cls):
+            return date.today() + timedelta(days=1)
+
+    # Nenhuma tabela mudou, mas a janela `last_days` andou um dia
+    monkeypatch.setattr("app.routers.analytical.date", Tomorrow)
+    response = client.get("/analytics/vehicle_model/Audi", params=params, headers={"If-Modified-Since": if_modified_since})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert client.get("/analytics/vehicle_model/Audi", params=params, headers={"If-None-Match": response.headers["etag"]}).status_code == 304
+
+def test_analytics_negotiate_arrow_and_msgpack():
+    import msgpack
+    import pyarrow as pa
+
+    configurar_banco(SQLALCHEMY_DATABASE_URL)
+    client.post("/vehicle", json={"model": "Audi", "prod_date": "2023-01-01", "year": 2023, "propulsion": "gas"})
+    expected = client.get("/analytics/vehicle_model/Audi", params={"source": "db"}).json()
+    response = client.get("/analytics/vehicle_model/Audi", params={"source": "db"}, headers={"Accept": "application/msgpack"})
+    assert response.headers["content-type"] == "application/msgpack"
+    # Convertida da resposta JSON já em cache
+    assert response.headers["x-cache"] != "MISS"
+    assert msgpack.unpackb(response.content) == expected
+    response = client.get("/analytics/vehicle_model/Audi", params={"source": "db"}, headers={"Accept": "application/vnd.apache.arrow.stream"})
+    assert pa.ipc.open_stream(response.content).read_all().to_pylist() == [expected]
+
+    # No cubo as linhas viram a tabela e o restante da resposta vai nos metadados do schema
+    expected = client.get("/analytics/cube", params={"dimensions": ["model"], "measures": ["vehicles"]}).json()
+    response = client.get("/analytics/cube", params={"dimensions": ["model"], "measures": ["vehicles"]}, headers={"Accept": "application/vnd.apache.arrow.stream"})
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert table.to_pylist() == expected["rows"]
+    assert json.loads(table.schema.metadata[b"payload"]) == {key: value for key, value in expected.items() if key != "rows"}
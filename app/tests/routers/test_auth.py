@@ -1,6 +1,7 @@
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from app.configs.cache import user_cache
 from app.configs.database import get_db
 from app.configs.config import configurar_banco
 from app.main import app
@@ -144,4 +145,26 @@ def test_create_user_erro_maximum_char_cpf():
     }
     response = client.post("/auth/signup", json=new_user)
     assert response.status_code == 422
-    assert response.json()["detail"][0]["loc"] == ["body", "cpf"]
\ No newline at end of file
+    assert response.json()["detail"][0]["loc"] == ["body", "cpf"]
+
+def test_authenticated_user_served_from_user_cache():
+    configurar_banco(SQLALCHEMY_DATABASE_URL)
+    app.dependency_overrides[get_db] = override_get_db
+    client.post("/auth/signup", json={
+        "user_name": "Teste",
+        "cpf": "12345678900",
+        "email": "test@gmail.com",
+        "password": "lalala",
+        "is_active": 1,
+        "role": "user"
+    })
+    token = client.post("/auth/token", data={"username": "Teste", "password": "lalala"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    hits = user_cache.stats()["hits"]
+    first = client.get("/", headers=headers)
+    second = client.get("/", headers=headers)
+
+    assert first.status_code == 200
+    assert second.status_code == 200
+    assert user_cache.stats()["hits"] == hits + 1
@@ -0,0 +1,113 @@
+from datetime import datetime
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+import pytest
+import os
+
+from app.configs.auth import get_current_active_user
+from app.configs.database import get_db, engine as app_engine
+from app.configs.config import configurar_banco
+from app.main import app
+from app.models.model_user import User
+from app.schemas.user import IsActiveEnum
+
+client = TestClient(app)
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+os.environ["DATABASE_URL"] = SQLALCHEMY_DATABASE_URL
+os.environ['TEST_DATABASE'] = 'true'
+
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+app.dependency_overrides[get_db] = override_get_db
+
+@pytest.fixture
+def mock_user():
+    user = User(
+        user_id=1,
+        user_name="felipeteste",
+        email="teste@gmail.com.br",
+        password="hashed_password",  # Não importa para o teste
+        cpf="12345678910",
+        created_at=datetime.now(),
+        updated_at=datetime.now(),
+        is_active=IsActiveEnum.active,
+        role="admin"
+    )
+    return user
+
+# Sobrescrever a dependência para os testes
+@pytest.fixture(autouse=True)
+def override_dependency(mock_user):
+    # Substitui a função get_current_active_user pelo mock
+    app.dependency_overrides[get_current_active_user] = lambda: mock_user
+    yield
+    # Limpar após os testes
+    app.dependency_overrides.clear()
+
+def test_create_location():
+    configurar_banco(SQLALCHEMY_DATABASE_URL)
+    new_location = {
+        "market": "latin_america",
+        "country": "Brasil",
+        "province": "Ceará",
+        "city": "Itapajé"
+    }
+    response = client.post("location/", json=new_location)
+    data = response.json()
+    assert response.status_code == 201
+    assert data["market"] == "latin_america"
+    assert data["country"] == "Brasil"
+    assert data["province"] == "Ceará"
+    assert data["city"] == "Itapajé"
+
+def test_create_location_invalid_format_or_not_found_market():
+    configurar_banco(SQLALCHEMY_DATABASE_URL)
+    new_location = {
+        "market": "latin america",
+        "country": "Brasil",
+        "province": "Ceará",
+        "city": "Itapajé"
+    }
+    response = client.post("location/", json=new_location)
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", "market"]
+
+def test_fields_narrow_select_on_batch_and_cached_get_by_id():
+    configurar_banco(SQLALCHEMY_DATABASE_URL)
+    client.post("location/", json={"market": "latin_america", "country": "Brasil", "province": "Ceará", "city": "Sobral"})
+    client.post("location/", json={"market": "european_union", "country": "Portugal", "province": "Lisboa", "city": "Lisboa"})
+
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(app_engine, "before_cursor_execute", record)
+    try:
+        response = client.get("/location/batch", params={"ids": "2,1", "fields": "city"})
+        assert response.json()["items"] == [{"location_id": 2, "city": "Lisboa"}, {"location_id": 1, "city": "Sobral"}]
+        assert "city" in statements[-1] and "country" not in statements[-1]
+
+        response = client.get("/location/id/1", params={"fields": "city"})
+        assert response.json() == {"location_id": 1, "city": "Sobral"}
+        assert "city" in statements[-1] and "country" not in statements[-1]
+    finally:
+        event.remove(app_engine, "before_cursor_execute", record)
+
+    # Cada combinação de campos tem a sua entrada no cache
+    assert client.get("/location/id/1", params={"fields": "city"}).headers["x-cache"] != "MISS"
+    assert client.get("/location/id/1").json()["country"] == "Brasil"
+    assert client.get("/location/id/1", params={"fields": "cor"}).status_code == 422
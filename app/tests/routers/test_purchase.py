@@ -0,0 +1,153 @@
+from datetime import datetime
+import io
+import json
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+import pytest
+import os
+
+from app.configs.auth import get_current_active_user
+from app.configs.database import SessionLocal as AppSessionLocal, get_db, engine as app_engine
+from app.configs.config import configurar_banco
+from app.main import app
+from app.models.model_rollup import PurchaseRollup
+from app.models.model_user import User
+from app.schemas.pagination import Page
+from app.schemas.purchase import PurchaseResponse
+from app.schemas.user import IsActiveEnum
+
+client = TestClient(app)
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+os.environ["DATABASE_URL"] = SQLALCHEMY_DATABASE_URL
+os.environ['TEST_DATABASE'] = 'true'
+
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+app.dependency_overrides[get_db] = override_get_db
+
+@pytest.fixture
+def mock_user():
+    user = User(
+        user_id=1,
+        user_name="felipeteste",
+        email="teste@gmail.com.br",
+        password="hashed_password",  # Não importa para o teste
+        cpf="12345678910",
+        created_at=datetime.now(),
+        updated_at=datetime.now(),
+        is_active=IsActiveEnum.active,
+        role="admin"
+    )
+    return user
+
+# Sobrescrever a dependência para os testes
+@pytest.fixture(autouse=True)
+def override_dependency(mock_user):
+    # Substitui a função get_current_active_user pelo mock
+    app.dependency_overrides[get_current_active_user] = lambda: mock_user
+    yield
+    # Limpar após os testes
+    app.dependency_overrides.clear()
+
+def test_list_endpoints_stream_ndjson_and_csv_exports(monkeypatch):
+    configurar_banco(SQLALCHEMY_DATABASE_URL)
+    monkeypatch.setattr("app.configs.export.EXPORT_BATCH_SIZE", 2)
+    for purchase_date in ["2023-01-05", "2023-02-05", "2023-03-05"]:
+        client.post("/purchases", json={"purchase_type": "bulk", "purchase_date": purchase_date, "part_id": 1})
+
+    response = client.get("/purchases/", headers={"Accept": "application/x-ndjson"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    # Mesmos campos e formatos da listagem paginada, sem o limite de página
+    assert rows == client.get("/purchases/").json()["items"]
+
+    response = client.get("/purchases/", headers={"Accept": "text/csv, application/json;q=0.9"})
+    assert response.headers["content-type"].startswith("text/csv")
+    lines = response.text.splitlines()
+    assert lines[0] == "purchase_id,purchase_type,purchase_date,part_id"
+    assert lines[1:] == ["1,bulk,2023-01-05T00:00:00,1", "2,bulk,2023-02-05T00:00:00,1", "3,bulk,2023-03-05T00:00:00,1"]
+
+def test_bulk_update_refreshes_only_the_partitions_of_the_updated_rows():
+    configurar_banco(SQLALCHEMY_DATABASE_URL)
+    client.post("/analytics/rollups/rebuild")
+    client.post("/purchases/bulk", json=[
+        {"purchase_type": "bulk", "purchase_date": "2023-01-05", "part_id": 1},
+        # Já tem o valor novo do patch, em outra peça: a partição dela não muda
+        {"purchase_type": "bulk", "purchase_date": "2023-05-05", "part_id": 2},
+    ])
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, *args):
+        if statement.startswith("DELETE FROM rollup_purchases"):
+            statements.append(parameters)
+
+    event.listen(app_engine, "before_cursor_execute", record)
+    try:
+        response = client.patch("/purchases/bulk", json={"where": {"purchase_date": "2023-01-05"}, "patch": {"purchase_date": "2023-05-05"}})
+    finally:
+        event.remove(app_engine, "before_cursor_execute", record)
+
+    assert response.json() == {"matched": 1, "dry_run": False}
+    assert len(statements) == 1
+    assert 2 not in statements[0] and 1 in statements[0]
+    with AppSessionLocal() as db:
+        assert sorted((row.part_id, row.month, row.purchases) for row in db.query(PurchaseRollup)) == [(1, "2023-05", 1), (2, "2023-05", 1)]
+
+def test_list_endpoints_encode_core_rows_in_the_response_schema_format():
+    configurar_banco(SQLALCHEMY_DATABASE_URL)
+    client.post("/purchases/bulk", json=[
+        {"purchase_type": "bulk", "purchase_date": "2023-01-05T10:30:00.250000", "part_id": 1},
+        {"purchase_type": "warranty", "purchase_date": "2023-02-05", "part_id": 2},
+    ])
+
+    response = client.get("/purchases/", params={"limit": 1})
+    body = response.json()
+    assert response.headers["content-type"] == "application/json"
+    assert body["items"] == [{"purchase_id": 1, "purchase_type": "bulk", "purchase_date": "2023-01-05T10:30:00.250000", "part_id": 1}]
+    # Mesmo JSON que a validação pelo schema da rota produziria
+    assert Page[PurchaseResponse].model_validate(body).model_dump(mode="json") == body
+
+    body = client.get("/purchases/", params={"cursor": body["next_cursor"], "limit": 1, "fields": "purchase_date"}).json()
+    assert body == {"items": [{"purchase_id": 2, "purchase_date": "2023-02-05T00:00:00"}], "next_cursor": None, "limit": 1}
+
+def test_list_endpoints_negotiate_arrow_and_msgpack(monkeypatch):
+    import msgpack
+    import pyarrow as pa
+
+    configurar_banco(SQLALCHEMY_DATABASE_URL)
+    monkeypatch.setattr("app.configs.export.EXPORT_BATCH_SIZE", 2)
+    for purchase_date in ["2023-01-05", "2023-02-05", "2023-03-05"]:
+        client.post("/purchases", json={"purchase_type": "bulk", "purchase_date": purchase_date, "part_id": 1})
+    items = client.get("/purchases/").json()["items"]
+
+    response = client.get("/purchases/", headers={"Accept": "application/vnd.apache.arrow.stream"})
+    assert response.headers["content-type"] == "application/vnd.apache.arrow.stream"
+    reader = pa.ipc.open_stream(response.content)
+    batches = list(reader)
+    # Um record batch por lote lido do cursor, com os tipos das colunas
+    assert [batch.num_rows for batch in batches] == [2, 1]
+    assert reader.schema.field("purchase_date").type == pa.timestamp("us")
+    assert reader.schema.field("purchase_id").type == pa.int64()
+    table = pa.Table.from_batches(batches)
+    assert table.column("purchase_id").to_pylist() == [1, 2, 3]
+    assert table.column("purchase_type").to_pylist() == ["bulk"] * 3
+    assert table.column("purchase_date").to_pylist() == [datetime(2023, month, 5) for month in (1, 2, 3)]
+
+    response = client.get("/purchases/", headers={"Accept": "application/x-msgpack"})
+    assert response.headers["content-type"] == "application/msgpack"
+    assert list(msgpack.Unpacker(io.BytesIO(response.content))) == items
@@ -0,0 +1,74 @@
+from datetime import datetime
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+import pytest
+import os
+
+from app.configs.auth import get_current_active_user
+from app.configs.database import get_db
+from app.configs.config import configurar_banco
+from app.main import app
+from app.models.model_user import User
+from app.schemas.user import IsActiveEnum
+
+client = TestClient(app)
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+os.environ["DATABASE_URL"] = SQLALCHEMY_DATABASE_URL
+os.environ['TEST_DATABASE'] = 'true'
+
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+app.dependency_overrides[get_db] = override_get_db
+
+@pytest.fixture
+def mock_user():
+    user = User(
+        user_id=1,
+        user_name="felipeteste",
+        email="teste@gmail.com.br",
+        password="hashed_password",  # Não importa para o teste
+        cpf="12345678910",
+        created_at=datetime.now(),
+        updated_at=datetime.now(),
+        is_active=IsActiveEnum.active,
+        role="admin"
+    )
+    return user
+
+# Sobrescrever a dependência para os testes
+@pytest.fixture(autouse=True)
+def override_dependency(mock_user):
+    # Substitui a função get_current_active_user pelo mock
+    app.dependency_overrides[get_current_active_user] = lambda: mock_user
+    yield
+    # Limpar após os testes
+    app.dependency_overrides.clear()
+
+def test_create_supplier():
+    configurar_banco(SQLALCHEMY_DATABASE_URL)
+    new_supplier = {
+        "supplier_name": "felipe motos",
+        "supplier_cpf": "12345678910",
+        "location_id": 1
+    }
+    
+    response = client.post("supplier/", json=new_supplier)
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert data["supplier_name"] == "felipe motos"
+    assert data["supplier_cpf"] == "12345678910"
+    assert data["location_id"] == 1
@@ -0,0 +1,227 @@
+from datetime import datetime
+import json
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+import pytest
+import os
+
+from app.configs.auth import get_current_active_user
+from app.configs.cache_backend import MemoryBackend
+from app.configs.database import get_db, engine as app_engine
+from app.configs.config import configurar_banco
+from app.configs.versions import TableVersions
+from app.main import app
+from app.models.model_user import User
+from app.schemas.user import IsActiveEnum
+
+client = TestClient(app)
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+os.environ["DATABASE_URL"] = SQLALCHEMY_DATABASE_URL
+os.environ['TEST_DATABASE'] = 'true'
+
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+app.dependency_overrides[get_db] = override_get_db
+
+@pytest.fixture
+def mock_user():
+    user = User(
+        user_id=1,
+        user_name="felipeteste",
+        email="teste@gmail.com.br",
+        password="hashed_password",  # Não importa para o teste
+        cpf="12345678910",
+        created_at=datetime.now(),
+        updated_at=datetime.now(),
+        is_active=IsActiveEnum.active,
+        role="admin"
+    )
+    return user
+
+# Sobrescrever a dependência para os testes
+@pytest.fixture(autouse=True)
+def override_dependency(mock_user):
+    # Substitui a função get_current_active_user pelo mock
+    app.dependency_overrides[get_current_active_user] = lambda: mock_user
+    yield
+    # Limpar após os testes
+    app.dependency_overrides.clear()
+
+def test_list_endpoints_paginate_with_keyset_cursor():
+    configurar_banco(SQLALCHEMY_DATABASE_URL)
+    for year in range(2020, 2025):
+        client.post("/vehicle", json={"model": "Audi", "prod_date": f"{year}-01-01", "year": year, "propulsion": "gas"})
+    client.request("DELETE", "/vehicle/id/2", json={"vehicle_id": 2})
+
+    first = client.get("/vehicle/", params={"limit": 2}).json()
+    assert [vehicle["vehicle_id"] for vehicle in first["items"]] == [1, 3]
+    assert first["next_cursor"] is not None
+
+    # A próxima página continua após o último id, mesmo com ids removidos ou inseridos antes do cursor
+    client.post("/vehicle", json={"model": "Fiat", "prod_date": "2025-01-01", "year": 2025, "propulsion": "gas"})
+    second = client.get("/vehicle/", params={"limit": 2, "cursor": first["next_cursor"]}).json()
+    assert [vehicle["vehicle_id"] for vehicle in second["items"]] == [4, 5]
+    third = client.get("/vehicle/", params={"limit": 2, "cursor": second["next_cursor"]}).json()
+    assert [vehicle["vehicle_id"] for vehicle in third["items"]] == [6]
+    assert third["next_cursor"] is None
+
+    # Cursores malformados ou de outra listagem são rejeitados
+    assert client.get("/vehicle/", params={"cursor": "abc"}).status_code == 400
+    assert client.get("/part/", params={"cursor": first["next_cursor"]}).status_code == 400
+    assert client.get("/vehicle/", params={"limit": 0}).status_code == 422
+
+def test_bulk_create_reports_row_errors_and_maintains_rollups():
+    configurar_banco(SQLALCHEMY_DATABASE_URL)
+    client.post("/analytics/rollups/rebuild")
+    vehicles = [
+        {"model": "Audi", "prod_date": "2023-01-01", "year": 2023, "propulsion": "gas"},
+        {"model": "Fiat", "prod_date": "2023-01-01", "year": "dois mil", "propulsion": "gas"},
+        {"model": "Fiat", "prod_date": "2022-01-01", "year": 2022, "propulsion": "hybrid"},
+    ]
+    response = client.post("/vehicle/bulk", json=vehicles)
+    assert response.status_code == 201
+    assert response.json()["created"] == 2
+    assert response.json()["ids"] == [1, 2]
+    assert [error["index"] for error in response.json()["errors"]] == [1]
+    assert response.json()["errors"][0]["errors"][0]["loc"] == ["year"]
+
+    # Com atomic, qualquer linha inválida recusa a carga inteira
+    response = client.post("/vehicle/bulk", params={"atomic": True}, json=vehicles)
+    assert response.status_code == 422
+    assert len(client.get("/vehicle/").json()["items"]) == 2
+    assert client.post("/vehicle/bulk", json={"model": "Audi"}).status_code == 422
+
+    warranty = {
+        "vehicle_id": 1,
+        "repair_date": "2023-03-01",
+        "client_comment": "cliente",
+        "tech_comment": "técnico",
+        "part_id": 1,
+        "classified_failured": "falha",
+        "location_id": 1,
+        "purchase_id": 1,
+    }
+    response = client.post("/warranty/bulk", json=[warranty, {**warranty, "repair_date": "2023-04-01"}, {**warranty, "vehicle_id": 2}])
+    assert response.json()["created"] == 3
+
+    # As rollups são atualizadas na mesma transação da carga
+    data = client.get("/analytics/vehicle_model/Audi", params={"source": "db"}).json()
+    assert data["warranty_stats"]["total_claims"] == 2
+
+def test_bulk_create_rejects_oversize_bodies_before_validating_rows(monkeypatch):
+    configurar_banco(SQLALCHEMY_DATABASE_URL)
+    monkeypatch.setattr("app.utils.bulk.BULK_MAX_ROWS", 2)
+    # Linhas inválidas: o tamanho da lista é recusado antes de qualquer validação por linha
+    response = client.post("/vehicle/bulk", json=[{"model": "Audi"}] * 3)
+    assert response.status_code == 422
+    assert [error["type"] for error in response.json()["detail"]["errors"][0]["errors"]] == ["too_long"]
+    assert client.post("/vehicle/bulk", content=b"[{", headers={"Content-Type": "application/json"}).status_code == 422
+
+    monkeypatch.setattr("app.utils.bulk.BULK_MAX_BODY_BYTES", 100)
+    body = json.dumps([{"model": "Audi", "prod_date": "2023-01-01", "year": 2023, "propulsion": "gas"}] * 2).encode()
+    response = client.post("/vehicle/bulk", content=body, headers={"Content-Type": "application/json"})
+    assert response.status_code == 413
+
+    # Sem Content-Length (chunked), a leitura para ao passar do limite
+    def chunks():
+        yield body[:60]
+        yield body[60:]
+
+    response = client.post("/vehicle/bulk", content=chunks(), headers={"Content-Type": "application/json"})
+    assert response.status_code == 413
+    assert client.get("/vehicle/").json()["items"] == []
+
+def test_batch_get_resolves_ids_in_order_with_one_query():
+    configurar_banco(SQLALCHEMY_DATABASE_URL)
+    client.post("/vehicle/bulk", json=[
+        {"model": model, "prod_date": "2023-01-01", "year": 2023, "propulsion": "gas"}
+        for model in ["Audi", "Fiat", "Ford"]
+    ])
+
+    statements = []
+
+    def listener(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(app_engine, "before_cursor_execute", listener)
+    try:
+        response = client.get("/vehicle/batch", params={"ids": "3,9,1,3"})
+    finally:
+        event.remove(app_engine, "before_cursor_execute", listener)
+    assert response.status_code == 200
+    assert [vehicle["model"] for vehicle in response.json()["items"]] == ["Ford", "Audi"]
+    assert response.json()["missing"] == [9]
+    assert len([statement for statement in statements if "FROM vehicles" in statement]) == 1
+
+    response = client.post("/vehicle/batch", json={"ids": [2, 1]})
+    assert [vehicle["vehicle_id"] for vehicle in response.json()["items"]] == [2, 1]
+    assert client.get("/vehicle/batch", params={"ids": "1,a"}).status_code == 422
+    assert client.get("/vehicle/batch").status_code == 422
+
+def test_conditional_get_answers_304_from_table_versions(monkeypatch):
+    configurar_banco(SQLALCHEMY_DATABASE_URL)
+    client.post("/vehicle", json={"model": "Audi", "prod_date": "2023-01-01", "year": 2023, "propulsion": "gas"})
+
+    response = client.get("/vehicle/")
+    etag = response.headers["etag"]
+    assert response.headers["cache-control"] == "public, no-cache"
+    assert client.get("/vehicle/", params={"limit": 5}).headers["etag"] != etag
+
+    # O 304 sai antes de qualquer consulta ao banco
+    statements = []
+
+    def listener(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(app_engine, "before_cursor_execute", listener)
+    try:
+        response = client.get("/vehicle/", headers={"If-None-Match": etag})
+    finally:
+        event.remove(app_engine, "before_cursor_execute", listener)
+    assert response.status_code == 304 and response.content == b""
+    assert response.headers["etag"] == etag
+    assert statements == []
+
+    # Last-Modified só é enviado depois que o segundo do último commit passou
+    monkeypatch.setattr("app.configs.conditional.time.time", lambda: 4102444800)
+    last_modified = client.get("/vehicle/id/1").headers["last-modified"]
+    assert client.get("/vehicle/id/1", headers={"If-Modified-Since": last_modified}).status_code == 304
+
+    # Um commit na tabela muda os validadores
+    client.post("/vehicle", json={"model": "Fiat", "prod_date": "2023-01-01", "year": 2023, "propulsion": "gas"})
+    response = client.get("/vehicle/", headers={"If-None-Match": etag})
+    assert response.status_code == 200 and len(response.json()["items"]) == 2
+    assert response.headers["etag"] != etag
+
+def test_conditional_get_etag_is_not_reused_by_another_boot(monkeypatch):
+    configurar_banco(SQLALCHEMY_DATABASE_URL)
+    client.post("/vehicle", json={"model": "Audi", "prod_date": "2023-01-01", "year": 2023, "propulsion": "gas"})
+
+    def boot():
+        # Processo novo com o backend em memória: contadores do zero e o mesmo número de commits
+        versions = TableVersions(MemoryBackend(max_entries=0))
+        versions.bump_all()
+        versions.bump("vehicles")
+        monkeypatch.setattr("app.configs.conditional.table_versions", versions)
+
+    boot()
+    etag = client.get("/vehicle/").headers["etag"]
+    assert client.get("/vehicle/", headers={"If-None-Match": etag}).status_code == 304
+
+    # Depois de reiniciar (ou em outro worker) o mesmo ETag não pode validar outros dados
+    boot()
+    response = client.get("/vehicle/", headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["etag"] != etag
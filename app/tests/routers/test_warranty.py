@@ -0,0 +1,171 @@
+from datetime import datetime
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+import pytest
+import os
+
+from app.configs.auth import get_current_active_user
+from app.configs.database import get_db, engine as app_engine
+from app.configs.config import configurar_banco
+from app.main import app
+from app.models.model_user import User
+from app.schemas.user import IsActiveEnum
+
+client = TestClient(app)
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+os.environ["DATABASE_URL"] = SQLALCHEMY_DATABASE_URL
+os.environ['TEST_DATABASE'] = 'true'
+
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+app.dependency_overrides[get_db] = override_get_db
+
+@pytest.fixture
+def mock_user():
+    user = User(
+        user_id=1,
+        user_name="felipeteste",
+        email="teste@gmail.com.br",
+        password="hashed_password",  # Não importa para o teste
+        cpf="12345678910",
+        created_at=datetime.now(),
+        updated_at=datetime.now(),
+        is_active=IsActiveEnum.active,
+        role="admin"
+    )
+    return user
+
+# Sobrescrever a dependência para os testes
+@pytest.fixture(autouse=True)
+def override_dependency(mock_user):
+    # Substitui a função get_current_active_user pelo mock
+    app.dependency_overrides[get_current_active_user] = lambda: mock_user
+    yield
+    # Limpar após os testes
+    app.dependency_overrides.clear()
+
+def test_ingest_file_validates_rows_and_foreign_keys_in_batches(monkeypatch):
+    configurar_banco(SQLALCHEMY_DATABASE_URL)
+    monkeypatch.setattr("app.utils.ingest.INGEST_CHUNK_SIZE", 2)
+    client.post("location/", json={"market": "latin_america", "country": "Brasil", "province": "Ceará", "city": "Sobral"})
+    client.post("/supplier", json={"supplier_name": "felipe motos", "supplier_cpf": "12345678910", "location_id": 1})
+    client.post("/part", json={"part_name": "pneu", "last_id_purchase": 1, "supplier_id": 1})
+    client.post("/vehicle", json={"model": "Audi", "prod_date": "2023-01-01", "year": 2023, "propulsion": "gas"})
+    client.post("/purchases", json={"purchase_type": "bulk", "purchase_date": "2023-01-05", "part_id": 1})
+
+    csv_file = (
+        "vehicle_id,repair_date,client_comment,tech_comment,part_id,classified_failured,location_id,purchase_id\n"
+        "1,2023-03-01,cliente,técnico,1,falha,1,1\n"
+        "1,ontem,cliente,técnico,1,falha,1,1\n"
+        "1,2023-03-02,,técnico,9,falha,1,1\n"
+        "1,2023-04-01,\"cliente, com vírgula\",técnico,1,falha,1,1\n"
+    )
+    response = client.post("/warranty/ingest", files={"file": ("garantias.csv", csv_file.encode())})
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["rows"], report["loaded"], report["rejected"]) == (4, 2, 2)
+    assert [error["line"] for error in report["errors"]] == [3, 4]
+    assert report["errors"][0]["errors"][0]["loc"] == ["repair_date"]
+    assert report["errors"][1]["errors"][0] == {"type": "foreign_key", "loc": ["part_id"], "msg": "part_id 9 não existe em parts"}
+    comments = [warranty["client_comment"] for warranty in client.get("/warranty/", params={"fields": "client_comment"}).json()["items"]]
+    assert comments == ["cliente", "cliente, com vírgula"]
+
+    ndjson_file = b'{"purchase_type": "bulk", "purchase_date": "2023-02-05", "part_id": 1}\n\n{"purchase_type": "bulk"\n'
+    response = client.post("/purchases/ingest", params={"format": "ndjson"}, files={"file": ("compras.txt", ndjson_file)})
+    report = response.json()
+    assert (report["loaded"], report["rejected"]) == (1, 1)
+    assert report["errors"][0]["line"] == 3
+    assert client.post("/purchases/ingest", files={"file": ("compras.txt", ndjson_file)}).status_code == 415
+
+def test_bulk_update_and_delete_apply_one_statement_with_dry_run():
+    configurar_banco(SQLALCHEMY_DATABASE_URL)
+    client.post("/analytics/rollups/rebuild")
+    client.post("/vehicle/bulk", json=[
+        {"model": "Audi", "prod_date": "2023-01-01", "year": 2023, "propulsion": "gas"},
+        {"model": "Fiat", "prod_date": "2022-01-01", "year": 2022, "propulsion": "hybrid"},
+    ])
+    warranty = {
+        "vehicle_id": 1,
+        "repair_date": "2023-03-01",
+        "client_comment": "cliente",
+        "tech_comment": "técnico",
+        "part_id": 1,
+        "classified_failured": "falha",
+        "location_id": 1,
+        "purchase_id": 1,
+    }
+    client.post("/warranty/bulk", json=[warranty, {**warranty, "repair_date": "2023-04-01"}, {**warranty, "vehicle_id": 2}])
+
+    bulk = {"where": {"classified_failured": "falha", "vehicle_id": 1}, "patch": {"classified_failured": "desgaste"}}
+    response = client.patch("/warranty/bulk", params={"dry_run": True}, json=bulk)
+    assert response.json() == {"matched": 2, "dry_run": True}
+    assert {item["classified_failured"] for item in client.get("/warranty/").json()["items"]} == {"falha"}
+
+    response = client.patch("/warranty/bulk", json=bulk)
+    assert response.json() == {"matched": 2, "dry_run": False}
+    assert [item["classified_failured"] for item in client.get("/warranty/").json()["items"]] == ["desgaste", "desgaste", "falha"]
+
+    # Sem seleção, com campo desconhecido ou com patch vazio, nada é alterado
+    assert client.patch("/warranty/bulk", json={"patch": {"tech_comment": "x"}}).status_code == 422
+    assert client.patch("/warranty/bulk", json={"where": {"cor": "azul"}, "patch": {"tech_comment": "x"}}).status_code == 422
+    assert client.patch("/warranty/bulk", json={"ids": [1], "patch": {}}).status_code == 422
+
+    # Mudar o modelo dos veículos move as garantias entre as rollups
+    response = client.patch("/vehicle/bulk", json={"ids": [1], "patch": {"model": "Fiat"}})
+    assert response.json()["matched"] == 1
+    assert client.get("/analytics/vehicle_model/Fiat", params={"source": "db"}).json()["warranty_stats"]["total_claims"] == 3
+
+    response = client.request("DELETE", "/warranty/bulk", json={"ids": [1, 2, 99]})
+    assert response.json() == {"matched": 2, "dry_run": False}
+    assert [item["claim_key"] for item in client.get("/warranty/").json()["items"]] == [3]
+    assert client.get("/analytics/vehicle_model/Fiat", params={"source": "db"}).json()["warranty_stats"]["total_claims"] == 1
+
+def test_fields_narrow_select_and_defer_warranty_comments():
+    configurar_banco(SQLALCHEMY_DATABASE_URL)
+    client.post("/vehicle", json={"model": "Audi", "prod_date": "2023-01-01", "year": 2023, "propulsion": "gas"})
+    warranty = {
+        "vehicle_id": 1,
+        "repair_date": "2023-03-01",
+        "client_comment": "cliente",
+        "tech_comment": "técnico",
+        "part_id": 1,
+        "classified_failured": "falha",
+        "location_id": 1,
+        "purchase_id": 1,
+    }
+    client.post("/warranty/bulk", json=[warranty, {**warranty, "repair_date": "2023-04-01"}])
+
+    statements = []
+
+    def listener(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(app_engine, "before_cursor_execute", listener)
+    try:
+        # Comentários adiados por padrão: nem no SELECT, nem na resposta
+        items = client.get("/warranty/").json()["items"]
+        assert "client_comment" not in items[0] and items[0]["classified_failured"] == "falha"
+        assert "client_comment" not in statements[-1]
+
+        items = client.get("/warranty/", params={"fields": "repair_date,tech_comment"}).json()["items"]
+        assert items[0] == {"claim_key": 1, "repair_date": "2023-03-01T00:00:00", "tech_comment": "técnico"}
+        assert "tech_comment" in statements[-1] and "client_comment" not in statements[-1] and "vehicle_id" not in statements[-1]
+    finally:
+        event.remove(app_engine, "before_cursor_execute", listener)
+
+    assert client.get("/warranty/id/1", params={"claim_key": 1, "fields": "*"}).json()["client_comment"] == "cliente"
+    assert client.get("/warranty/batch", params={"ids": "2", "fields": "client_comment"}).json()["items"] == [{"claim_key": 2, "client_comment": "cliente"}]
+    assert client.get("/warranty/", params={"fields": "cor"}).status_code == 422
@@ -0,0 +1,283 @@
+from fastapi import Depends
+from sqlalchemy import Integer, and_, case, cast, extract, func
+from sqlalchemy.orm import Session
+
+from app.configs.database import get_db
+from app.models.model_location import Location
+from app.models.model_part import Part
+from app.models.model_purchase import Purchase
+from app.models.model_rollup import PurchaseRollup, SupplierRollup, WarrantyClaimRollup
+from app.models.model_supplier import Supplier
+from app.models.model_vehicle import Vehicle
+from app.models.model_warranty import Warranty
+from app.schemas.analytical import TimeWindow
+from app.schemas.purchase import PurchaseEnum
+from app.schemas.vehicle import PropulsionEnum
+
+def window_criteria(column, window: TimeWindow = None) -> list:
+    # Comparações diretas com a coluna de data, que podem usar os índices sobre ela
+    criteria = []
+    if window is not None and window.start is not None:
+        criteria.append(column >= window.start)
+    if window is not None and window.end is not None:
+        criteria.append(column < window.end)
+    return criteria
+
+def _supplier_stats_by_province_subquery(province:str, db: Session, use_rollups: bool = False, window: TimeWindow = None):
+    # Uma linha por fornecedor da província, com os contadores de peças e compras já agregados no banco
+    supplier_columns = (
+        Supplier.supplier_id.label("supplier_id"),
+        Supplier.supplier_name.label("supplier_name"),
+        Supplier.supplier_cpf.label("supplier_cpf"),
+        Supplier.location_id.label("location_id"),
+        Location.market.label("market"),
+        Location.country.label("country"),
+        Location.province.label("province"),
+        Location.city.label("city"),
+    )
+    if use_rollups:
+        # Contadores mantidos em rollup_suppliers: apenas uma busca indexada por fornecedor
+        return (
+            db.query(
+                *supplier_columns,
+                func.coalesce(SupplierRollup.total_parts, 0).label("total_parts"),
+                func.coalesce(SupplierRollup.total_purchases, 0).label("total_purchases"),
+                func.coalesce(SupplierRollup.bulk_purchases, 0).label("bulk_purchases"),
+                func.coalesce(SupplierRollup.warranty_purchases, 0).label("warranty_purchases"),
+            )
+            .join(Location, Location.location_id == Supplier.location_id)
+            .outerjoin(SupplierRollup, SupplierRollup.supplier_id == Supplier.supplier_id)
+            .filter(Location.province == province)
+            .subquery()
+        )
+    return (
+        db.query(
+            *supplier_columns,
+            func.count(func.distinct(Part.part_id)).label("total_parts"),
+            func.count(Purchase.purchase_id).label("total_purchases"),
+            func.coalesce(func.sum(case((Purchase.purchase_type == PurchaseEnum.bulk, 1), else_=0)), 0).label("bulk_purchases"),
+            func.coalesce(func.sum(case((Purchase.purchase_type == PurchaseEnum.warranty, 1), else_=0)), 0).label("warranty_purchases"),
+        )
+        .join(Location, Location.location_id == Supplier.location_id)
+        .outerjoin(Part, Part.supplier_id == Supplier.supplier_id)
+        # O intervalo entra na junção para que fornecedores sem compras no período continuem na lista
+        .outerjoin(Purchase, and_(Purchase.part_id == Part.part_id, *window_criteria(Purchase.purchase_date, window)))
+        .filter(Location.province == province)
+        .group_by(Supplier.supplier_id, Location.location_id)
+        .subquery()
+    )
+
+def get_province_totals_util(province:str, use_rollups: bool = False, window: TimeWindow = None, db: Session = Depends(get_db)):
+    stats = _supplier_stats_by_province_subquery(province, db, use_rollups, window)
+    return db.query(
+        func.count(stats.c.supplier_id).label("total_suppliers"),
+        func.coalesce(func.sum(stats.c.total_parts), 0).label("total_parts"),
+        func.coalesce(func.sum(stats.c.total_purchases), 0).label("total_purchases"),
+        func.coalesce(func.sum(stats.c.bulk_purchases), 0).label("bulk_purchases"),
+        func.coalesce(func.sum(stats.c.warranty_purchases), 0).label("warranty_purchases"),
+    ).one()
+
+def get_province_suppliers_by_market_util(province:str, db: Session = Depends(get_db)):
+    # Mercados sem fornecedores também aparecem, com contagem zero
+    return (
+        db.query(Location.market, func.count(Supplier.supplier_id).label("total_suppliers"))
+        .outerjoin(Supplier, Supplier.location_id == Location.location_id)
+        .filter(Location.province == province)
+        .group_by(Location.market)
+        .all()
+    )
+
+def get_province_top_suppliers_util(province:str, limit:int = 5, use_rollups: bool = False, window: TimeWindow = None, db: Session = Depends(get_db)):
+    stats = _supplier_stats_by_province_subquery(province, db, use_rollups, window)
+    return (
+        db.query(stats)
+        .order_by(stats.c.total_purchases.desc(), stats.c.supplier_id)
+        .limit(limit)
+        .all()
+    )
+
+def days_to_failure_expression(db: Session):
+    # Dias inteiros entre a produção do veículo e o reparo, equivalente a timedelta.days para valores positivos
+    if db.get_bind().dialect.name == "sqlite":
+        return cast(func.julianday(Warranty.repair_date) - func.julianday(Vehicle.prod_date), Integer)
+    return extract("day", Warranty.repair_date - Vehicle.prod_date)
+
+def get_supplier_parts_warranty_stats_util(supplier_id:int, window: TimeWindow = None, db: Session = Depends(get_db)):
+    # Uma linha por peça do fornecedor, inclusive as que não possuem garantias
+    days_to_failure = days_to_failure_expression(db)
+    return (
+        db.query(
+            Part.part_id,
+            Part.part_name,
+            func.count(Warranty.claim_key).label("total_claims"),
+            func.count(func.distinct(Vehicle.vehicle_id)).label("affected_vehicles"),
+            func.avg(case((days_to_failure > 0, days_to_failure))).label("avg_time_to_failure_days"),
+        )
+        # O intervalo entra na junção para que peças sem garantias no período continuem na lista
+        .outerjoin(Warranty, and_(Warranty.part_id == Part.part_id, *window_criteria(Warranty.repair_date, window)))
+        .outerjoin(Vehicle, Vehicle.vehicle_id == Warranty.vehicle_id)
+        .filter(Part.supplier_id == supplier_id)
+        .group_by(Part.part_id)
+        .all()
+    )
+
+def get_supplier_parts_warranty_breakdown_util(supplier_id:int, window: TimeWindow = None, db: Session = Depends(get_db)):
+    # Garantias das peças do fornecedor agrupadas por peça, modelo, propulsão, ano e classificação.
+    # vehicle_claims desconsidera garantias cujo veículo não existe mais
+    return (
+        db.query(
+            Warranty.part_id,
+            Vehicle.model,
+            Vehicle.propulsion,
+            Vehicle.year,
+            Warranty.classified_failured,
+            func.count(Warranty.claim_key).label("claims"),
+            func.count(Vehicle.vehicle_id).label("vehicle_claims"),
+        )
+        .join(Part, Part.part_id == Warranty.part_id)
+        .outerjoin(Vehicle, Vehicle.vehicle_id == Warranty.vehicle_id)
+        .filter(Part.supplier_id == supplier_id, *window_criteria(Warranty.repair_date, window))
+        .group_by(Warranty.part_id, Vehicle.model, Vehicle.propulsion, Vehicle.year, Warranty.classified_failured)
+        .all()
+    )
+
+def _part_claims_query(db: Session, window: TimeWindow, *vehicle_criteria):
+    # Garantias agrupadas por peça para os veículos que satisfazem os critérios
+    return (
+        db.query(
+            Warranty.part_id,
+            Part.part_name,
+            func.count(Warranty.claim_key).label("claims"),
+            func.count(func.distinct(Warranty.vehicle_id)).label("vehicles_affected"),
+        )
+        .join(Vehicle, Vehicle.vehicle_id == Warranty.vehicle_id)
+        .outerjoin(Part, Part.part_id == Warranty.part_id)
+        .filter(*vehicle_criteria, *window_criteria(Warranty.repair_date, window))
+        .group_by(Warranty.part_id, Part.part_name)
+        .order_by(func.count(Warranty.claim_key).desc(), Warranty.part_id)
+    )
+
+def get_vehicle_counts_by_model_util(model:str, db: Session = Depends(get_db)):
+    return (
+        db.query(Vehicle.propulsion, Vehicle.year, func.count(Vehicle.vehicle_id).label("vehicles"))
+        .filter(Vehicle.model == model)
+        .group_by(Vehicle.propulsion, Vehicle.year)
+        .order_by(Vehicle.propulsion, Vehicle.year)
+        .all()
+    )
+
+def get_part_claims_by_vehicle_model_util(model:str, use_rollups: bool = False, window: TimeWindow = None, db: Session = Depends(get_db)):
+    if use_rollups:
+        claims = func.sum(WarrantyClaimRollup.claims)
+        return (
+            db.query(WarrantyClaimRollup.part_id, Part.part_name, claims.label("claims"))
+            .outerjoin(Part, Part.part_id == WarrantyClaimRollup.part_id)
+            .filter(WarrantyClaimRollup.model == model)
+            .group_by(WarrantyClaimRollup.part_id, Part.part_name)
+            .order_by(claims.desc(), WarrantyClaimRollup.part_id)
+            .all()
+        )
+    return _part_claims_query(db, window, Vehicle.model == model).all()
+
+def get_vehicle_counts_by_propulsion_util(propulsion:PropulsionEnum, db: Session = Depends(get_db)):
+    return (
+        db.query(Vehicle.model, func.count(Vehicle.vehicle_id).label("vehicles"))
+        .filter(Vehicle.propulsion == propulsion)
+        .group_by(Vehicle.model)
+        .order_by(func.count(Vehicle.vehicle_id).desc(), Vehicle.model)
+        .all()
+    )
+
+def get_part_claims_by_propulsion_util(propulsion:PropulsionEnum, window: TimeWindow = None, db: Session = Depends(get_db)):
+    return _part_claims_query(db, window, Vehicle.propulsion == propulsion).all()
+
+def get_part_models_by_propulsion_util(propulsion:PropulsionEnum, window: TimeWindow = None, db: Session = Depends(get_db)):
+    # Pares distintos (peça, modelo) com garantia para a propulsão informada
+    return (
+        db.query(Warranty.part_id, Vehicle.model)
+        .join(Vehicle, Vehicle.vehicle_id == Warranty.vehicle_id)
+        .filter(Vehicle.propulsion == propulsion, *window_criteria(Warranty.repair_date, window))
+        .distinct()
+        .order_by(Warranty.part_id, Vehicle.model)
+        .all()
+    )
+
+def month_expression(column, db: Session):
+    # Trunca a data para o mês no formato 'YYYY-MM' usando a função nativa de cada banco
+    if db.get_bind().dialect.name == "sqlite":
+        return func.strftime("%Y-%m", column)
+    return func.to_char(func.date_trunc("month", column), "YYYY-MM")
+
+def get_purchase_summary_by_type_util(purchase_type:PurchaseEnum, use_rollups: bool = False, window: TimeWindow = None, db: Session = Depends(get_db)):
+    if use_rollups:
+        return (
+            db.query(
+                func.coalesce(func.sum(PurchaseRollup.purchases), 0).label("total_count"),
+                func.min(PurchaseRollup.first_purchase_date).label("first_purchase_date"),
+                func.max(PurchaseRollup.last_purchase_date).label("last_purchase_date"),
+            )
+            .filter(PurchaseRollup.purchase_type == purchase_type)
+            .one()
+        )
+    return (
+        db.query(
+            func.count(Purchase.purchase_id).label("total_count"),
+            func.min(Purchase.purchase_date).label("first_purchase_date"),
+            func.max(Purchase.purchase_date).label("last_purchase_date"),
+        )
+        .filter(Purchase.purchase_type == purchase_type, *window_criteria(Purchase.purchase_date, window))
+        .one()
+    )
+
+def get_purchase_monthly_trend_by_type_util(purchase_type:PurchaseEnum, use_rollups: bool = False, window: TimeWindow = None, db: Session = Depends(get_db)):
+    if use_rollups:
+        return (
+            db.query(PurchaseRollup.month, func.sum(PurchaseRollup.purchases).label("count"))
+            .filter(PurchaseRollup.purchase_type == purchase_type)
+            .group_by(PurchaseRollup.month)
+            .order_by(PurchaseRollup.month)
+            .all()
+        )
+    # O mês é calculado em uma subconsulta para que o GROUP BY referencie apenas a coluna resultante
+    months = (
+        db.query(month_expression(Purchase.purchase_date, db).label("month"))
+        .filter(Purchase.purchase_type == purchase_type, *window_criteria(Purchase.purchase_date, window))
+        .subquery()
+    )
+    return (
+        db.query(months.c.month, func.count().label("count"))
+        .group_by(months.c.month)
+        .order_by(months.c.month)
+        .all()
+    )
+
+def get_top_parts_by_purchase_type_util(purchase_type:PurchaseEnum, limit:int = 5, use_rollups: bool = False, window: TimeWindow = None, db: Session = Depends(get_db)):
+    if use_rollups:
+        count = func.sum(PurchaseRollup.purchases)
+        return (
+            db.query(Part.part_id, Part.part_name, count.label("count"))
+            .join(Part, Part.part_id == PurchaseRollup.part_id)
+            .filter(PurchaseRollup.purchase_type == purchase_type)
+            .group_by(Part.part_id)
+            .order_by(count.desc(), Part.part_id)
+            .limit(limit)
+            .all()
+        )
+    return (
+        db.query(Part.part_id, Part.part_name, func.count(Purchase.purchase_id).label("count"))
+        .join(Part, Part.part_id == Purchase.part_id)
+        .filter(Purchase.purchase_type == purchase_type, *window_criteria(Purchase.purchase_date, window))
+        .group_by(Part.part_id)
+        .order_by(func.count(Purchase.purchase_id).desc(), Part.part_id)
+        .limit(limit)
+        .all()
+    )
+
+def get_distinct_provinces_util(db: Session = Depends(get_db)) -> list:
+    return [province for (province,) in db.query(Location.province).filter(Location.province.isnot(None)).distinct().order_by(Location.province)]
+
+def get_distinct_vehicle_models_util(db: Session = Depends(get_db)) -> list:
+    return [model for (model,) in db.query(Vehicle.model).filter(Vehicle.model.isnot(None)).distinct().order_by(Vehicle.model)]
+
+def get_distinct_supplier_names_util(db: Session = Depends(get_db)) -> list:
+    return [name for (name,) in db.query(Supplier.supplier_name).filter(Supplier.supplier_name.isnot(None)).distinct().order_by(Supplier.supplier_name)]
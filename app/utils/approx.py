@@ -0,0 +1,153 @@
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+
+from fastapi import Depends
+from sqlalchemy import and_, func
+from sqlalchemy.orm import Session
+
+from app.configs.database import get_db
+from app.models.model_part import Part
+from app.models.model_rollup import WarrantySketchRollup
+from app.schemas.analytical import TimeWindow
+from app.schemas.vehicle import PropulsionEnum
+from app.utils.sketches import HyperLogLog, TDigest
+from app.utils.snapshot import PartClaims, PartModel
+
+# Quantis de dias até a falha reportados no modo aproximado
+DAYS_TO_FAILURE_QUANTILES = {"p50": 0.5, "p90": 0.9, "p99": 0.99}
+
+PartWarrantyStatsApprox = namedtuple(
+    "PartWarrantyStatsApprox",
+    ["part_id", "part_name", "total_claims", "affected_vehicles", "avg_time_to_failure_days", "days_to_failure_quantiles"],
+)
+
+def window_months(window: TimeWindow = None):
+    """
+    Meses (YYYY-MM) cobertos pelo intervalo. As partições dos sketches são mensais, então um intervalo
+    que começa ou termina no meio de um mês inclui o mês inteiro.
+    """
+    if window is None:
+        return None, None
+    first = window.start.strftime("%Y-%m") if window.start is not None else None
+    # `to` é exclusivo: o último mês é o do instante imediatamente anterior
+    last = (window.end - timedelta(microseconds=1)).strftime("%Y-%m") if window.end is not None else None
+    return first, last
+
+def _month_criteria(window: TimeWindow = None) -> list:
+    first, last = window_months(window)
+    criteria = []
+    if first is not None:
+        criteria.append(WarrantySketchRollup.month >= first)
+    if last is not None:
+        criteria.append(WarrantySketchRollup.month <= last)
+    return criteria
+
+def approximation_bounds(window: TimeWindow = None, distinct_vehicles: bool = False, quantiles: bool = False) -> dict:
+    """
+    Limites de erro das respostas do modo aproximado, só para o que a resposta de fato estima.
+    Contagens de garantias são somas exatas das partições dos meses inteiros do intervalo; com `distinct_vehicles`,
+    a resposta traz veículos distintos do HyperLogLog e, com `quantiles`, quantis do t-digest.
+    """
+    first, last = window_months(window)
+    bounds = {
+        "method": "sketches",
+        "months": {"from": first, "to": last},
+        "claims": "exact",
+    }
+    if distinct_vehicles:
+        bounds["distinct_vehicles_relative_error"] = round(HyperLogLog().relative_error, 4)
+    if quantiles:
+        digest = TDigest()
+        bounds["avg_time_to_failure_days"] = "exact"
+        bounds["days_to_failure_quantile_rank_error"] = {
+            label: round(digest.rank_error(q), 4) for label, q in DAYS_TO_FAILURE_QUANTILES.items()
+        }
+    return bounds
+
+def _part_claims_from_sketches(partitions) -> list:
+    # Soma as contagens e une os HyperLogLogs das partições de cada peça
+    claims = defaultdict(int)
+    vehicles = {}
+    names = {}
+    for partition in partitions:
+        claims[partition.part_id] += partition.claims
+        names[partition.part_id] = partition.part_name
+        sketch = HyperLogLog.from_bytes(partition.vehicles_sketch)
+        if partition.part_id in vehicles:
+            vehicles[partition.part_id].merge(sketch)
+        else:
+            vehicles[partition.part_id] = sketch
+    rows = [
+        PartClaims(part_id, names[part_id], count, vehicles[part_id].estimate())
+        for part_id, count in claims.items()
+    ]
+    rows.sort(key=lambda row: (-row.claims, row.part_id is None, row.part_id))
+    return rows
+
+def get_part_claims_by_vehicle_model_approx_util(model: str, window: TimeWindow = None, db: Session = Depends(get_db)) -> list:
+    claims = func.sum(WarrantySketchRollup.claims)
+    return (
+        db.query(WarrantySketchRollup.part_id, Part.part_name, claims.label("claims"))
+        .outerjoin(Part, Part.part_id == WarrantySketchRollup.part_id)
+        .filter(WarrantySketchRollup.model == model, *_month_criteria(window))
+        .group_by(WarrantySketchRollup.part_id, Part.part_name)
+        .order_by(claims.desc(), WarrantySketchRollup.part_id)
+        .all()
+    )
+
+def get_part_claims_by_propulsion_approx_util(propulsion: PropulsionEnum, window: TimeWindow = None, db: Session = Depends(get_db)) -> list:
+    partitions = (
+        db.query(WarrantySketchRollup.part_id, Part.part_name, WarrantySketchRollup.claims, WarrantySketchRollup.vehicles_sketch)
+        .outerjoin(Part, Part.part_id == WarrantySketchRollup.part_id)
+        .filter(WarrantySketchRollup.propulsion == propulsion, *_month_criteria(window))
+        .all()
+    )
+    return _part_claims_from_sketches(partitions)
+
+def get_part_models_by_propulsion_approx_util(propulsion: PropulsionEnum, window: TimeWindow = None, db: Session = Depends(get_db)) -> list:
+    # O modelo faz parte da chave da partição, então os pares (peça, modelo) são exatos
+    rows = (
+        db.query(WarrantySketchRollup.part_id, WarrantySketchRollup.model)
+        .filter(WarrantySketchRollup.propulsion == propulsion, *_month_criteria(window))
+        .distinct()
+        .order_by(WarrantySketchRollup.part_id, WarrantySketchRollup.model)
+        .all()
+    )
+    return [PartModel(row.part_id, row.model) for row in rows]
+
+def get_supplier_parts_warranty_stats_approx_util(supplier_id: int, window: TimeWindow = None, db: Session = Depends(get_db)) -> list:
+    # Uma linha por peça do fornecedor, inclusive as que não possuem garantias no período
+    partitions = (
+        db.query(
+            Part.part_id,
+            Part.part_name,
+            WarrantySketchRollup.claims,
+            WarrantySketchRollup.vehicles_sketch,
+            WarrantySketchRollup.days_sketch,
+        )
+        .outerjoin(WarrantySketchRollup, and_(WarrantySketchRollup.part_id == Part.part_id, *_month_criteria(window)))
+        .filter(Part.supplier_id == supplier_id)
+        .order_by(Part.part_id)
+        .all()
+    )
+
+    parts = {}
+    for partition in partitions:
+        part = parts.setdefault(partition.part_id, [partition.part_name, 0, HyperLogLog(), TDigest()])
+        if partition.claims is None:
+            continue
+        part[1] += partition.claims
+        part[2].merge(HyperLogLog.from_bytes(partition.vehicles_sketch))
+        part[3].merge(TDigest.from_bytes(partition.days_sketch))
+
+    return [
+        PartWarrantyStatsApprox(
+            part_id,
+            part_name,
+            claims,
+            vehicles.estimate(),
+            days.mean(),
+            {label: days.quantile(q) for label, q in DAYS_TO_FAILURE_QUANTILES.items()},
+        )
+        for part_id, (part_name, claims, vehicles, days) in parts.items()
+    ]
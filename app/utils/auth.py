@@ -1,10 +1,15 @@
 from fastapi import Depends
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from passlib.context import CryptContext
 
-from app.configs.database import get_db
+from app.configs.cache import call_cache_backend, user_cache
+from app.configs.database import get_async_db, get_db
+from app.configs.versions import table_versions
 from app.models.model_user import User
 from app.models.model_token import Token
+from app.schemas.user import UserModel
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -20,6 +25,29 @@ def get_user_by_email(email:str, db: Session = Depends(get_db)):
 def get_user_by_id_util(user_id:str, db: Session = Depends(get_db)):
     return db.query(User).filter(User.user_id == user_id).first()
 
+async def get_user_by_id_async_util(user_id: int, db: AsyncSession = Depends(get_async_db)):
+    return await db.scalar(select(User).where(User.user_id == user_id).limit(1))
+
+async def get_cached_user_by_id_async_util(user_id: int, db: AsyncSession = Depends(get_async_db)):
+    """
+    Usuário da sessão autenticada, lido do cache de usuários quando possível.
+    Qualquer commit em users invalida as entradas, e o objeto devolvido do cache não fica ligado à sessão.
+    """
+    backends = (table_versions.backend, user_cache.backend)
+    versions, data = await call_cache_backend(backends, _read_cached_user, user_id)
+    if data is not None:
+        return User(**UserModel.model_validate(data).model_dump())
+
+    user = await get_user_by_id_async_util(user_id, db)
+    if user is not None:
+        await call_cache_backend(backends, user_cache.set, user_id, UserModel.model_validate(user.__dict__).model_dump(mode="json"), versions)
+    return user
+
+def _read_cached_user(user_id: int) -> tuple:
+    versions = table_versions.get(User.__tablename__)
+    data, _ = user_cache.get(user_id, versions)
+    return versions, data
+
 def get_token_by_user_id(user_id: int, refresh_token: str, db: Session = Depends(get_db)):
     return db.query(Token).filter(Token.user_id == user_id, Token.refresh_token == refresh_token)
 
@@ -0,0 +1,166 @@
+from collections import defaultdict
+import json
+import os
+
+from fastapi import Depends, Request
+import orjson
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import func, insert
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from app.configs.database import get_db
+from app.errors import BulkBodyTooLarge, BulkCreateRejected, InvalidBulkSelection
+from app.schemas.bulk import BulkCreateResponse, BulkRowError
+
+# Linhas por INSERT de várias linhas (e por lista IN ao atualizar as rollups)
+BULK_INSERT_CHUNK_SIZE = int(os.getenv("BULK_INSERT_CHUNK_SIZE", "1000"))
+# Máximo de linhas aceitas por requisição
+BULK_MAX_ROWS = int(os.getenv("BULK_MAX_ROWS", "50000"))
+# Máximo de bytes do corpo das cargas em massa
+BULK_MAX_BODY_BYTES = int(os.getenv("BULK_MAX_BODY_BYTES", str(64 * 1024 * 1024)))
+
+async def read_bulk_body(request: Request) -> bytes:
+    """
+    Lê o corpo cru da carga em massa, sem o parse de cada item do FastAPI.
+    Um corpo acima de `BULK_MAX_BODY_BYTES` é recusado pelo Content-Length, antes da leitura,
+    ou assim que a leitura passa do limite, sem guardar o restante.
+    """
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > BULK_MAX_BODY_BYTES:
+        raise BulkBodyTooLarge(BULK_MAX_BODY_BYTES)
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > BULK_MAX_BODY_BYTES:
+            raise BulkBodyTooLarge(BULK_MAX_BODY_BYTES)
+    return bytes(body)
+
+def chunked(values: list, size: int = None):
+    size = size or BULK_INSERT_CHUNK_SIZE
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+def _errors_by_index(error: ValidationError) -> dict:
+    errors_by_index = defaultdict(list)
+    for item in json.loads(error.json(include_url=False, include_context=False)):
+        if not item["loc"] or not isinstance(item["loc"][0], int):
+            # O corpo não é uma lista: não há linhas a separar
+            raise BulkCreateRejected([{"index": None, "errors": [item]}])
+        errors_by_index[item["loc"][0]].append({**item, "loc": item["loc"][1:]})
+    return errors_by_index
+
+def _revalidate(adapter: TypeAdapter, items: list, errors_by_index: dict) -> tuple:
+    # Só as linhas sem erro são validadas de novo, pelo mesmo adapter
+    valid_indexes = [index for index in range(len(items)) if index not in errors_by_index]
+    rows = adapter.validate_python([items[index] for index in valid_indexes])
+    errors = [BulkRowError(index=index, errors=errors) for index, errors in sorted(errors_by_index.items())]
+    return [(index, row.model_dump()) for index, row in zip(valid_indexes, rows)], errors
+
+def validate_items_util(items: list, request_model) -> tuple:
+    """
+    Valida uma lista de dicts com um único TypeAdapter(list[request_model]).
+    Retorna as linhas válidas como (posição, dict) e os erros agrupados por posição.
+    """
+    adapter = TypeAdapter(list[request_model])
+    try:
+        return [(index, row.model_dump()) for index, row in enumerate(adapter.validate_python(items))], []
+    except ValidationError as e:
+        return _revalidate(adapter, items, _errors_by_index(e))
+
+def validate_bulk_rows_util(body: bytes, request_model) -> tuple:
+    """
+    Como `validate_items_util`, mas a partir do corpo JSON cru.
+    O tamanho da lista é conferido logo após o parse, antes de validar qualquer linha.
+    """
+    try:
+        items = orjson.loads(body)
+    except orjson.JSONDecodeError as e:
+        raise BulkCreateRejected([{"index": None, "errors": [{"type": "json_invalid", "msg": f"JSON inválido: {str(e)}"}]}])
+    if isinstance(items, list) and len(items) > BULK_MAX_ROWS:
+        raise BulkCreateRejected([{"index": None, "errors": [{"type": "too_long", "msg": f"máximo de {BULK_MAX_ROWS} linhas por requisição"}]}])
+    return validate_items_util(items, request_model)
+
+def bulk_insert_util(model, rows: list, chunk_size: int = None, db: Session = Depends(get_db)) -> tuple:
+    """
+    Insere `rows` ((posição, dict)) com INSERT de várias linhas e RETURNING da chave primária, em lotes de `chunk_size`, sem commit.
+
+    Cada lote roda em um savepoint: se o banco recusar o lote (chave estrangeira, restrição),
+    as linhas dele são inseridas uma a uma para separar as recusadas das válidas.
+    Retorna os ids criados, na ordem das linhas, e os erros por posição.
+    """
+    primary_key = model.__table__.primary_key.columns.values()[0]
+    statement = insert(model).returning(primary_key, sort_by_parameter_order=True)
+    ids, errors = [], []
+    for chunk in chunked(rows, chunk_size):
+        try:
+            with db.begin_nested():
+                ids.extend(db.execute(statement, [values for _, values in chunk]).scalars().all())
+            continue
+        except DBAPIError:
+            pass
+        for index, values in chunk:
+            try:
+                with db.begin_nested():
+                    ids.extend(db.execute(statement, [values]).scalars().all())
+            except DBAPIError as e:
+                errors.append(BulkRowError(index=index, errors=[{"type": "database", "msg": str(e.orig)}]))
+    return ids, errors
+
+def bulk_create_util(model, request_model, body: bytes, atomic: bool = False, db: Session = Depends(get_db)) -> BulkCreateResponse:
+    """
+    Valida e insere uma lista JSON de `request_model` na tabela de `model`, sem commit.
+
+    Linhas inválidas são reportadas por posição e as demais são gravadas; com `atomic`,
+    qualquer erro recusa a carga inteira.
+    """
+    rows, errors = validate_bulk_rows_util(body, request_model)
+    if atomic and errors:
+        raise BulkCreateRejected([error.model_dump() for error in errors])
+
+    ids, insert_errors = bulk_insert_util(model, rows, db=db)
+    if atomic and insert_errors:
+        db.rollback()
+        raise BulkCreateRejected([error.model_dump() for error in insert_errors])
+    errors = sorted(errors + insert_errors, key=lambda error: error.index)
+    return BulkCreateResponse(created=len(ids), ids=ids, errors=errors)
+
+def bulk_criteria_util(model, response_model, ids: list = None, where: dict = None) -> list:
+    """
+    Critérios do UPDATE/DELETE em massa: chave primária em `ids` e igualdade em cada campo de `where`.
+    """
+    where = where or {}
+    if ids is None and not where:
+        raise InvalidBulkSelection("informe 'ids' ou 'where'; para alterar a tabela inteira, use um filtro explícito")
+    if ids is not None and len(ids) > BULK_MAX_ROWS:
+        raise InvalidBulkSelection(f"máximo de {BULK_MAX_ROWS} ids por requisição")
+
+    criteria = []
+    if ids is not None:
+        criteria.append(model.__table__.primary_key.columns.values()[0].in_(ids))
+    for field, value in where.items():
+        if field not in response_model.model_fields:
+            raise InvalidBulkSelection(f"campo '{field}' não existe")
+        try:
+            value = TypeAdapter(response_model.model_fields[field].annotation).validate_python(value)
+        except ValidationError:
+            raise InvalidBulkSelection(f"valor inválido para o campo '{field}'")
+        criteria.append(getattr(model, field) == value)
+    return criteria
+
+def bulk_patch_util(update) -> dict:
+    # Como nas atualizações individuais, campos ausentes ou nulos não são alterados
+    patch = update.model_dump(exclude_unset=True, exclude_none=True)
+    if not patch:
+        raise InvalidBulkSelection("o patch não altera nenhum campo")
+    return patch
+
+def bulk_count_util(model, criteria: list, db: Session = Depends(get_db)) -> int:
+    return db.query(func.count()).select_from(model).filter(*criteria).scalar()
+
+def bulk_update_util(model, criteria: list, patch: dict, db: Session = Depends(get_db)) -> int:
+    # Um único UPDATE ... WHERE, sem carregar as linhas na sessão
+    return db.query(model).filter(*criteria).update(patch, synchronize_session=False)
+
+def bulk_delete_util(model, criteria: list, db: Session = Depends(get_db)) -> int:
+    return db.query(model).filter(*criteria).delete(synchronize_session=False)
@@ -0,0 +1,194 @@
+from datetime import datetime
+import os
+
+from fastapi import Depends
+from sqlalchemy import Integer, case, cast, func, null, select, union_all
+from sqlalchemy.orm import Session
+
+from app.configs.database import get_db
+from app.errors import InvalidCubeQuery
+from app.models.model_location import Location
+from app.models.model_part import Part
+from app.models.model_purchase import Purchase
+from app.models.model_supplier import Supplier
+from app.models.model_vehicle import Vehicle
+from app.models.model_warranty import Warranty
+from app.schemas.analytical import CubeDimensionEnum, CubeMeasureEnum, TimeWindow
+from app.utils.analytical import days_to_failure_expression, month_expression, window_criteria
+
+# Máximo de linhas devolvidas por consulta ao cubo
+ANALYTICS_CUBE_MAX_ROWS = int(os.getenv("ANALYTICS_CUBE_MAX_ROWS", "10000"))
+
+# Compras só se relacionam com peças (e, por elas, com fornecedores): não têm veículo, local nem data de reparo
+PURCHASE_DIMENSIONS = {CubeDimensionEnum.part, CubeDimensionEnum.supplier}
+WARRANTY_MEASURES = {CubeMeasureEnum.claims, CubeMeasureEnum.vehicles, CubeMeasureEnum.avg_days_to_failure}
+VEHICLE_DIMENSIONS = {CubeDimensionEnum.model, CubeDimensionEnum.propulsion, CubeDimensionEnum.year}
+LOCATION_DIMENSIONS = {CubeDimensionEnum.market, CubeDimensionEnum.country, CubeDimensionEnum.province}
+
+# Colunas de cada medida nas linhas do fato, agregadas na consulta externa
+MEASURE_COLUMNS = {
+    CubeMeasureEnum.claims: "claim_key",
+    CubeMeasureEnum.vehicles: "vehicle_id",
+    CubeMeasureEnum.purchases: "purchase_id",
+    CubeMeasureEnum.avg_days_to_failure: "days_to_failure",
+}
+
+def dimension_labels(dimension: CubeDimensionEnum) -> list:
+    # Fornecedor e peça trazem o id (agrupamento) e o nome (leitura)
+    if dimension == CubeDimensionEnum.supplier:
+        return ["supplier_id", "supplier_name"]
+    if dimension == CubeDimensionEnum.part:
+        return ["part_id", "part_name"]
+    return [dimension.value]
+
+def _month_range(repair_month: str):
+    try:
+        start = datetime.strptime(repair_month, "%Y-%m")
+    except ValueError:
+        raise InvalidCubeQuery(f"mês de reparo '{repair_month}' fora do formato YYYY-MM")
+    end = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+    return start, end
+
+def _repair_month_criteria(repair_month: str):
+    # Intervalo de datas em vez de formatar a coluna, para que um índice em repair_date possa ser usado
+    start, end = _month_range(repair_month)
+    return (Warranty.repair_date >= start) & (Warranty.repair_date < end)
+
+def _warranty_rows(dimensions: list, columns: set, filters: dict, window: TimeWindow, db: Session):
+    used = set(dimensions) | set(filters)
+    join_vehicle = bool(used & VEHICLE_DIMENSIONS) or bool(columns & {"vehicle_id", "days_to_failure"})
+    join_supplier = CubeDimensionEnum.supplier in used
+    join_part = join_supplier or CubeDimensionEnum.part in dimensions
+    join_location = bool(used & LOCATION_DIMENSIONS)
+
+    dimension_columns = {
+        CubeDimensionEnum.market: [Location.market],
+        CubeDimensionEnum.country: [Location.country],
+        CubeDimensionEnum.province: [Location.province],
+        CubeDimensionEnum.supplier: [Supplier.supplier_id, Supplier.supplier_name],
+        CubeDimensionEnum.part: [Warranty.part_id, Part.part_name],
+        CubeDimensionEnum.model: [Vehicle.model],
+        CubeDimensionEnum.propulsion: [Vehicle.propulsion],
+        CubeDimensionEnum.year: [Vehicle.year],
+        CubeDimensionEnum.repair_month: [month_expression(Warranty.repair_date, db)],
+        CubeDimensionEnum.classified_failured: [Warranty.classified_failured],
+    }
+    days_to_failure = days_to_failure_expression(db)
+    measure_columns = {
+        "claim_key": Warranty.claim_key,
+        "vehicle_id": Vehicle.vehicle_id,
+        "purchase_id": cast(null(), Integer),
+        # Apenas intervalos positivos entram na média, como em /analytics/part_by_suppliers
+        "days_to_failure": case((days_to_failure > 0, days_to_failure)),
+    }
+    query = select(
+        *(
+            column.label(label)
+            for dimension in dimensions
+            for column, label in zip(dimension_columns[dimension], dimension_labels(dimension))
+        ),
+        *(measure_columns[column].label(column) for column in sorted(columns)),
+    ).select_from(Warranty)
+    # Só entram na consulta as dimensões usadas; sem filtro nelas, garantias órfãs ficam com dimensão nula
+    if join_vehicle:
+        query = query.outerjoin(Vehicle, Vehicle.vehicle_id == Warranty.vehicle_id)
+    if join_part:
+        query = query.outerjoin(Part, Part.part_id == Warranty.part_id)
+    if join_supplier:
+        query = query.outerjoin(Supplier, Supplier.supplier_id == Part.supplier_id)
+    if join_location:
+        query = query.outerjoin(Location, Location.location_id == Warranty.location_id)
+
+    # Filtros aplicados direto no fato (ou na dimensão já unida), antes da agregação
+    criteria = {
+        CubeDimensionEnum.market: lambda value: Location.market == value,
+        CubeDimensionEnum.country: lambda value: Location.country == value,
+        CubeDimensionEnum.province: lambda value: Location.province == value,
+        CubeDimensionEnum.supplier: lambda value: Supplier.supplier_name == value,
+        CubeDimensionEnum.part: lambda value: Warranty.part_id == value,
+        CubeDimensionEnum.model: lambda value: Vehicle.model == value,
+        CubeDimensionEnum.propulsion: lambda value: Vehicle.propulsion == value,
+        CubeDimensionEnum.year: lambda value: Vehicle.year == value,
+        CubeDimensionEnum.repair_month: _repair_month_criteria,
+        CubeDimensionEnum.classified_failured: lambda value: Warranty.classified_failured == value,
+    }
+    return query.where(
+        *(criteria[dimension](value) for dimension, value in filters.items()),
+        *window_criteria(Warranty.repair_date, window),
+    )
+
+def _purchase_rows(dimensions: list, columns: set, filters: dict, window: TimeWindow):
+    join_supplier = CubeDimensionEnum.supplier in dimensions or CubeDimensionEnum.supplier in filters
+    dimension_columns = {
+        CubeDimensionEnum.supplier: [Supplier.supplier_id, Supplier.supplier_name],
+        CubeDimensionEnum.part: [Purchase.part_id, Part.part_name],
+    }
+    measure_columns = {
+        "claim_key": cast(null(), Integer),
+        "vehicle_id": cast(null(), Integer),
+        "purchase_id": Purchase.purchase_id,
+        "days_to_failure": cast(null(), Integer),
+    }
+    query = select(
+        *(
+            column.label(label)
+            for dimension in dimensions
+            for column, label in zip(dimension_columns[dimension], dimension_labels(dimension))
+        ),
+        *(measure_columns[column].label(column) for column in sorted(columns)),
+    ).select_from(Purchase)
+    if join_supplier or CubeDimensionEnum.part in dimensions:
+        query = query.outerjoin(Part, Part.part_id == Purchase.part_id)
+    if join_supplier:
+        query = query.outerjoin(Supplier, Supplier.supplier_id == Part.supplier_id)
+
+    criteria = {
+        CubeDimensionEnum.supplier: lambda value: Supplier.supplier_name == value,
+        CubeDimensionEnum.part: lambda value: Purchase.part_id == value,
+    }
+    return query.where(
+        *(criteria[dimension](value) for dimension, value in filters.items()),
+        *window_criteria(Purchase.purchase_date, window),
+    )
+
+def get_cube_util(dimensions: list, measures: list, filters: dict, limit: int = ANALYTICS_CUBE_MAX_ROWS, window: TimeWindow = None, db: Session = Depends(get_db)):
+    """
+    Agrega os fatos de garantias e compras pelas dimensões pedidas em uma única instrução SQL.
+
+    Cada fato vira uma subconsulta com só as junções e filtros de que precisa; quando há medidas
+    dos dois, as subconsultas são unidas (UNION ALL) e agregadas juntas. `window` se aplica à data
+    de reparo das garantias e à data das compras. Retorna até `limit + 1`
+    linhas, para que quem chama saiba se o resultado foi cortado.
+    """
+    if not measures:
+        raise InvalidCubeQuery("informe ao menos uma medida")
+    if CubeMeasureEnum.purchases in measures:
+        unsupported = (set(dimensions) | set(filters)) - PURCHASE_DIMENSIONS
+        if unsupported:
+            names = ", ".join(sorted(dimension.value for dimension in unsupported))
+            raise InvalidCubeQuery(f"a medida 'purchases' só combina com as dimensões part e supplier (recebido: {names})")
+
+    columns = {MEASURE_COLUMNS[measure] for measure in measures}
+    branches = []
+    if set(measures) & WARRANTY_MEASURES:
+        branches.append(_warranty_rows(dimensions, columns, filters, window, db))
+    if CubeMeasureEnum.purchases in measures:
+        branches.append(_purchase_rows(dimensions, columns, filters, window))
+    rows = (union_all(*branches) if len(branches) > 1 else branches[0]).subquery()
+
+    aggregates = {
+        CubeMeasureEnum.claims: lambda: func.count(rows.c.claim_key),
+        CubeMeasureEnum.vehicles: lambda: func.count(func.distinct(rows.c.vehicle_id)),
+        CubeMeasureEnum.purchases: lambda: func.count(rows.c.purchase_id),
+        CubeMeasureEnum.avg_days_to_failure: lambda: func.avg(rows.c.days_to_failure),
+    }
+    measure_columns = [aggregates[measure]().label(measure.value) for measure in measures]
+    labels = [label for dimension in dimensions for label in dimension_labels(dimension)]
+    group_columns = [rows.c[label] for label in labels]
+    statement = (
+        select(*group_columns, *measure_columns)
+        .group_by(*group_columns)
+        .order_by(measure_columns[0].desc(), *group_columns)
+        .limit(limit + 1)
+    )
+    return db.execute(statement).all()
@@ -0,0 +1,239 @@
+from collections import namedtuple
+from datetime import date, datetime
+from enum import Enum
+import csv
+import io
+import json
+import os
+import time
+
+from fastapi import Depends
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from app.configs.database import get_db
+from app.configs.versions import mark_tables_changed
+from app.errors import UnsupportedIngestFormat
+from app.models.model_location import Location
+from app.models.model_part import Part
+from app.models.model_purchase import Purchase
+from app.models.model_vehicle import Vehicle
+from app.models.model_warranty import Warranty
+from app.schemas.ingest import IngestFormatEnum, IngestReport, IngestRowError
+from app.schemas.purchase import PurchaseRequest
+from app.schemas.warranty import WarrantyRequest
+from app.utils.bulk import chunked, validate_items_util
+from app.utils.rollup import refresh_purchase_rollups_util, refresh_supplier_rollups_util, refresh_warranty_rollups_util, rollups_available_util, supplier_ids_by_parts_util
+
+# Linhas lidas, validadas e gravadas por vez
+INGEST_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", "5000"))
+# Erros devolvidos no relatório; os demais só são contados (a CLI grava todos no arquivo de erros)
+INGEST_MAX_REPORTED_ERRORS = int(os.getenv("INGEST_MAX_REPORTED_ERRORS", "1000"))
+
+# Tabela, schema de validação, chaves estrangeiras (coluna -> modelo referenciado) e coluna de data das rollups
+IngestTarget = namedtuple("IngestTarget", ["model", "request_model", "references", "date_field"])
+
+INGEST_TARGETS = {
+    "warranty": IngestTarget(
+        Warranty,
+        WarrantyRequest,
+        {"vehicle_id": Vehicle, "part_id": Part, "location_id": Location, "purchase_id": Purchase},
+        "repair_date",
+    ),
+    "purchases": IngestTarget(Purchase, PurchaseRequest, {"part_id": Part}, "purchase_date"),
+}
+
+def ingest_format(filename: str = None, content_type: str = None) -> IngestFormatEnum:
+    """
+    Formato do arquivo pela extensão ou pelo content type.
+    """
+    filename, content_type = (filename or "").lower(), (content_type or "").lower()
+    if filename.endswith(".csv") or "csv" in content_type:
+        return IngestFormatEnum.csv
+    if filename.endswith((".ndjson", ".jsonl")) or "ndjson" in content_type or "jsonl" in content_type:
+        return IngestFormatEnum.ndjson
+    raise UnsupportedIngestFormat(filename)
+
+def iter_file_records(stream, file_format: IngestFormatEnum):
+    """
+    Lê o arquivo (binário) sob demanda e produz (linha, registro, erro) — registro None quando a linha não pôde ser lida.
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        if file_format == IngestFormatEnum.csv:
+            reader = csv.DictReader(text)
+            for record in reader:
+                yield reader.line_num, record, None
+            return
+        for line_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_number, None, {"type": "json_invalid", "loc": [], "msg": str(e)}
+                continue
+            if not isinstance(record, dict):
+                yield line_number, None, {"type": "dict_type", "loc": [], "msg": "cada linha deve ser um objeto JSON"}
+                continue
+            yield line_number, record, None
+    finally:
+        # O stream pertence a quem chamou
+        text.detach()
+
+class ForeignKeySets:
+    """
+    Ids conhecidos de cada tabela referenciada, consultados em lote só para os ids ainda não vistos.
+    """
+    def __init__(self, references: dict):
+        self.references = references
+        self.known = {column: set() for column in references}
+        self.missing = {column: set() for column in references}
+
+    def check(self, rows: list, db: Session) -> dict:
+        """
+        Recebe (posição, dict) e retorna os erros por posição das linhas que referenciam ids inexistentes.
+        """
+        for column, model in self.references.items():
+            primary_key = model.__table__.primary_key.columns.values()[0]
+            unseen = {values[column] for _, values in rows} - self.known[column] - self.missing[column]
+            for ids in chunked(sorted(unseen)):
+                found = set(db.scalars(select(primary_key).where(primary_key.in_(ids))))
+                self.known[column] |= found
+                self.missing[column] |= set(ids) - found
+
+        errors = {}
+        for index, values in rows:
+            for column, model in self.references.items():
+                if values[column] in self.missing[column]:
+                    errors.setdefault(index, []).append({
+                        "type": "foreign_key",
+                        "loc": [column],
+                        "msg": f"{column} {values[column]} não existe em {model.__tablename__}",
+                    })
+        return errors
+
+def _copy_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+def _copy_rows(model, columns: list, rows: list, db: Session):
+    # COPY FROM STDIN na conexão da sessão (mesma transação); strings sempre entre aspas para não virarem NULL
+    buffer = io.StringIO()
+    csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC).writerows([_copy_value(values[column]) for column in columns] for values in rows)
+    buffer.seek(0)
+    with db.connection().connection.cursor() as cursor:
+        cursor.copy_expert(f"COPY {model.__tablename__} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    mark_tables_changed(db, model.__tablename__)
+
+def _insert_rows(model, columns: list, rows: list, db: Session):
+    db.execute(insert(model), rows)
+
+def _uses_copy(db: Session) -> bool:
+    dialect = db.get_bind().dialect
+    return dialect.name == "postgresql" and dialect.driver == "psycopg2"
+
+def _refresh_rollups(target: IngestTarget, partitions: set, db: Session):
+    if target.model is Warranty:
+        refresh_warranty_rollups_util(partitions, db=db)
+        return
+    refresh_purchase_rollups_util(partitions, db=db)
+    supplier_ids = set()
+    for part_ids in chunked(sorted({part_id for part_id, _ in partitions})):
+        supplier_ids |= supplier_ids_by_parts_util(Part.part_id.in_(part_ids), db=db)
+    refresh_supplier_rollups_util(supplier_ids, db=db)
+
+def chunked_records(records, size: int):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def ingest_file_util(target_name: str, stream, file_format: IngestFormatEnum, chunk_size: int = None, on_errors=None, on_progress=None, db: Session = Depends(get_db)) -> IngestReport:
+    """
+    Carrega um arquivo CSV ou NDJSON de garantias ou compras em lotes de `chunk_size` linhas, sem commit.
+
+    Cada lote é validado pelo schema de criação, tem as chaves estrangeiras conferidas contra os ids já
+    conhecidos e é gravado com COPY FROM STDIN no PostgreSQL (psycopg2) ou INSERT com executemany nos demais bancos.
+    `on_errors(erros)` recebe todos os erros de cada lote e `on_progress(relatório)` é chamado ao fim de cada lote.
+    """
+    target = INGEST_TARGETS[target_name]
+    columns = list(target.request_model.model_fields)
+    load = _copy_rows if _uses_copy(db) else _insert_rows
+    keys = ForeignKeySets(target.references)
+    track_rollups = rollups_available_util(db)
+    partitions = set()
+    report = IngestReport(rows=0, loaded=0, rejected=0, seconds=0, rows_per_second=0, errors=[], errors_truncated=False)
+    started = time.perf_counter()
+
+    for chunk in chunked_records(iter_file_records(stream, file_format), chunk_size or INGEST_CHUNK_SIZE):
+        errors = [IngestRowError(line=line, errors=[error]) for line, _, error in chunk if error is not None]
+        records = [(line, record) for line, record, error in chunk if error is None]
+        lines = [line for line, _ in records]
+
+        rows, invalid = validate_items_util([record for _, record in records], target.request_model)
+        errors += [IngestRowError(line=lines[error.index], errors=error.errors) for error in invalid]
+        missing = keys.check(rows, db)
+        errors += [IngestRowError(line=lines[index], errors=row_errors) for index, row_errors in missing.items()]
+        rows = [values for index, values in rows if index not in missing]
+
+        if rows:
+            load(target.model, columns, rows, db)
+        if track_rollups:
+            partitions |= {(values["part_id"], values[target.date_field].strftime("%Y-%m")) for values in rows}
+
+        errors.sort(key=lambda error: error.line)
+        if on_errors is not None and errors:
+            on_errors(errors)
+        room = INGEST_MAX_REPORTED_ERRORS - len(report.errors)
+        report.errors.extend(errors[:max(room, 0)])
+        report.errors_truncated = report.errors_truncated or len(errors) > room
+        report.rows += len(chunk)
+        report.loaded += len(rows)
+        report.rejected += len(errors)
+        report.seconds = round(time.perf_counter() - started, 3)
+        report.rows_per_second = round(report.rows / report.seconds, 1) if report.seconds else 0
+        if on_progress is not None:
+            on_progress(report)
+
+    if partitions:
+        _refresh_rollups(target, partitions, db)
+    return report
+
+if __name__ == "__main__":
+    # Uso: python -m app.utils.ingest {warranty,purchases} arquivo.csv [--errors erros.ndjson] [--format csv|ndjson]
+    import argparse
+
+    from app.configs.database import Base, SessionLocal, engine
+
+    parser = argparse.ArgumentParser(description="Carrega um arquivo CSV ou NDJSON de garantias ou compras")
+    parser.add_argument("target", choices=sorted(INGEST_TARGETS))
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=[file_format.value for file_format in IngestFormatEnum])
+    parser.add_argument("--errors", default="ingest_errors.ndjson", help="arquivo com as linhas recusadas (NDJSON)")
+    parser.add_argument("--chunk-size", type=int, default=INGEST_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    file_format = IngestFormatEnum(args.format) if args.format else ingest_format(args.path)
+    Base.metadata.create_all(engine)
+    db = SessionLocal()
+    try:
+        with open(args.path, "rb") as stream, open(args.errors, "w", encoding="utf-8") as errors_file:
+            def write_errors(errors):
+                errors_file.writelines(error.model_dump_json() + "\n" for error in errors)
+
+            def print_progress(report):
+                print(f"{report.rows} linhas lidas, {report.loaded} gravadas, {report.rejected} recusadas ({report.rows_per_second} linhas/s)", flush=True)
+
+            report = ingest_file_util(args.target, stream, file_format, args.chunk_size, on_errors=write_errors, on_progress=print_progress, db=db)
+        db.commit()
+        print(f"Concluído em {report.seconds}s: {report.loaded} linhas gravadas, {report.rejected} recusadas (detalhes em {args.errors})")
+    finally:
+        db.close()
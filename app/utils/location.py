@@ -2,13 +2,25 @@ from fastapi import Depends
 from sqlalchemy.orm import Session
 
 from app.configs.database import get_db
+from app.configs.fields import load_fields
+from app.configs.pagination import PAGE_DEFAULT_LIMIT, select_page_rows
+from app.configs.loader import get_batch_loader
 from app.models.model_location import Location
 
-def get_all_locations_util(db: Session = Depends(get_db)):
-    return db.query(Location).all()
+def get_locations_page_util(columns: list, after: int = None, limit: int = PAGE_DEFAULT_LIMIT, db: Session = Depends(get_db)) -> list:
+    return select_page_rows(Location, columns, after, limit, db=db)
 
-def get_location_by_id_util(location_id:int, db: Session = Depends(get_db)):
-    return db.query(Location).filter(Location.location_id == location_id).first()
+def get_locations_by_ids_util(location_ids: list, fields: list = None, db: Session = Depends(get_db)) -> dict:
+    if fields is None:
+        return get_batch_loader(db).load_many(Location, location_ids)
+    # Consulta própria, e não o carregador da sessão, para que o SELECT traga só os campos pedidos
+    found = {location.location_id: location for location in db.query(Location).filter(Location.location_id.in_(location_ids)).options(load_fields(Location, fields))}
+    return {location_id: found.get(location_id) for location_id in location_ids}
+
+def get_location_by_id_util(location_id:int, fields: list = None, db: Session = Depends(get_db)):
+    if fields is None:
+        return get_batch_loader(db).load(Location, location_id)
+    return db.query(Location).filter(Location.location_id == location_id).options(load_fields(Location, fields)).first()
 
 def get_locations_by_market_util(market:str, db: Session = Depends(get_db)):
     return db.query(Location).filter(Location.market == market).all()
@@ -27,7 +39,6 @@ def get_locations_by_province_util(province:str, db: Session = Depends(get_db)):
 
 def delete_location_by_id_util(location_id:int, db: Session = Depends(get_db)):
     rows_deleted = db.query(Location).filter(Location.location_id == location_id).delete()
-    db.commit()
 
     return rows_deleted
 
@@ -2,13 +2,25 @@ from fastapi import Depends
 from sqlalchemy.orm import Session
 
 from app.configs.database import get_db
+from app.configs.fields import load_fields
+from app.configs.pagination import PAGE_DEFAULT_LIMIT, select_page_rows
+from app.configs.loader import get_batch_loader
 from app.models.model_part import Part
 
-def get_all_parts_util(db: Session = Depends(get_db)):
-    return db.query(Part).all()
+def get_parts_page_util(columns: list, after: int = None, limit: int = PAGE_DEFAULT_LIMIT, db: Session = Depends(get_db)) -> list:
+    return select_page_rows(Part, columns, after, limit, db=db)
 
-def get_part_by_id_util(part_id:int, db: Session = Depends(get_db)):
-    return db.query(Part).filter(Part.part_id == part_id).first()
+def get_parts_by_ids_util(part_ids: list, fields: list = None, db: Session = Depends(get_db)) -> dict:
+    if fields is None:
+        return get_batch_loader(db).load_many(Part, part_ids)
+    # Consulta própria, e não o carregador da sessão, para que o SELECT traga só os campos pedidos
+    found = {part.part_id: part for part in db.query(Part).filter(Part.part_id.in_(part_ids)).options(load_fields(Part, fields))}
+    return {part_id: found.get(part_id) for part_id in part_ids}
+
+def get_part_by_id_util(part_id:int, fields: list = None, db: Session = Depends(get_db)):
+    if fields is None:
+        return get_batch_loader(db).load(Part, part_id)
+    return db.query(Part).filter(Part.part_id == part_id).options(load_fields(Part, fields)).first()
 
 def get_part_by_name_util(part_name:str, db: Session = Depends(get_db)):
     return db.query(Part).filter(Part.part_name == part_name).first()
@@ -29,5 +41,4 @@ def update_part_by_id_util(part_name:str = None, part_id: int = None, db: Sessio
 
 def delete_part_by_part_name(part_name:str, db: Session = Depends(get_db)):
     rows_deleted = db.query(Part).filter(Part.part_name == part_name).delete()
-    db.commit()
     return rows_deleted
\ No newline at end of file
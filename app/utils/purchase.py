@@ -4,14 +4,26 @@ from sqlalchemy import extract
 from sqlalchemy.orm import Session
 
 from app.configs.database import get_db
+from app.configs.fields import load_fields
+from app.configs.pagination import PAGE_DEFAULT_LIMIT, select_page_rows
+from app.configs.loader import get_batch_loader
 from app.models.model_purchase import Purchase
 from app.schemas.purchase import PurchaseEnum
 
-def get_all_purchase_util(db: Session = Depends(get_db)):
-    return db.query(Purchase).all()
+def get_purchases_page_util(columns: list, after: int = None, limit: int = PAGE_DEFAULT_LIMIT, db: Session = Depends(get_db)) -> list:
+    return select_page_rows(Purchase, columns, after, limit, db=db)
 
-def get_purchase_by_id_util(purchase_id:int, db: Session = Depends(get_db)):
-    return db.query(Purchase).filter(Purchase.purchase_id == purchase_id).first()
+def get_purchases_by_ids_util(purchase_ids: list, fields: list = None, db: Session = Depends(get_db)) -> dict:
+    if fields is None:
+        return get_batch_loader(db).load_many(Purchase, purchase_ids)
+    # Consulta própria, e não o carregador da sessão, para que o SELECT traga só os campos pedidos
+    found = {purchase.purchase_id: purchase for purchase in db.query(Purchase).filter(Purchase.purchase_id.in_(purchase_ids)).options(load_fields(Purchase, fields))}
+    return {purchase_id: found.get(purchase_id) for purchase_id in purchase_ids}
+
+def get_purchase_by_id_util(purchase_id:int, fields: list = None, db: Session = Depends(get_db)):
+    if fields is None:
+        return get_batch_loader(db).load(Purchase, purchase_id)
+    return db.query(Purchase).filter(Purchase.purchase_id == purchase_id).options(load_fields(Purchase, fields)).first()
 
 def get_purchases_by_purchase_type_util(purchase_type:PurchaseEnum, db: Session = Depends(get_db)):
     return db.query(Purchase).filter(Purchase.purchase_type == purchase_type).all()
@@ -37,9 +49,6 @@ def update_purchase_by_id_util(purchase_type:str = None, purchase_date: datetime
     if purchase_type is not None:
         update_data[Purchase.purchase_type] = purchase_type
     
-    if not isinstance(datetime, purchase_date):
-        purchase_date = datetime(purchase_date)
-
     if purchase_date is not None:
         update_data[Purchase.purchase_date] = purchase_date
     
@@ -50,6 +59,4 @@ def update_purchase_by_id_util(purchase_type:str = None, purchase_date: datetime
 
 def delete_purchase_by_id(purchase_id:int, db: Session = Depends(get_db)):
     rows_deleted = db.query(Purchase).filter(Purchase.purchase_id == purchase_id).delete()
-    db.commit()
-    db.refresh(rows_deleted)
     return rows_deleted
\ No newline at end of file
@@ -0,0 +1,246 @@
+from datetime import datetime
+from itertools import groupby
+from fastapi import Depends
+from sqlalchemy import case, func, insert, or_, select
+from sqlalchemy.orm import Session
+
+from app.configs.database import get_db
+from app.models.model_part import Part
+from app.models.model_purchase import Purchase
+from app.models.model_rollup import PurchaseRollup, RollupState, SupplierRollup, WarrantyClaimRollup, WarrantySketchRollup
+from app.models.model_supplier import Supplier
+from app.models.model_vehicle import Vehicle
+from app.models.model_warranty import Warranty
+from app.schemas.purchase import PurchaseEnum
+from app.utils.analytical import days_to_failure_expression, month_expression
+from app.utils.sketches import HyperLogLog, TDigest
+
+ROLLUP_NAME = "analytics"
+# Partições de sketches gravadas por INSERT durante o rebuild
+SKETCH_INSERT_BATCH = 500
+
+def rollups_available_util(db: Session = Depends(get_db)) -> bool:
+    # As rollups só são lidas (e mantidas) depois do primeiro rebuild; o resultado fica guardado na sessão
+    if "rollups_available" not in db.info:
+        state = db.query(RollupState).filter(RollupState.rollup_name == ROLLUP_NAME).first()
+        db.info["rollups_available"] = state is not None
+    return db.info["rollups_available"]
+
+def _in_or_null(column, values):
+    # IN que também aceita None, já que o IN do SQL nunca casa com NULL
+    non_null = [value for value in values if value is not None]
+    criteria = [column.in_(non_null)] if non_null else []
+    if None in values:
+        criteria.append(column.is_(None))
+    return or_(*criteria)
+
+def _warranty_rollup_select(db: Session, part_ids: set = None, months: set = None):
+    month = month_expression(Warranty.repair_date, db)
+    claims = (
+        select(Warranty.claim_key, Warranty.part_id, Vehicle.model, Vehicle.propulsion, month.label("month"))
+        .outerjoin(Vehicle, Vehicle.vehicle_id == Warranty.vehicle_id)
+    )
+    if part_ids is not None:
+        claims = claims.where(_in_or_null(Warranty.part_id, part_ids), _in_or_null(month, months))
+    claims = claims.subquery()
+    return (
+        select(claims.c.part_id, claims.c.model, claims.c.propulsion, claims.c.month, func.count(claims.c.claim_key))
+        .group_by(claims.c.part_id, claims.c.model, claims.c.propulsion, claims.c.month)
+    )
+
+def _warranty_sketch_select(db: Session, part_ids: set = None, months: set = None):
+    # Garantias ordenadas pela partição, para que os sketches sejam montados uma partição por vez
+    month = month_expression(Warranty.repair_date, db)
+    days_to_failure = days_to_failure_expression(db)
+    claims = (
+        select(
+            Warranty.part_id,
+            Vehicle.model,
+            Vehicle.propulsion,
+            month.label("month"),
+            Vehicle.vehicle_id,
+            case((days_to_failure > 0, days_to_failure)).label("days_to_failure"),
+        )
+        .outerjoin(Vehicle, Vehicle.vehicle_id == Warranty.vehicle_id)
+    )
+    if part_ids is not None:
+        claims = claims.where(_in_or_null(Warranty.part_id, part_ids), _in_or_null(month, months))
+    claims = claims.subquery()
+    return select(claims).order_by(claims.c.part_id, claims.c.model, claims.c.propulsion, claims.c.month)
+
+def _insert_warranty_sketches(db: Session, part_ids: set = None, months: set = None):
+    rows = db.execute(_warranty_sketch_select(db, part_ids, months).execution_options(yield_per=SKETCH_INSERT_BATCH))
+    batch = []
+    for (part_id, model, propulsion, month), claims in groupby(rows, key=lambda row: (row.part_id, row.model, row.propulsion, row.month)):
+        claims = list(claims)
+        batch.append({
+            "part_id": part_id,
+            "model": model,
+            "propulsion": propulsion,
+            "month": month,
+            "claims": len(claims),
+            "vehicles_sketch": HyperLogLog().add_many([row.vehicle_id for row in claims if row.vehicle_id is not None]).to_bytes(),
+            "days_sketch": TDigest().add_many([row.days_to_failure for row in claims if row.days_to_failure is not None]).to_bytes(),
+        })
+        if len(batch) >= SKETCH_INSERT_BATCH:
+            db.execute(insert(WarrantySketchRollup), batch)
+            batch = []
+    if batch:
+        db.execute(insert(WarrantySketchRollup), batch)
+
+def _purchase_rollup_select(db: Session, part_ids: set = None, months: set = None):
+    month = month_expression(Purchase.purchase_date, db)
+    purchases = select(
+        Purchase.purchase_id, Purchase.part_id, Purchase.purchase_type, Purchase.purchase_date, month.label("month")
+    )
+    if part_ids is not None:
+        purchases = purchases.where(_in_or_null(Purchase.part_id, part_ids), _in_or_null(month, months))
+    purchases = purchases.subquery()
+    return (
+        select(
+            purchases.c.part_id,
+            purchases.c.purchase_type,
+            purchases.c.month,
+            func.count(purchases.c.purchase_id),
+            func.min(purchases.c.purchase_date),
+            func.max(purchases.c.purchase_date),
+        )
+        .group_by(purchases.c.part_id, purchases.c.purchase_type, purchases.c.month)
+    )
+
+def _supplier_rollup_select(supplier_ids: set = None):
+    suppliers = (
+        select(
+            Supplier.supplier_id,
+            Supplier.location_id,
+            func.count(func.distinct(Part.part_id)),
+            func.count(Purchase.purchase_id),
+            func.coalesce(func.sum(case((Purchase.purchase_type == PurchaseEnum.bulk, 1), else_=0)), 0),
+            func.coalesce(func.sum(case((Purchase.purchase_type == PurchaseEnum.warranty, 1), else_=0)), 0),
+        )
+        .outerjoin(Part, Part.supplier_id == Supplier.supplier_id)
+        .outerjoin(Purchase, Purchase.part_id == Part.part_id)
+        .group_by(Supplier.supplier_id)
+    )
+    if supplier_ids is not None:
+        suppliers = suppliers.where(Supplier.supplier_id.in_(supplier_ids))
+    return suppliers
+
+WARRANTY_ROLLUP_COLUMNS = ["part_id", "model", "propulsion", "month", "claims"]
+PURCHASE_ROLLUP_COLUMNS = ["part_id", "purchase_type", "month", "purchases", "first_purchase_date", "last_purchase_date"]
+SUPPLIER_ROLLUP_COLUMNS = ["supplier_id", "location_id", "total_parts", "total_purchases", "bulk_purchases", "warranty_purchases"]
+
+def warranty_partitions_util(*criteria, db: Session = Depends(get_db)) -> set:
+    """
+    Partições (peça, mês) das garantias que satisfazem os critérios.
+    Deve ser chamada antes e/ou depois da escrita, dentro da mesma transação.
+    """
+    if not rollups_available_util(db):
+        return set()
+    month = month_expression(Warranty.repair_date, db)
+    return set(db.query(Warranty.part_id, month).filter(*criteria).distinct().all())
+
+def purchase_partitions_util(*criteria, db: Session = Depends(get_db)) -> set:
+    """
+    Partições (peça, mês) das compras que satisfazem os critérios.
+    """
+    if not rollups_available_util(db):
+        return set()
+    month = month_expression(Purchase.purchase_date, db)
+    return set(db.query(Purchase.part_id, month).filter(*criteria).distinct().all())
+
+def patched_partitions_util(partitions: set, patch: dict, date_field: str) -> set:
+    """
+    Partições (peça, mês) das mesmas linhas depois de um UPDATE em massa com `patch`,
+    a partir das partições lidas antes dele. Não consulta o banco: filtrar pelos novos valores
+    também pegaria linhas que já os tinham e recalcularia partições que não mudaram.
+    """
+    part_id = patch.get("part_id")
+    month = patch[date_field].strftime("%Y-%m") if date_field in patch else None
+    return {
+        (part_id if "part_id" in patch else old_part_id, month if date_field in patch else old_month)
+        for old_part_id, old_month in partitions
+    }
+
+def supplier_ids_by_parts_util(*criteria, db: Session = Depends(get_db)) -> set:
+    """
+    Fornecedores das peças que satisfazem os critérios.
+    """
+    if not rollups_available_util(db):
+        return set()
+    return {part.supplier_id for part in db.query(Part.supplier_id).filter(*criteria).distinct().all()}
+
+def refresh_warranty_rollups_util(partitions: set, db: Session = Depends(get_db)):
+    """
+    Recalcula as partições informadas a partir de fact_warranties, sem commit.
+    """
+    if not partitions or not rollups_available_util(db):
+        return
+    part_ids = {part_id for part_id, _ in partitions}
+    months = {month for _, month in partitions}
+    db.query(WarrantyClaimRollup).filter(
+        _in_or_null(WarrantyClaimRollup.part_id, part_ids),
+        _in_or_null(WarrantyClaimRollup.month, months),
+    ).delete(synchronize_session=False)
+    db.execute(insert(WarrantyClaimRollup).from_select(WARRANTY_ROLLUP_COLUMNS, _warranty_rollup_select(db, part_ids, months)))
+    db.query(WarrantySketchRollup).filter(
+        _in_or_null(WarrantySketchRollup.part_id, part_ids),
+        _in_or_null(WarrantySketchRollup.month, months),
+    ).delete(synchronize_session=False)
+    _insert_warranty_sketches(db, part_ids, months)
+
+def refresh_purchase_rollups_util(partitions: set, db: Session = Depends(get_db)):
+    """
+    Recalcula as partições informadas a partir de purchases, sem commit.
+    """
+    if not partitions or not rollups_available_util(db):
+        return
+    part_ids = {part_id for part_id, _ in partitions}
+    months = {month for _, month in partitions}
+    db.query(PurchaseRollup).filter(
+        _in_or_null(PurchaseRollup.part_id, part_ids),
+        _in_or_null(PurchaseRollup.month, months),
+    ).delete(synchronize_session=False)
+    db.execute(insert(PurchaseRollup).from_select(PURCHASE_ROLLUP_COLUMNS, _purchase_rollup_select(db, part_ids, months)))
+
+def refresh_supplier_rollups_util(supplier_ids: set, db: Session = Depends(get_db)):
+    """
+    Recalcula os contadores dos fornecedores informados, sem commit.
+    """
+    supplier_ids = {supplier_id for supplier_id in supplier_ids if supplier_id is not None}
+    if not supplier_ids or not rollups_available_util(db):
+        return
+    db.query(SupplierRollup).filter(SupplierRollup.supplier_id.in_(supplier_ids)).delete(synchronize_session=False)
+    db.execute(insert(SupplierRollup).from_select(SUPPLIER_ROLLUP_COLUMNS, _supplier_rollup_select(supplier_ids)))
+
+def rebuild_rollups_util(db: Session = Depends(get_db)) -> datetime:
+    """
+    Reconstrói todas as tabelas de rollup a partir das tabelas fato e habilita a leitura por elas.
+    """
+    db.query(WarrantyClaimRollup).delete(synchronize_session=False)
+    db.query(WarrantySketchRollup).delete(synchronize_session=False)
+    db.query(PurchaseRollup).delete(synchronize_session=False)
+    db.query(SupplierRollup).delete(synchronize_session=False)
+
+    db.execute(insert(WarrantyClaimRollup).from_select(WARRANTY_ROLLUP_COLUMNS, _warranty_rollup_select(db)))
+    _insert_warranty_sketches(db)
+    db.execute(insert(PurchaseRollup).from_select(PURCHASE_ROLLUP_COLUMNS, _purchase_rollup_select(db)))
+    db.execute(insert(SupplierRollup).from_select(SUPPLIER_ROLLUP_COLUMNS, _supplier_rollup_select()))
+
+    built_at = datetime.utcnow()
+    db.merge(RollupState(rollup_name=ROLLUP_NAME, built_at=built_at))
+    db.commit()
+    db.info["rollups_available"] = True
+    return built_at
+
+if __name__ == "__main__":
+    # Uso: python -m app.utils.rollup
+    from app.configs.database import Base, SessionLocal, engine
+
+    Base.metadata.create_all(engine)
+    db = SessionLocal()
+    try:
+        built_at = rebuild_rollups_util(db)
+        print(f"Rollups reconstruídas em {built_at.isoformat()}")
+    finally:
+        db.close()
@@ -0,0 +1,158 @@
+import math
+import zlib
+
+import numpy as np
+
+# Precisão do HyperLogLog: 2^11 registradores, erro padrão relativo de 1.04 / sqrt(2048) ≈ 2,3%
+HLL_PRECISION = 11
+# Compressão do t-digest: quanto maior, mais centróides e menor o erro nos quantis
+TDIGEST_COMPRESSION = 100
+
+def _hash64(values) -> np.ndarray:
+    # splitmix64: espalha ids sequenciais uniformemente pelos 64 bits
+    with np.errstate(over="ignore"):
+        z = np.asarray(values, dtype=np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
+
+def _bit_length(values: np.ndarray) -> np.ndarray:
+    # Número de bits significativos de cada valor, sem passar por float (que perde precisão acima de 2^53)
+    values = values.copy()
+    length = np.zeros(values.shape, dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        shifted = values >> np.uint64(shift)
+        nonzero = shifted != 0
+        length[nonzero] += shift
+        values = np.where(nonzero, shifted, values)
+    return length + (values != 0)
+
+class HyperLogLog:
+    """
+    Estimador de cardinalidade (valores distintos) em memória fixa.
+    Dois sketches se combinam pelo máximo de cada registrador, então partições somam sem reler os dados.
+    """
+    def __init__(self, precision: int = HLL_PRECISION, registers: np.ndarray = None):
+        self.precision = precision
+        self.registers = registers if registers is not None else np.zeros(1 << precision, dtype=np.uint8)
+
+    @property
+    def relative_error(self) -> float:
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def add_many(self, values):
+        values = np.asarray(values)
+        if not len(values):
+            return self
+        hashes = _hash64(values)
+        remaining_bits = 64 - self.precision
+        index = (hashes >> np.uint64(remaining_bits)).astype(np.int64)
+        rest = hashes & np.uint64((1 << remaining_bits) - 1)
+        # Posição do primeiro bit 1 nos bits restantes (contada a partir de 1)
+        rank = (remaining_bits - _bit_length(rest) + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+        return self
+
+    def merge(self, other: "HyperLogLog"):
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        # Correção para cardinalidades pequenas (contagem linear)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def to_bytes(self) -> bytes:
+        return zlib.compress(bytes([self.precision]) + self.registers.tobytes())
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HyperLogLog":
+        data = zlib.decompress(data)
+        return cls(precision=data[0], registers=np.frombuffer(data[1:], dtype=np.uint8).copy())
+
+class TDigest:
+    """
+    Resumo de uma distribuição em centróides (média, peso), preciso nas caudas, para estimar quantis.
+    Digests de partições diferentes se combinam juntando e recomprimindo os centróides.
+    A média é exata: a soma ponderada dos centróides é preservada a cada compressão.
+    """
+    def __init__(self, compression: float = TDIGEST_COMPRESSION, means: np.ndarray = None, weights: np.ndarray = None):
+        self.compression = compression
+        self.means = means if means is not None else np.zeros(0)
+        self.weights = weights if weights is not None else np.zeros(0)
+
+    @property
+    def count(self) -> float:
+        return float(self.weights.sum())
+
+    def _compress(self, means: np.ndarray, weights: np.ndarray):
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+        total = weights.sum()
+        if not total:
+            self.means, self.weights = means, weights
+            return
+
+        def scale(q):
+            # Função de escala k1: centróides menores perto de q = 0 e q = 1
+            return self.compression / (2 * math.pi) * math.asin(2 * min(max(q, 0.0), 1.0) - 1)
+
+        merged_means, merged_weights = [], []
+        current_mean, current_weight = float(means[0]), float(weights[0])
+        cumulative = 0.0
+        k_lower = scale(0.0)
+        for mean, weight in zip(means[1:].tolist(), weights[1:].tolist()):
+            if scale((cumulative + current_weight + weight) / total) - k_lower <= 1:
+                current_weight += weight
+                current_mean += (mean - current_mean) * weight / current_weight
+                continue
+            merged_means.append(current_mean)
+            merged_weights.append(current_weight)
+            cumulative += current_weight
+            k_lower = scale(cumulative / total)
+            current_mean, current_weight = mean, weight
+        merged_means.append(current_mean)
+        merged_weights.append(current_weight)
+        self.means, self.weights = np.array(merged_means), np.array(merged_weights)
+
+    def add_many(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if len(values):
+            self._compress(np.concatenate([self.means, values]), np.concatenate([self.weights, np.ones(len(values))]))
+        return self
+
+    def merge(self, other: "TDigest"):
+        if len(other.means):
+            self._compress(np.concatenate([self.means, other.means]), np.concatenate([self.weights, other.weights]))
+        return self
+
+    def mean(self):
+        return float(np.dot(self.means, self.weights) / self.count) if self.count else None
+
+    def quantile(self, q: float):
+        if not self.count:
+            return None
+        if len(self.means) == 1:
+            return float(self.means[0])
+        # Interpola entre os centros dos centróides vizinhos, pela posição acumulada
+        centers = np.cumsum(self.weights) - self.weights / 2
+        return float(np.interp(q * self.count, centers, self.means))
+
+    def rank_error(self, q: float) -> float:
+        # Metade da largura máxima de um centróide em q pela função k1: π·sqrt(q(1-q)) / compressão
+        return math.pi * math.sqrt(q * (1 - q)) / self.compression
+
+    def to_bytes(self) -> bytes:
+        header = np.array([self.compression, len(self.means)], dtype=np.float64)
+        return zlib.compress(np.concatenate([header, self.means, self.weights]).tobytes())
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "TDigest":
+        values = np.frombuffer(zlib.decompress(data), dtype=np.float64)
+        compression, size = values[0], int(values[1])
+        return cls(compression=compression, means=values[2:2 + size].copy(), weights=values[2 + size:2 + 2 * size].copy())
@@ -0,0 +1,176 @@
+from collections import namedtuple
+
+import numpy as np
+
+from app.configs.snapshot import MISSING, WarrantySnapshot
+from app.schemas.analytical import TimeWindow
+
+# Mesmos campos das linhas devolvidas pelas consultas de app.utils.analytical
+VehicleGroup = namedtuple("VehicleGroup", ["propulsion", "year", "vehicles"])
+ModelGroup = namedtuple("ModelGroup", ["model", "vehicles"])
+PartClaims = namedtuple("PartClaims", ["part_id", "part_name", "claims", "vehicles_affected"])
+PartModel = namedtuple("PartModel", ["part_id", "model"])
+SupplierRow = namedtuple("SupplierRow", ["supplier_id", "supplier_name", "supplier_cpf"])
+PartWarrantyStats = namedtuple("PartWarrantyStats", ["part_id", "part_name", "total_claims", "affected_vehicles", "avg_time_to_failure_days"])
+WarrantyBreakdown = namedtuple("WarrantyBreakdown", ["part_id", "model", "propulsion", "year", "classified_failured", "claims", "vehicle_claims"])
+
+def _value(value):
+    # Enums de texto são comparados pelo valor, como na coluna do banco
+    return getattr(value, "value", value)
+
+def _optional(key: int):
+    return None if key == MISSING else key
+
+def _in_window(snapshot: WarrantySnapshot, window: TimeWindow = None) -> np.ndarray:
+    # Garantias com data de reparo no intervalo; datas ausentes (NaT) nunca satisfazem um limite
+    selected = np.ones(len(snapshot.claim_key), dtype=bool)
+    if window is not None and window.start is not None:
+        selected &= snapshot.repair_date >= np.datetime64(window.start)
+    if window is not None and window.end is not None:
+        selected &= snapshot.repair_date < np.datetime64(window.end)
+    return selected
+
+def _claims_of_vehicles(snapshot: WarrantySnapshot, vehicle_mask: np.ndarray, window: TimeWindow = None) -> np.ndarray:
+    # Garantias cujo veículo existe e satisfaz a máscara (equivale ao JOIN com vehicles)
+    has_vehicle = snapshot.fact_vehicle != MISSING
+    selected = np.zeros(len(snapshot.claim_key), dtype=bool)
+    selected[has_vehicle] = vehicle_mask[snapshot.fact_vehicle[has_vehicle]]
+    return selected & _in_window(snapshot, window)
+
+def _part_name(snapshot: WarrantySnapshot, part_id: int):
+    position = np.searchsorted(snapshot.part_id, part_id)
+    if position < len(snapshot.part_id) and snapshot.part_id[position] == part_id:
+        return snapshot.part_name[position]
+    return None
+
+def _part_claims(snapshot: WarrantySnapshot, vehicle_mask: np.ndarray, window: TimeWindow = None) -> list:
+    selected = _claims_of_vehicles(snapshot, vehicle_mask, window)
+    part_ids = snapshot.fact_part_id[selected]
+    if not len(part_ids):
+        return []
+    parts, claims = np.unique(part_ids, return_counts=True)
+    # Veículos distintos por peça: pares (peça, veículo) únicos contados por peça
+    pairs = np.unique(np.stack([part_ids, snapshot.fact_vehicle_id[selected]], axis=1), axis=0)
+    _, vehicles_affected = np.unique(pairs[:, 0], return_counts=True)
+    # Contagem decrescente e, no empate, id da peça (ids ausentes por último)
+    order = np.lexsort((parts, parts == MISSING, -claims))
+    return [
+        PartClaims(_optional(part_id), _part_name(snapshot, part_id), claim_count, vehicle_count)
+        for part_id, claim_count, vehicle_count in zip(parts[order].tolist(), claims[order].tolist(), vehicles_affected[order].tolist())
+    ]
+
+def get_vehicle_counts_by_model_snapshot_util(model: str, snapshot: WarrantySnapshot) -> list:
+    mask = snapshot.vehicle_model == snapshot.models.code(model)
+    if not mask.any():
+        return []
+    groups, counts = np.unique(np.stack([snapshot.vehicle_propulsion[mask], snapshot.vehicle_year[mask]], axis=1), axis=0, return_counts=True)
+    rows = [
+        VehicleGroup(snapshot.propulsions.decode(propulsion), _optional(year), count)
+        for (propulsion, year), count in zip(groups.tolist(), counts.tolist())
+    ]
+    return sorted(rows, key=lambda row: (row.propulsion is None, row.propulsion or "", row.year is None, row.year or 0))
+
+def get_part_claims_by_vehicle_model_snapshot_util(model: str, snapshot: WarrantySnapshot, window: TimeWindow = None) -> list:
+    return _part_claims(snapshot, snapshot.vehicle_model == snapshot.models.code(model), window)
+
+def get_vehicle_counts_by_propulsion_snapshot_util(propulsion, snapshot: WarrantySnapshot) -> list:
+    mask = snapshot.vehicle_propulsion == snapshot.propulsions.code(_value(propulsion))
+    if not mask.any():
+        return []
+    models, counts = np.unique(snapshot.vehicle_model[mask], return_counts=True)
+    rows = [ModelGroup(snapshot.models.decode(model), count) for model, count in zip(models.tolist(), counts.tolist())]
+    return sorted(rows, key=lambda row: (-row.vehicles, row.model is None, row.model or ""))
+
+def get_part_claims_by_propulsion_snapshot_util(propulsion, snapshot: WarrantySnapshot, window: TimeWindow = None) -> list:
+    return _part_claims(snapshot, snapshot.vehicle_propulsion == snapshot.propulsions.code(_value(propulsion)), window)
+
+def get_part_models_by_propulsion_snapshot_util(propulsion, snapshot: WarrantySnapshot, window: TimeWindow = None) -> list:
+    selected = _claims_of_vehicles(snapshot, snapshot.vehicle_propulsion == snapshot.propulsions.code(_value(propulsion)), window)
+    if not selected.any():
+        return []
+    pairs = np.unique(np.stack([snapshot.fact_part_id[selected], snapshot.vehicle_model[snapshot.fact_vehicle[selected]]], axis=1), axis=0)
+    rows = [PartModel(_optional(part_id), snapshot.models.decode(model)) for part_id, model in pairs.tolist()]
+    return sorted(rows, key=lambda row: (row.part_id is None, row.part_id or 0, row.model is None, row.model or ""))
+
+def get_supplier_by_name_snapshot_util(supplier_name: str, snapshot: WarrantySnapshot):
+    positions = np.flatnonzero(snapshot.supplier_name == supplier_name)
+    if not len(positions):
+        return None
+    position = positions[0]
+    return SupplierRow(int(snapshot.supplier_id[position]), snapshot.supplier_name[position], snapshot.supplier_cpf[position])
+
+def get_supplier_parts_warranty_stats_snapshot_util(supplier_id: int, snapshot: WarrantySnapshot, window: TimeWindow = None) -> list:
+    supplier_parts = np.flatnonzero(snapshot.part_supplier_id == supplier_id)
+    if not len(supplier_parts):
+        return []
+    total_parts = len(snapshot.part_id)
+    has_part = (snapshot.fact_part != MISSING) & _in_window(snapshot, window)
+    fact_part = snapshot.fact_part[has_part]
+    claims = np.bincount(fact_part, minlength=total_parts)
+
+    # Veículos distintos e dias até a falha só contam garantias cujo veículo existe
+    has_vehicle = snapshot.fact_vehicle[has_part] != MISSING
+    vehicle_part = fact_part[has_vehicle]
+    vehicle_position = snapshot.fact_vehicle[has_part][has_vehicle]
+    pairs = np.unique(np.stack([vehicle_part, vehicle_position], axis=1), axis=0)
+    affected_vehicles = np.bincount(pairs[:, 0], minlength=total_parts) if len(pairs) else np.zeros(total_parts, dtype=np.int64)
+
+    # Dias inteiros entre produção e reparo; apenas valores positivos entram na média
+    elapsed = snapshot.repair_date[has_part][has_vehicle] - snapshot.prod_date[vehicle_position]
+    valid = ~np.isnat(elapsed)
+    days = np.zeros(len(elapsed), dtype=np.int64)
+    days[valid] = elapsed[valid].astype("timedelta64[s]").astype(np.int64) // 86400
+    positive = valid & (days > 0)
+    days_sum = np.bincount(vehicle_part[positive], weights=days[positive], minlength=total_parts)
+    days_count = np.bincount(vehicle_part[positive], minlength=total_parts)
+
+    return [
+        PartWarrantyStats(
+            int(snapshot.part_id[position]),
+            snapshot.part_name[position],
+            int(claims[position]),
+            int(affected_vehicles[position]),
+            float(days_sum[position] / days_count[position]) if days_count[position] else None,
+        )
+        for position in supplier_parts.tolist()
+    ]
+
+def get_supplier_parts_warranty_breakdown_snapshot_util(supplier_id: int, snapshot: WarrantySnapshot, window: TimeWindow = None) -> list:
+    has_part = (snapshot.fact_part != MISSING) & _in_window(snapshot, window)
+    selected = np.zeros(len(snapshot.claim_key), dtype=bool)
+    selected[has_part] = snapshot.part_supplier_id[snapshot.fact_part[has_part]] == supplier_id
+    if not selected.any():
+        return []
+
+    vehicle = snapshot.fact_vehicle[selected]
+    has_vehicle = vehicle != MISSING
+    vehicle_position = np.where(has_vehicle, vehicle, 0)
+
+    def vehicle_column(column: np.ndarray) -> np.ndarray:
+        # Garantias sem veículo ficam com -1 nas colunas do veículo (equivale ao OUTER JOIN)
+        return np.where(has_vehicle, column[vehicle_position], MISSING) if len(column) else np.full(len(vehicle), MISSING)
+
+    keys = np.stack([
+        snapshot.fact_part_id[selected],
+        vehicle_column(snapshot.vehicle_model),
+        vehicle_column(snapshot.vehicle_propulsion),
+        vehicle_column(snapshot.vehicle_year),
+        snapshot.failure[selected],
+    ], axis=1)
+    groups, inverse = np.unique(keys, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    claims = np.bincount(inverse, minlength=len(groups))
+    vehicle_claims = np.bincount(inverse, weights=has_vehicle, minlength=len(groups)).astype(np.int64)
+
+    return [
+        WarrantyBreakdown(
+            part_id,
+            snapshot.models.decode(model),
+            snapshot.propulsions.decode(propulsion),
+            _optional(year),
+            snapshot.failures.decode(failure),
+            claim_count,
+            vehicle_count,
+        )
+        for (part_id, model, propulsion, year, failure), claim_count, vehicle_count in zip(groups.tolist(), claims.tolist(), vehicle_claims.tolist())
+    ]
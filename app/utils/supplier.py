@@ -3,13 +3,25 @@ from fastapi import Depends
 from sqlalchemy.orm import Session
 
 from app.configs.database import get_db
+from app.configs.fields import load_fields
+from app.configs.pagination import PAGE_DEFAULT_LIMIT, select_page_rows
+from app.configs.loader import get_batch_loader
 from app.models.model_supplier import Supplier
 
-def get_all_suppliers_util(db: Session = Depends(get_db)):
-    return db.query(Supplier).all()
+def get_suppliers_page_util(columns: list, after: int = None, limit: int = PAGE_DEFAULT_LIMIT, db: Session = Depends(get_db)) -> list:
+    return select_page_rows(Supplier, columns, after, limit, db=db)
 
-def get_supplier_by_id_util(supplier_id:int, db: Session = Depends(get_db)):
-    return db.query(Supplier).filter(Supplier.supplier_id == supplier_id).first()
+def get_suppliers_by_ids_util(supplier_ids: list, fields: list = None, db: Session = Depends(get_db)) -> dict:
+    if fields is None:
+        return get_batch_loader(db).load_many(Supplier, supplier_ids)
+    # Consulta própria, e não o carregador da sessão, para que o SELECT traga só os campos pedidos
+    found = {supplier.supplier_id: supplier for supplier in db.query(Supplier).filter(Supplier.supplier_id.in_(supplier_ids)).options(load_fields(Supplier, fields))}
+    return {supplier_id: found.get(supplier_id) for supplier_id in supplier_ids}
+
+def get_supplier_by_id_util(supplier_id:int, fields: list = None, db: Session = Depends(get_db)):
+    if fields is None:
+        return get_batch_loader(db).load(Supplier, supplier_id)
+    return db.query(Supplier).filter(Supplier.supplier_id == supplier_id).options(load_fields(Supplier, fields)).first()
 
 def get_supplier_by_location_id_util(location_id:int, db: Session = Depends(get_db)):
     return db.query(Supplier).filter(Supplier.location_id == location_id).all()
@@ -40,5 +52,4 @@ def update_supplier_by_id_util(supplier_name:str = None, supplier_cpf: str = Non
 
 def delete_supplier_by_name(supplier_name:int, db: Session = Depends(get_db)):
     rows_deleted = db.query(Supplier).filter(Supplier.supplier_name == supplier_name).delete()
-    db.commit()
     return rows_deleted
\ No newline at end of file
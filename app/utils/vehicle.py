@@ -3,14 +3,26 @@ from fastapi import Depends
 from sqlalchemy.orm import Session
 
 from app.configs.database import get_db
+from app.configs.fields import load_fields
+from app.configs.pagination import PAGE_DEFAULT_LIMIT, select_page_rows
+from app.configs.loader import get_batch_loader
 from app.models.model_vehicle import Vehicle
 from app.schemas.vehicle import PropulsionEnum
 
-def get_all_vehicles_util(db: Session = Depends(get_db)):
-    return db.query(Vehicle).all()
+def get_vehicles_page_util(columns: list, after: int = None, limit: int = PAGE_DEFAULT_LIMIT, db: Session = Depends(get_db)) -> list:
+    return select_page_rows(Vehicle, columns, after, limit, db=db)
 
-def get_vehicle_by_id_util(vehicle_id:int, db: Session = Depends(get_db)):
-    return db.query(Vehicle).filter(Vehicle.vehicle_id == vehicle_id).first()
+def get_vehicles_by_ids_util(vehicle_ids: list, fields: list = None, db: Session = Depends(get_db)) -> dict:
+    if fields is None:
+        return get_batch_loader(db).load_many(Vehicle, vehicle_ids)
+    # Consulta própria, e não o carregador da sessão, para que o SELECT traga só os campos pedidos
+    found = {vehicle.vehicle_id: vehicle for vehicle in db.query(Vehicle).filter(Vehicle.vehicle_id.in_(vehicle_ids)).options(load_fields(Vehicle, fields))}
+    return {vehicle_id: found.get(vehicle_id) for vehicle_id in vehicle_ids}
+
+def get_vehicle_by_id_util(vehicle_id:int, fields: list = None, db: Session = Depends(get_db)):
+    if fields is None:
+        return get_batch_loader(db).load(Vehicle, vehicle_id)
+    return db.query(Vehicle).filter(Vehicle.vehicle_id == vehicle_id).options(load_fields(Vehicle, fields)).first()
 
 def get_vehicle_by_model_util(model:str, db: Session = Depends(get_db)):
     return db.query(Vehicle).filter(Vehicle.model == model).all()
@@ -26,7 +38,6 @@ def get_vehicle_by_year_util(year: int, db: Session = Depends(get_db)):
 
 def delete_vehicle_by_id_util(vehicle_id:int, db: Session = Depends(get_db)):
     rows_deleted = db.query(Vehicle).filter(Vehicle.vehicle_id == vehicle_id).delete()
-    db.commit()
 
     return rows_deleted
 
@@ -3,13 +3,26 @@ from fastapi import Depends
 from sqlalchemy.orm import Session
 
 from app.configs.database import get_db
+from app.configs.fields import load_fields
+from app.configs.pagination import PAGE_DEFAULT_LIMIT, select_page_rows
 from app.models.model_warranty import Warranty
 
-def get_all_warranties_util(db: Session = Depends(get_db)):
-    return db.query(Warranty).all()
+def get_warranties_page_util(columns: list, after: int = None, limit: int = PAGE_DEFAULT_LIMIT, db: Session = Depends(get_db)) -> list:
+    return select_page_rows(Warranty, columns, after, limit, db=db)
 
-def get_warranty_by_id_util(claim_key:int, db: Session = Depends(get_db)):
-    return db.query(Warranty).filter(Warranty.claim_key == claim_key).first()
+def get_warranties_by_ids_util(claim_keys: list, fields: list = None, db: Session = Depends(get_db)) -> dict:
+    # Consulta própria, e não o carregador da sessão, para que o SELECT traga só os campos pedidos
+    query = db.query(Warranty).filter(Warranty.claim_key.in_(claim_keys))
+    if fields is not None:
+        query = query.options(load_fields(Warranty, fields))
+    found = {warranty.claim_key: warranty for warranty in query}
+    return {claim_key: found.get(claim_key) for claim_key in claim_keys}
+
+def get_warranty_by_id_util(claim_key:int, fields: list = None, db: Session = Depends(get_db)):
+    query = db.query(Warranty).filter(Warranty.claim_key == claim_key)
+    if fields is not None:
+        query = query.options(load_fields(Warranty, fields))
+    return query.first()
 
 def get_warranties_by_vehicle_id_util(vehicle_id:int, db: Session = Depends(get_db)):
     return db.query(Warranty).filter(Warranty.vehicle_id == vehicle_id).all()
@@ -19,7 +32,6 @@ def get_warranties_by_part_id_util(part_id:int, db: Session = Depends(get_db)):
 
 def delete_warranty_by_id_util(claim_key:int, db: Session = Depends(get_db)):
     rows_deleted = db.query(Warranty).filter(Warranty.claim_key == claim_key).delete()
-    db.commit()
 
     return rows_deleted
 